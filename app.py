@@ -1,14 +1,44 @@
 from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_from_directory
-import boto3
+from flask import Response, stream_with_context, get_flashed_messages, abort
+from flask.json import JSONEncoder
+from botocore.exceptions import ClientError
+import atexit
 import uuid
 import os
 import shutil
+import base64
 from datetime import datetime
+from decimal import Decimal
 from werkzeug.utils import secure_filename
 import json
+import threading
+import time
+from room_index import RoomIntervalIndex
+from reservation_cache import ReservationCache, LRUCacheBackend, RedisCacheBackend
+from upload_pipeline import UploadPipeline, UPLOAD_PENDING, UPLOAD_DONE, UPLOAD_FAILED
+from document_cache import DocumentDiskCache, DocumentTooLarge
+from booking import SlotBooking, SlotsUnavailable, ReservationChanged
+from occupancy import OccupancyView, BATCH_GET_KEYS
+from aws_clients import AwsClientFactory
+from room_catalog import RoomCatalog
+from guest_search import GuestSearchIndex
+from metrics import AppMetrics, RequestProfiler, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from image_derivatives import ImageDerivatives
+from compression import ResponseCompressor
 
-app = Flask(__name__)
+class DecimalJSONEncoder(JSONEncoder):
+    """Codificador JSON que serializa los Decimal que devuelve DynamoDB"""
+    def default(self, o):
+        if isinstance(o, Decimal):
+            return int(o) if o == o.to_integral_value() else float(o)
+        return super().default(o)
+
+# Sin la ruta estática integrada: serve_static añade las cabeceras de caché
+app = Flask(__name__, static_folder=None)
 app.secret_key = 'cloud_suites_hotel_secure_key'
+app.json_encoder = DecimalJSONEncoder
+# Con un proxy que soporte X-Sendfile (nginx, Apache) el envío de archivos se delega al servidor
+app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE', '').lower() in ('1', 'true')
 
 # Configuración de AWS
 S3_BUCKET_NAME = 'semillero-[USUARIO]-hotel-reservations' # MODIFICAR ESTE VALOR
@@ -18,23 +48,365 @@ REGION_NAME = 'us-east-1'  # MODIFICAR SEGÚN LA REGIÓN UTILIZADA
 # Configuración de almacenamiento local
 LOCAL_STORAGE = 'local_storage'
 LOCAL_DOCUMENTS_PATH = os.path.join(LOCAL_STORAGE, 'documents')
+# Copias traídas de S3 cuando el documento se cargó en otro nodo
+DOCUMENT_CACHE_PATH = os.path.join(LOCAL_STORAGE, 'document_cache')
+DOCUMENT_CACHE_MAX_BYTES = int(os.environ.get('DOCUMENT_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+DOCUMENT_MAX_AGE = int(os.environ.get('DOCUMENT_MAX_AGE', '3600'))
 
 # Crear directorios si no existen
 os.makedirs(LOCAL_DOCUMENTS_PATH, exist_ok=True)
 
+# Subida de documentos a S3 en segundo plano
+DOCUMENT_UPLOAD_WORKERS = int(os.environ.get('DOCUMENT_UPLOAD_WORKERS', '2'))
+DOCUMENT_UPLOAD_QUEUE_SIZE = int(os.environ.get('DOCUMENT_UPLOAD_QUEUE_SIZE', '32'))
+DOCUMENT_UPLOAD_MAX_ATTEMPTS = int(os.environ.get('DOCUMENT_UPLOAD_MAX_ATTEMPTS', '5'))
+DOCUMENT_UPLOAD_PART_CONCURRENCY = int(os.environ.get('DOCUMENT_UPLOAD_PART_CONCURRENCY', '4'))
+
+# Clientes de AWS: un pool de conexiones por servicio dimensionado según los
+# hilos que atienden peticiones (WSGI_THREADS) y los hilos de fondo; las
+# subidas usan un pool propio de S3 para no competir con las descargas
+WSGI_THREADS = int(os.environ.get('WSGI_THREADS', '16'))
+AWS_CONNECT_TIMEOUT = float(os.environ.get('AWS_CONNECT_TIMEOUT', '2'))
+AWS_READ_TIMEOUT = float(os.environ.get('AWS_READ_TIMEOUT', '10'))
+AWS_S3_READ_TIMEOUT = float(os.environ.get('AWS_S3_READ_TIMEOUT', '60'))
+AWS_MAX_ATTEMPTS = int(os.environ.get('AWS_MAX_ATTEMPTS', '5'))
+aws_clients = AwsClientFactory(
+    REGION_NAME,
+    connect_timeout=AWS_CONNECT_TIMEOUT,
+    read_timeout=AWS_READ_TIMEOUT,
+    max_attempts=AWS_MAX_ATTEMPTS
+)
+
 # Inicializar clientes de AWS
-s3 = boto3.client('s3', region_name=REGION_NAME)
-dynamodb = boto3.resource('dynamodb', region_name=REGION_NAME)
+s3 = aws_clients.client('s3', max_pool_connections=WSGI_THREADS, read_timeout=AWS_S3_READ_TIMEOUT)
+s3_uploads = aws_clients.client(
+    's3', pool='s3-uploads',
+    # Las subidas que no caben en la cola se hacen en el hilo de la petición
+    max_pool_connections=(DOCUMENT_UPLOAD_WORKERS + 1) * DOCUMENT_UPLOAD_PART_CONCURRENCY,
+    read_timeout=AWS_S3_READ_TIMEOUT
+)
+# + hilos de subida (registran el estado) y el de reconstrucción del índice
+dynamodb = aws_clients.resource('dynamodb', max_pool_connections=WSGI_THREADS + DOCUMENT_UPLOAD_WORKERS + 1)
 table = dynamodb.Table(DYNAMODB_TABLE)
 
+# Métricas de latencia (/metrics) y perfilador opcional por petición: con
+# PROFILE_TOKEN definido, las peticiones con el encabezado X-Profile igual al
+# token guardan un perfil de cProfile en local_storage/profiles
+metrics = AppMetrics()
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN')
+request_profiler = RequestProfiler(os.path.join(LOCAL_STORAGE, 'profiles'), PROFILE_TOKEN) if PROFILE_TOKEN else None
+metrics.instrument_app(app, request_profiler)
+for aws_client in (s3, s3_uploads, dynamodb.meta.client):
+    metrics.instrument_client(aws_client)
+metrics.registry.callback(
+    'hotel_aws_pool_in_flight', 'Envíos en curso por pool de conexiones de AWS', ('pool',),
+    lambda: {(pool,): values['in_flight'] for pool, values in aws_clients.stats()['pools'].items()})
+metrics.registry.callback(
+    'hotel_aws_pool_wait_seconds_total', 'Tiempo total de espera por una conexión libre', ('pool',),
+    lambda: {(pool,): values['wait_seconds_total'] for pool, values in aws_clients.stats()['pools'].items()},
+    kind='counter')
+
 # Configuración para la carga de archivos
 ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg'}
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB máximo
 
+# Paginación del listado de reservas
+RESERVATIONS_PAGE_SIZE = int(os.environ.get('RESERVATIONS_PAGE_SIZE', '100'))
+RESERVATIONS_MAX_PAGE_SIZE = 1000
+RESERVATION_SORT_ORDERS = {'check_in', 'check_in_desc', 'none'}
+
+# Cada escritura de la aplicación incrementa Version y se identifica en UpdatedBy:
+# la Lambda solo cambia el estado si la reserva conserva la versión que evaluó
+RESERVATION_WRITER = 'app'
+
+# Caché de lectura de reservas. El TTL es el máximo tiempo que un cambio hecho
+# por la Lambda (p. ej. Pendiente -> Confirmada) puede tardar en verse; 0 la desactiva
+RESERVATION_CACHE_TTL = float(os.environ.get('RESERVATION_CACHE_TTL', '10'))
+RESERVATION_CACHE_SIZE = int(os.environ.get('RESERVATION_CACHE_SIZE', '1024'))
+RESERVATION_CACHE_REDIS_URL = os.environ.get('RESERVATION_CACHE_REDIS_URL')
+reservation_cache = ReservationCache(
+    RedisCacheBackend(RESERVATION_CACHE_REDIS_URL) if RESERVATION_CACHE_REDIS_URL
+    else LRUCacheBackend(RESERVATION_CACHE_SIZE),
+    ttl=RESERVATION_CACHE_TTL
+)
+
+# Índice de disponibilidad por habitación: se construye con un scan al iniciar,
+# se actualiza con cada escritura de esta instancia y se reconstruye
+# periódicamente para recoger cambios hechos por otros nodos
+AVAILABILITY_INDEX_REFRESH_SECONDS = int(os.environ.get('AVAILABILITY_INDEX_REFRESH_SECONDS', '300'))
+availability_index = RoomIntervalIndex()
+availability_index_lock = threading.Lock()
+
+# Índice de búsqueda por huésped (nombre, correo, fecha de entrada): se construye
+# en segundo plano al iniciar, se mantiene con las escrituras de esta instancia
+# y se reconstruye cada GUEST_SEARCH_REFRESH_SECONDS (un scan proyectado de toda
+# la tabla por proceso; 0 no lo repite) para recoger las reservas de otros nodos
+GUEST_SEARCH_REFRESH_SECONDS = int(os.environ.get('GUEST_SEARCH_REFRESH_SECONDS', '300'))
+GUEST_SEARCH_RETRY_SECONDS = 30
+GUEST_SEARCH_DEFAULT_LIMIT = 50
+GUEST_SEARCH_MAX_LIMIT = 500
+guest_search_index = GuestSearchIndex()
+
+# Modo de reserva síncrono (opcional): con una tabla de noches (clave SlotID)
+# las reservas toman sus noches en una transacción y los solapamientos se
+# rechazan en la petición; sin ella se mantiene la verificación de la Lambda
+BOOKING_SLOTS_TABLE = os.environ.get('BOOKING_SLOTS_TABLE')
+booking = SlotBooking(dynamodb.meta.client, DYNAMODB_TABLE, BOOKING_SLOTS_TABLE) if BOOKING_SLOTS_TABLE else None
+
+# Vista de ocupación por habitación y noche que mantiene la Lambda (opcional):
+# la disponibilidad se consulta por clave en lugar de usar el índice en memoria
+OCCUPANCY_TABLE = os.environ.get('OCCUPANCY_TABLE')
+occupancy_view = OccupancyView(dynamodb.meta.client, OCCUPANCY_TABLE) if OCCUPANCY_TABLE else None
+
+# Catálogo de habitaciones (número, tipo, capacidad); se lee una vez al iniciar
+ROOM_CATALOG_PATH = os.environ.get('ROOM_CATALOG_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rooms.json'))
+room_catalog = RoomCatalog.load(ROOM_CATALOG_PATH)
+
+# Variantes de las fotos de habitaciones (varios anchos, JPEG y WebP) con el
+# hash del contenido en el nombre: se sirven desde /static/_img/ con caché
+# immutable de un año. Se generan al iniciar si no existen (o con
+# python image_derivatives.py durante el despliegue); las obsoletas solo se
+# borran con python image_derivatives.py --prune
+IMAGE_CACHE_PATH = os.path.join(LOCAL_STORAGE, 'image_cache')
+IMAGE_URL_PREFIX = '_img/'
+STATIC_MAX_AGE = int(os.environ.get('STATIC_MAX_AGE', '3600'))
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+image_derivatives = ImageDerivatives(os.path.join(app.root_path, 'static'), IMAGE_CACHE_PATH).build()
+
+@app.template_global()
+def room_image(path):
+    """URLs de una imagen de static/ para <img>/<picture>: src, srcset y webp_srcset"""
+    return image_derivatives.image(
+        path,
+        lambda name: url_for('serve_static', filename=IMAGE_URL_PREFIX + name),
+        lambda name: url_for('serve_static', filename=name)
+    )
+
+# Compresión gzip/brotli de HTML, CSS, JS y JSON; se registra después de las
+# métricas para que el perfilador y la medición vean la respuesta final
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '500'))
+response_compressor = ResponseCompressor(min_size=COMPRESSION_MIN_SIZE)
+response_compressor.init_app(app)
+
+# Búsqueda de disponibilidad en lote
+AVAILABILITY_MAX_RANGES = int(os.environ.get('AVAILABILITY_MAX_RANGES', '50'))
+AVAILABILITY_MAX_SPAN_DAYS = 366
+
 def allowed_file(filename):
     """Verifica si el archivo tiene una extensión permitida"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def scan_reservations(**scan_kwargs):
+    """Recorre la tabla completa siguiendo LastEvaluatedKey"""
+    while True:
+        response = table.scan(**scan_kwargs)
+        yield from response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def load_availability_index():
+    """Reconstruye el índice de disponibilidad leyendo solo los campos necesarios"""
+    availability_index.rebuild(scan_reservations(
+        ProjectionExpression='ReservationID, RoomNumber, CheckInDate, CheckOutDate, #status',
+        ExpressionAttributeNames={'#status': 'Status'}
+    ))
+
+def load_guest_search_index():
+    """Reconstruye el índice de búsqueda por huésped leyendo solo los campos que devuelve"""
+    guest_search_index.rebuild(scan_reservations(
+        ProjectionExpression='ReservationID, GuestName, ContactEmail, RoomNumber, CheckInDate, CheckOutDate, #status',
+        ExpressionAttributeNames={'#status': 'Status'}
+    ))
+
+def refresh_index(index, lock, load, max_age):
+    """Devuelve el índice, reconstruyéndolo con load() si no existe o tiene más de max_age segundos"""
+    loaded_at = index.loaded_at
+    if loaded_at is None or time.monotonic() - loaded_at > max_age:
+        # Solo un hilo reconstruye; los demás siguen usando el índice anterior si existe
+        if lock.acquire(blocking=loaded_at is None):
+            try:
+                if index.loaded_at == loaded_at:
+                    load()
+            finally:
+                lock.release()
+    return index
+
+def get_availability_index():
+    """Devuelve el índice de disponibilidad, reconstruyéndolo si no existe o está vencido"""
+    return refresh_index(availability_index, availability_index_lock, load_availability_index,
+                         AVAILABILITY_INDEX_REFRESH_SECONDS)
+
+def maintain_guest_search_index():
+    """Construye el índice de búsqueda por huésped y, si se configuró, lo reconstruye periódicamente"""
+    while True:
+        try:
+            load_guest_search_index()
+        except Exception as e:
+            print(f"No se pudo construir el índice de búsqueda por huésped: {str(e)}")
+            time.sleep(GUEST_SEARCH_RETRY_SECONDS)
+            continue
+        if GUEST_SEARCH_REFRESH_SECONDS <= 0:
+            return
+        time.sleep(GUEST_SEARCH_REFRESH_SECONDS)
+
+def get_guest_search_index():
+    """Devuelve el índice de búsqueda por huésped, o None si todavía se está construyendo"""
+    return guest_search_index if guest_search_index.loaded_at is not None else None
+
+# La primera construcción no bloquea el arranque ni las peticiones
+threading.Thread(target=maintain_guest_search_index, name='guest-search-index', daemon=True).start()
+
+def get_reservation(reservation_id):
+    """Obtiene una reserva por ID pasando por la caché; None si no existe"""
+    return reservation_cache.get(
+        reservation_id,
+        lambda: table.get_item(Key={'ReservationID': reservation_id}).get('Item')
+    )
+
+def get_stored_reservation(reservation_id):
+    """Lectura consistente de la reserva sin pasar por la caché"""
+    return table.get_item(Key={'ReservationID': reservation_id}, ConsistentRead=True).get('Item')
+
+def get_current_statuses(reservation_ids):
+    """Estado actual de cada reserva con BatchGetItem; las que ya no existen no aparecen"""
+    statuses = {}
+    reservation_ids = sorted(set(reservation_ids))
+    for start in range(0, len(reservation_ids), BATCH_GET_KEYS):
+        keys = [{'ReservationID': reservation_id} for reservation_id in reservation_ids[start:start + BATCH_GET_KEYS]]
+        request = {DYNAMODB_TABLE: {
+            'Keys': keys,
+            'ProjectionExpression': 'ReservationID, #status',
+            'ExpressionAttributeNames': {'#status': 'Status'},
+        }}
+        attempt = 0
+        while request:
+            response = dynamodb.meta.client.batch_get_item(RequestItems=request)
+            for item in response.get('Responses', {}).get(DYNAMODB_TABLE, []):
+                statuses[item['ReservationID']] = item.get('Status')
+            request = response.get('UnprocessedKeys')
+            if request:
+                attempt += 1
+                time.sleep(min(1.0, 0.05 * 2 ** attempt))
+    return statuses
+
+def save_local_document(file, reservation_id):
+    """Guarda el documento en disco para visualización y devuelve su nombre"""
+    filename = secure_filename(f"{reservation_id}_{file.filename}")
+    local_file_path = os.path.join(LOCAL_DOCUMENTS_PATH, filename)
+    file.save(local_file_path)
+    return filename
+
+def record_document_upload_state(reservation_id, document_id, state):
+    """Registra en la reserva el estado de la subida a S3 de su documento"""
+    try:
+        # Solo si la reserva sigue existiendo y conserva ese documento
+        table.update_item(
+            Key={'ReservationID': reservation_id},
+            UpdateExpression='SET DocumentUploadStatus = :us',
+            ConditionExpression='DocumentID = :di',
+            ExpressionAttributeValues={':us': state, ':di': document_id}
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+    reservation_cache.invalidate(reservation_id)
+
+upload_pipeline = UploadPipeline(
+    s3_uploads, S3_BUCKET_NAME,
+    workers=DOCUMENT_UPLOAD_WORKERS,
+    max_queue=DOCUMENT_UPLOAD_QUEUE_SIZE,
+    max_attempts=DOCUMENT_UPLOAD_MAX_ATTEMPTS,
+    part_concurrency=DOCUMENT_UPLOAD_PART_CONCURRENCY,
+    on_state_change=record_document_upload_state,
+    on_upload=metrics.observe_upload
+)
+atexit.register(upload_pipeline.drain, 30)
+
+document_cache = DocumentDiskCache(DOCUMENT_CACHE_PATH, DOCUMENT_CACHE_MAX_BYTES, s3, S3_BUCKET_NAME)
+
+def queue_document_upload(reservation_id, document_id):
+    """Encola la subida del documento a S3; si la cola está llena lo sube en la petición"""
+    local_file_path = os.path.join(LOCAL_DOCUMENTS_PATH, document_id)
+    key = f"documents/{document_id}"
+    if upload_pipeline.submit(local_file_path, key, reservation_id, document_id):
+        return
+    try:
+        upload_pipeline.upload(local_file_path, key)
+        state = UPLOAD_DONE
+    except Exception as e:
+        flash(f"Error al subir el documento a S3: {str(e)}", 'warning')
+        state = UPLOAD_FAILED
+    record_document_upload_state(reservation_id, document_id, state)
+
+def sync_reservation_indexes(reservation):
+    """Refleja en los índices en memoria una reserva creada o modificada"""
+    availability_index.upsert(reservation)
+    guest_search_index.upsert(reservation)
+
+def remove_reservation_from_indexes(reservation_id):
+    """Quita de los índices en memoria una reserva eliminada"""
+    availability_index.remove(reservation_id)
+    guest_search_index.remove(reservation_id)
+
+def encode_cursor(last_evaluated_key):
+    """Convierte LastEvaluatedKey en un cursor opaco para la URL"""
+    if not last_evaluated_key:
+        return None
+    raw = json.dumps(last_evaluated_key, cls=DecimalJSONEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """Convierte un cursor de la URL en ExclusiveStartKey"""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    key = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    if not isinstance(key, dict) or 'ReservationID' not in key:
+        raise ValueError('Cursor inválido')
+    return key
+
+def read_page_arguments():
+    """Lee limit, cursor y sort de la petición; lanza ValueError si no son válidos"""
+    limit = request.args.get('limit', type=int) or RESERVATIONS_PAGE_SIZE
+    limit = max(1, min(limit, RESERVATIONS_MAX_PAGE_SIZE))
+    cursor = request.args.get('cursor')
+    sort = request.args.get('sort', 'check_in')
+    if sort not in RESERVATION_SORT_ORDERS:
+        raise ValueError(f'Orden no soportado: {sort}')
+    return limit, cursor, sort
+
+def load_reservations_page(limit, cursor=None, sort='check_in'):
+    """Lee una página de reservas desde DynamoDB.
+
+    Devuelve (reservas, siguiente_cursor). El orden por fecha de check-in se
+    aplica dentro de la página: un scan no tiene orden global.
+    """
+    scan_kwargs = {'Limit': limit}
+    if cursor:
+        scan_kwargs['ExclusiveStartKey'] = decode_cursor(cursor)
+    response = table.scan(**scan_kwargs)
+    reservations = response.get('Items', [])
+    
+    # Ordenar por fecha de check-in
+    if sort != 'none':
+        reservations.sort(key=lambda x: x.get('CheckInDate', ''), reverse=(sort == 'check_in_desc'))
+    
+    return reservations, encode_cursor(response.get('LastEvaluatedKey'))
+
+def stream_template(template_name, **context):
+    """Renderiza una plantilla por partes para enviarla en streaming"""
+    app.update_template_context(context)
+    template = app.jinja_env.get_template(template_name)
+    stream = template.stream(context)
+    stream.enable_buffering(20)
+    return stream
+
+def stream_response(template_name, **context):
+    """Respuesta HTML enviada a medida que se renderiza la plantilla"""
+    # Consumir los mensajes flash antes de enviar los encabezados: la sesión
+    # se guarda antes de que el generador produzca el cuerpo
+    get_flashed_messages(with_categories=True)
+    return Response(stream_with_context(stream_template(template_name, **context)), mimetype='text/html')
+
 @app.route('/')
 def index():
     """Página principal"""
@@ -42,18 +414,104 @@ def index():
 
 @app.route('/reservations')
 def list_reservations():
-    """Lista todas las reservas"""
+    """Lista las reservas por páginas (?limit=&cursor=&sort=)"""
+    page_args = {'limit': RESERVATIONS_PAGE_SIZE, 'sort': 'check_in'}
     try:
-        response = table.scan()
-        reservations = response.get('Items', [])
+        limit, cursor, sort = read_page_arguments()
+        page_args = {'limit': limit, 'sort': sort}
+        reservations, next_cursor = load_reservations_page(limit, cursor, sort)
         
-        # Ordenar por fecha de check-in
-        reservations.sort(key=lambda x: x.get('CheckInDate', ''))
-        
-        return render_template('reservations.html', reservations=reservations)
+        return stream_response('reservations.html', reservations=reservations,
+                               next_cursor=next_cursor, is_first_page=not cursor, page_args=page_args)
     except Exception as e:
         flash(f"Error al cargar las reservas: {str(e)}", 'danger')
-        return render_template('reservations.html', reservations=[])
+        return stream_response('reservations.html', reservations=[],
+                               next_cursor=None, is_first_page=True, page_args=page_args)
+
+@app.route('/api/reservations')
+def api_list_reservations():
+    """Versión JSON del listado paginado de reservas"""
+    try:
+        limit, cursor, sort = read_page_arguments()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        reservations, next_cursor = load_reservations_page(limit, cursor, sort)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    return jsonify({
+        'reservations': reservations,
+        'count': len(reservations),
+        'next_cursor': next_cursor
+    })
+
+def parse_optional_date(value, field):
+    """Normaliza una fecha YYYY-MM-DD opcional; lanza ValueError si no es válida"""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date().isoformat()
+    except ValueError:
+        raise ValueError(f'Fecha inválida en {field}: {value}')
+
+@app.route('/api/reservations/search')
+def search_reservations():
+    """Busca reservas por huésped sin recorrer la tabla.
+
+    ?name= prefijos de palabras del nombre (sin distinguir mayúsculas ni tildes),
+    ?email= correo exacto, ?check_in_from= / ?check_in_to= rango de entrada
+    (inclusivo) y ?limit=. Los criterios dados se combinan.
+
+    El índice solo recibe las escrituras de esta instancia: el estado de los
+    resultados (que cambia la Lambda) se lee de la tabla y se omiten las
+    reservas eliminadas. Las reservas creadas o editadas en otros nodos
+    aparecen tras la siguiente reconstrucción (GUEST_SEARCH_REFRESH_SECONDS).
+    """
+    try:
+        check_in_from = parse_optional_date(request.args.get('check_in_from'), 'check_in_from')
+        check_in_to = parse_optional_date(request.args.get('check_in_to'), 'check_in_to')
+        if check_in_from and check_in_to and check_in_to < check_in_from:
+            raise ValueError('check_in_to debe ser igual o posterior a check_in_from')
+        try:
+            limit = int(request.args.get('limit', GUEST_SEARCH_DEFAULT_LIMIT))
+        except ValueError:
+            raise ValueError('limit debe ser un número entero')
+        if not 1 <= limit <= GUEST_SEARCH_MAX_LIMIT:
+            raise ValueError(f'limit debe estar entre 1 y {GUEST_SEARCH_MAX_LIMIT}')
+        index = get_guest_search_index()
+        if index is None:
+            return jsonify({'error': 'El índice de búsqueda se está construyendo; intente de nuevo en unos segundos'}), \
+                503, {'Retry-After': '5'}
+        results, total = index.search(
+            name=request.args.get('name'),
+            email=request.args.get('email'),
+            check_in_from=check_in_from,
+            check_in_to=check_in_to,
+            limit=limit
+        )
+        statuses = get_current_statuses(result['ReservationID'] for result in results)
+        current = []
+        for result in results:
+            if result['ReservationID'] in statuses:
+                result['Status'] = statuses[result['ReservationID']]
+                current.append(result)
+        total -= len(results) - len(current)
+        results = current
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    return jsonify({
+        'reservations': results,
+        'count': len(results),
+        'total': total,
+        'truncated': total > len(results)
+    })
 
 @app.route('/reservation/new', methods=['GET', 'POST'])
 def new_reservation():
@@ -78,22 +536,14 @@ def new_reservation():
         
         # Procesar documento de identidad si se cargó uno
         document_id = "Sin documento"
+        uploaded_document = None
         if 'identity_document' in request.files:
             file = request.files['identity_document']
             if file and file.filename and allowed_file(file.filename):
-                # Guardar localmente para visualización
-                filename = secure_filename(f"{reservation_id}_{file.filename}")
-                local_file_path = os.path.join(LOCAL_DOCUMENTS_PATH, filename)
-                file.save(local_file_path)
-                
-                # Subir a S3 para respaldo
-                try:
-                    file.seek(0)  # Regresar al inicio del archivo
-                    s3.upload_fileobj(file, S3_BUCKET_NAME, f"documents/{filename}")
-                    document_id = filename
-                except Exception as e:
-                    flash(f"Error al subir el documento a S3: {str(e)}", 'warning')
-                    # Aún así continuamos con la reserva, ya que tenemos el documento local
+                # Guardar localmente para visualización; el respaldo en S3 se
+                # hace en segundo plano después de guardar la reserva
+                uploaded_document = save_local_document(file, reservation_id)
+                document_id = uploaded_document
             elif file.filename:
                 flash('Tipo de archivo no permitido. Use PDF, PNG, JPG o JPEG', 'warning')
         
@@ -110,14 +560,28 @@ def new_reservation():
             'DocumentID': document_id,
             'Status': 'Pendiente',
             'CreatedAt': datetime.now().isoformat(),
-            'UpdatedAt': datetime.now().isoformat()
+            'UpdatedAt': datetime.now().isoformat(),
+            'Version': 1,
+            'UpdatedBy': RESERVATION_WRITER
         }
+        if uploaded_document:
+            reservation_item['DocumentUploadStatus'] = UPLOAD_PENDING
         
         # Guardar en DynamoDB
         try:
-            table.put_item(Item=reservation_item)
+            if booking:
+                booking.create(reservation_item)
+            else:
+                table.put_item(Item=reservation_item)
+            reservation_cache.invalidate(reservation_id)
+            sync_reservation_indexes(reservation_item)
+            if uploaded_document:
+                queue_document_upload(reservation_id, uploaded_document)
             flash('¡Reserva creada exitosamente!', 'success')
             return redirect(url_for('list_reservations'))
+        except (SlotsUnavailable, ValueError) as e:
+            flash(str(e), 'warning')
+            return redirect(url_for('new_reservation'))
         except Exception as e:
             flash(f"Error al crear la reserva: {str(e)}", 'danger')
             return redirect(url_for('new_reservation'))
@@ -130,10 +594,9 @@ def view_reservation(reservation_id):
     """Ver detalles de una reserva específica"""
     try:
         # Obtener la reserva por ID
-        response = table.get_item(Key={'ReservationID': reservation_id})
+        reservation = get_reservation(reservation_id)
         
-        if 'Item' in response:
-            reservation = response['Item']
+        if reservation is not None:
             return render_template('view_reservation.html', reservation=reservation)
         else:
             flash('Reserva no encontrada', 'warning')
@@ -148,13 +611,11 @@ def edit_reservation(reservation_id):
     """Editar una reserva existente"""
     try:
         # Obtener la reserva actual
-        response = table.get_item(Key={'ReservationID': reservation_id})
+        current_reservation = get_reservation(reservation_id)
         
-        if 'Item' not in response:
+        if current_reservation is None:
             flash('Reserva no encontrada', 'warning')
             return redirect(url_for('list_reservations'))
-            
-        current_reservation = response['Item']
         
         if request.method == 'POST':
             # Obtener datos del formulario
@@ -174,50 +635,77 @@ def edit_reservation(reservation_id):
             
             # Procesar documento de identidad si se cargó uno nuevo
             document_id = current_reservation.get('DocumentID', 'Sin documento')
+            uploaded_document = None
             if 'identity_document' in request.files:
                 file = request.files['identity_document']
                 if file and file.filename and allowed_file(file.filename):
-                    # Guardar localmente para visualización
-                    filename = secure_filename(f"{reservation_id}_{file.filename}")
-                    local_file_path = os.path.join(LOCAL_DOCUMENTS_PATH, filename)
-                    file.save(local_file_path)
-                    
-                    # Subir a S3 para respaldo
-                    try:
-                        file.seek(0)  # Regresar al inicio del archivo
-                        s3.upload_fileobj(file, S3_BUCKET_NAME, f"documents/{filename}")
-                        document_id = filename
-                    except Exception as e:
-                        flash(f"Error al subir el documento a S3: {str(e)}", 'warning')
-                        # Aún así continuamos con la reserva, ya que tenemos el documento local
+                    # Guardar localmente para visualización; el respaldo en S3 se
+                    # hace en segundo plano después de actualizar la reserva
+                    uploaded_document = save_local_document(file, reservation_id)
+                    document_id = uploaded_document
                 elif file.filename:
                     flash('Tipo de archivo no permitido. Use PDF, PNG, JPG o JPEG', 'warning')
             
             # Actualizar la reserva en DynamoDB
             try:
-                table.update_item(
-                    Key={'ReservationID': reservation_id},
-                    UpdateExpression='SET GuestName = :gn, ContactEmail = :ce, RoomNumber = :rn, ' +
-                                    'CheckInDate = :ci, CheckOutDate = :co, Guests = :g, ' +
-                                    'Comments = :cm, DocumentID = :di, #status = :st, UpdatedAt = :ua',
-                    ExpressionAttributeNames={
-                        '#status': 'Status'  # Usar alias para la palabra reservada
-                    },
-                    ExpressionAttributeValues={
-                        ':gn': guest_name,
-                        ':ce': contact_email,
-                        ':rn': room_number,
-                        ':ci': check_in_date,
-                        ':co': check_out_date,
-                        ':g': guests,
-                        ':cm': comments if comments else "Sin comentarios",
-                        ':di': document_id,
-                        ':st': status,
-                        ':ua': datetime.now().isoformat()
-                    }
-                )
+                update_expression = ('SET GuestName = :gn, ContactEmail = :ce, RoomNumber = :rn, ' +
+                                     'CheckInDate = :ci, CheckOutDate = :co, Guests = :g, ' +
+                                     'Comments = :cm, DocumentID = :di, #status = :st, UpdatedAt = :ua, ' +
+                                     'UpdatedBy = :ub, Version = if_not_exists(Version, :zero) + :one')
+                expression_values = {
+                    ':gn': guest_name,
+                    ':ce': contact_email,
+                    ':rn': room_number,
+                    ':ci': check_in_date,
+                    ':co': check_out_date,
+                    ':g': guests,
+                    ':cm': comments if comments else "Sin comentarios",
+                    ':di': document_id,
+                    ':st': status,
+                    ':ua': datetime.now().isoformat(),
+                    ':ub': RESERVATION_WRITER,
+                    ':zero': 0,
+                    ':one': 1
+                }
+                if uploaded_document:
+                    update_expression += ', DocumentUploadStatus = :us'
+                    expression_values[':us'] = UPLOAD_PENDING
+                expression_names = {
+                    '#status': 'Status'  # Usar alias para la palabra reservada
+                }
+                changes = {
+                    'ReservationID': reservation_id,
+                    'GuestName': guest_name,
+                    'ContactEmail': contact_email,
+                    'RoomNumber': room_number,
+                    'CheckInDate': check_in_date,
+                    'CheckOutDate': check_out_date,
+                    'Status': status
+                }
+                if booking:
+                    # Las noches a liberar se calculan sobre lo guardado, no sobre la caché
+                    stored_reservation = get_stored_reservation(reservation_id)
+                    if stored_reservation is None:
+                        flash('Reserva no encontrada', 'warning')
+                        return redirect(url_for('list_reservations'))
+                    booking.update(stored_reservation, changes, update_expression, expression_values, expression_names)
+                else:
+                    table.update_item(
+                        Key={'ReservationID': reservation_id},
+                        UpdateExpression=update_expression,
+                        ExpressionAttributeNames=expression_names,
+                        ExpressionAttributeValues=expression_values
+                    )
+                reservation_cache.invalidate(reservation_id)
+                sync_reservation_indexes(changes)
+                if uploaded_document:
+                    queue_document_upload(reservation_id, uploaded_document)
                 flash('¡Reserva actualizada exitosamente!', 'success')
                 return redirect(url_for('view_reservation', reservation_id=reservation_id))
+            except (SlotsUnavailable, ReservationChanged, ValueError) as e:
+                reservation_cache.invalidate(reservation_id)
+                flash(str(e), 'warning')
+                return render_template('edit_reservation.html', reservation=current_reservation)
             except Exception as e:
                 flash(f"Error al actualizar la reserva: {str(e)}", 'danger')
                 return render_template('edit_reservation.html', reservation=current_reservation)
@@ -233,60 +721,202 @@ def edit_reservation(reservation_id):
 def delete_reservation(reservation_id):
     """Eliminar una reserva"""
     try:
-        # Eliminar la reserva de DynamoDB
-        table.delete_item(Key={'ReservationID': reservation_id})
+        # Eliminar la reserva de DynamoDB (y liberar sus noches si las tomó)
+        stored_reservation = get_stored_reservation(reservation_id) if booking else None
+        if stored_reservation and stored_reservation.get('SlotsClaimed'):
+            booking.delete(stored_reservation)
+        else:
+            table.delete_item(Key={'ReservationID': reservation_id})
+        reservation_cache.invalidate(reservation_id)
+        remove_reservation_from_indexes(reservation_id)
         
         flash('Reserva eliminada exitosamente', 'success')
         return redirect(url_for('list_reservations'))
+    except ReservationChanged as e:
+        reservation_cache.invalidate(reservation_id)
+        flash(str(e), 'warning')
+        return redirect(url_for('list_reservations'))
     except Exception as e:
         flash(f"Error al eliminar la reserva: {str(e)}", 'danger')
         return redirect(url_for('list_reservations'))
 
-@app.route('/rooms/availability')
-def check_availability():
-    """Verificar disponibilidad de habitaciones para fechas específicas"""
-    check_in = request.args.get('check_in')
-    check_out = request.args.get('check_out')
-    
+def parse_room_filters(guests, room_types):
+    """Valida los filtros de búsqueda: huéspedes (entero positivo) y tipos de habitación"""
+    if guests in (None, ''):
+        guests = None
+    else:
+        try:
+            guests = int(guests)
+        except (TypeError, ValueError):
+            raise ValueError('El número de huéspedes debe ser un entero')
+        if guests < 1:
+            raise ValueError('El número de huéspedes debe ser mayor que cero')
+    if isinstance(room_types, str):
+        room_types = [room_types]
+    room_types = [room_type for room_type in (room_types or []) if room_type]
+    return guests, room_types
+
+def parse_date_range(check_in, check_out):
+    """Valida un rango de fechas YYYY-MM-DD con salida posterior a la entrada"""
     if not check_in or not check_out:
-        return jsonify({'error': 'Fechas no proporcionadas'}), 400
-    
-    # Consultar reservas existentes para las fechas especificadas
+        raise ValueError('Fechas no proporcionadas')
     try:
-        # En un entorno real, esto sería una consulta más compleja a DynamoDB
-        response = table.scan()
-        reservations = response.get('Items', [])
-        
-        # Filtrar reservas que se solapan con las fechas seleccionadas
-        overlapping_reservations = []
         check_in_date = datetime.strptime(check_in, '%Y-%m-%d')
         check_out_date = datetime.strptime(check_out, '%Y-%m-%d')
+    except (TypeError, ValueError):
+        raise ValueError(f'Fechas inválidas: {check_in} - {check_out}')
+    if check_out_date <= check_in_date:
+        raise ValueError('La fecha de salida debe ser posterior a la fecha de entrada')
+    return check_in_date.date().isoformat(), check_out_date.date().isoformat()
+
+def occupied_rooms_by_range(room_numbers, ranges):
+    """Habitaciones ocupadas para cada rango, con una sola lectura de la vista o del índice"""
+    if occupancy_view:
+        return occupancy_view.occupied_rooms_by_range(room_numbers, ranges)
+    return get_availability_index().occupied_rooms_by_range(ranges, rooms=room_numbers)
+
+@app.route('/rooms/availability')
+def check_availability():
+    """Verificar disponibilidad de habitaciones para fechas específicas (?guests=&room_type= opcionales)"""
+    # Consultar la vista de ocupación o el índice por habitación en lugar de recorrer toda la tabla
+    try:
+        date_range = parse_date_range(request.args.get('check_in'), request.args.get('check_out'))
+        guests, room_types = parse_room_filters(request.args.get('guests'), request.args.getlist('room_type'))
+        rooms = [room['RoomNumber'] for room in room_catalog.filter(guests, room_types)]
+        occupied = occupied_rooms_by_range(rooms, [date_range])[0]
         
-        for reservation in reservations:
-            res_check_in = datetime.strptime(reservation['CheckInDate'], '%Y-%m-%d')
-            res_check_out = datetime.strptime(reservation['CheckOutDate'], '%Y-%m-%d')
-            
-            # Verificar si hay solapamiento
-            if check_in_date < res_check_out and check_out_date > res_check_in and reservation['Status'] != 'Cancelada':
-                overlapping_reservations.append(reservation['RoomNumber'])
-        
-        # Lista de todas las habitaciones disponibles (simulación)
-        all_rooms = ['101', '102', '201', '202', '301']
-        available_rooms = [room for room in all_rooms if room not in overlapping_reservations]
+        available_rooms = [room for room in rooms if room not in occupied]
         
         return jsonify({'available_rooms': available_rooms})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/rooms/availability/search', methods=['POST'])
+def search_availability():
+    """Disponibilidad para varios rangos de fechas en una sola consulta.
+
+    Cuerpo JSON: {"ranges": [{"check_in": "...", "check_out": "..."}, ...],
+    "guests": 2, "room_type": "Deluxe" | ["Deluxe", "Suite"]}
+    """
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict) or not isinstance(payload.get('ranges'), list) or not payload['ranges']:
+        return jsonify({'error': 'Se requiere una lista de rangos en "ranges"'}), 400
+    if len(payload['ranges']) > AVAILABILITY_MAX_RANGES:
+        return jsonify({'error': f'Se permiten como máximo {AVAILABILITY_MAX_RANGES} rangos por consulta'}), 400
+    
+    try:
+        ranges = []
+        for position, date_range in enumerate(payload['ranges']):
+            if not isinstance(date_range, dict):
+                raise ValueError(f'Rango {position}: debe ser un objeto con check_in y check_out')
+            try:
+                ranges.append(parse_date_range(date_range.get('check_in'), date_range.get('check_out')))
+            except ValueError as e:
+                raise ValueError(f'Rango {position}: {str(e)}')
+        first = min(check_in for check_in, _ in ranges)
+        last = max(check_out for _, check_out in ranges)
+        if (datetime.strptime(last, '%Y-%m-%d') - datetime.strptime(first, '%Y-%m-%d')).days > AVAILABILITY_MAX_SPAN_DAYS:
+            raise ValueError(f'Los rangos deben caber en {AVAILABILITY_MAX_SPAN_DAYS} días')
+        guests, room_types = parse_room_filters(payload.get('guests'), payload.get('room_type'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        rooms = room_catalog.filter(guests, room_types)
+        room_numbers = [room['RoomNumber'] for room in rooms]
+        occupied_by_range = occupied_rooms_by_range(room_numbers, ranges)
+        return jsonify({
+            'results': [
+                {
+                    'check_in': check_in,
+                    'check_out': check_out,
+                    'available_rooms': [room for room in room_numbers if room not in occupied]
+                }
+                for (check_in, check_out), occupied in zip(ranges, occupied_by_range)
+            ],
+            'rooms': {room['RoomNumber']: room for room in rooms}
+        })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/rooms')
+def list_rooms():
+    """Catálogo de habitaciones"""
+    return jsonify({'rooms': [room_catalog.get(number) for number in room_catalog.numbers()],
+                    'room_types': room_catalog.room_types()})
+
+@app.route('/stats')
+def stats():
+    """Contadores internos de la aplicación"""
+    return jsonify({
+        'reservation_cache': reservation_cache.stats(),
+        'document_uploads': upload_pipeline.stats(),
+        'document_cache': document_cache.stats(),
+        'booking': booking.stats() if booking else None,
+        'guest_search': guest_search_index.stats(),
+        'aws_clients': aws_clients.stats(),
+        'images': image_derivatives.stats(),
+        'compression': response_compressor.stats()
+    })
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Métricas en formato de texto de Prometheus"""
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+def send_document(directory, filename):
+    """Envía un documento desde disco con soporte de Range, ETag y Last-Modified"""
+    # send_file usa wsgi.file_wrapper (sendfile en la mayoría de servidores) y
+    # responde 206/304 según Range, If-None-Match e If-Modified-Since
+    # etag=True explícito: send_from_directory de Flask 2.0.1 lo omite por defecto
+    response = send_from_directory(directory, filename, conditional=True, etag=True, max_age=DOCUMENT_MAX_AGE)
+    # Son documentos de identidad: solo el navegador puede guardarlos
+    response.cache_control.public = False
+    response.cache_control.private = True
+    return response
+
 @app.route('/document/<filename>')
 def serve_document(filename):
-    """Servir documentos locales"""
-    return send_from_directory(LOCAL_DOCUMENTS_PATH, filename)
+    """Servir documentos: copia local o, si no existe en este nodo, desde S3 vía caché en disco"""
+    if secure_filename(filename) != filename:
+        abort(404)
+    
+    if os.path.isfile(os.path.join(LOCAL_DOCUMENTS_PATH, filename)):
+        return send_document(LOCAL_DOCUMENTS_PATH, filename)
+    
+    try:
+        document_cache.fetch(filename)
+    except FileNotFoundError:
+        abort(404)
+    except DocumentTooLarge as e:
+        # No cabe en la caché: se transmite directamente desde S3
+        s3_object = e.response
+        response = Response(s3_object['Body'].iter_chunks(1024 * 1024),
+                            mimetype=s3_object.get('ContentType', 'application/octet-stream'))
+        response.content_length = s3_object['ContentLength']
+        response.cache_control.private = True
+        return response
+    return send_document(DOCUMENT_CACHE_PATH, filename)
 
 @app.route('/static/<path:filename>')
 def serve_static(filename):
-    """Servir archivos estáticos"""
-    return send_from_directory('static', filename)
+    """Servir archivos estáticos; las variantes con hash de contenido con caché immutable"""
+    if filename.startswith(IMAGE_URL_PREFIX):
+        response = send_from_directory(IMAGE_CACHE_PATH, filename[len(IMAGE_URL_PREFIX):],
+                                       conditional=True, etag=True, max_age=IMMUTABLE_MAX_AGE)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+    response = send_from_directory('static', filename, conditional=True, etag=True, max_age=STATIC_MAX_AGE)
+    response.cache_control.public = True
+    return response
 
 if __name__ == '__main__':
+    try:
+        load_availability_index()
+    except Exception as e:
+        # El índice se reconstruirá en la primera consulta de disponibilidad
+        print(f"No se pudo construir el índice de disponibilidad: {str(e)}")
     app.run(host='0.0.0.0', port=5000, debug=False)
\ No newline at end of file
@@ -0,0 +1,508 @@
+"""Auditoría masiva de solapamientos en la tabla de reservas.
+
+Recorre la tabla con un scan paralelo por segmentos (Segment/TotalSegments),
+guarda habitación, fechas y claves en particiones en disco como arreglos de
+NumPy y busca en cada partición todos los pares de reservas no canceladas que
+se solapan con ordenamiento y barrido (searchsorted), sin comparar cada
+reserva contra toda la tabla.
+
+Para acotar la memoria cada reserva se asigna a la ventana de --bucket-days
+días de su check-in y se copia en las ventanas siguientes que cubre; las
+particiones reparten pares (habitación, ventana) y solo una de ellas está en
+memoria a la vez. Cada par se reporta una sola vez: en la ventana del check-in
+de la reserva que empieza después.
+
+Con --repair, en cada par la reserva creada después (CreatedAt) queda en
+estado Conflicto, igual que lo haría la Lambda. Los ítems se releen y se
+reescriben con batch_writer, así que conviene ejecutarlo sin tráfico.
+
+Requiere numpy (la aplicación web no lo usa).
+
+Uso:
+    python audit_conflicts.py --table <reservas> --output conflictos.csv
+    python audit_conflicts.py --table <reservas> --output conflictos.jsonl --repair
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+BUCKET_DAYS = 30
+MAX_NIGHTS = 365
+# Filas acumuladas por segmento antes de convertirlas y escribirlas a disco
+FLUSH_ROWS = 50000
+# Pares generados por bloque durante el barrido
+PAIR_CHUNK = 1000000
+# Memoria de trabajo por fila durante el barrido (fila, orden, claves, límites)
+SWEEP_BYTES_PER_ROW_FACTOR = 4
+INVALID_SAMPLE = 100
+
+ROW_DTYPE = np.dtype([
+    ('room', 'S16'),
+    ('bucket', '<i4'),
+    ('native', '?'),
+    ('check_in', '<i4'),
+    ('check_out', '<i4'),
+    ('id', 'S64'),
+    ('status', 'S16'),
+    ('created', 'S32'),
+])
+SCAN_FIELDS = ('ReservationID', 'RoomNumber', 'CheckInDate', 'CheckOutDate', 'Status', 'CreatedAt')
+REPORT_COLUMNS = ['room', 'reservation_id', 'check_in', 'check_out', 'status', 'created_at',
+                  'other_reservation_id', 'other_check_in', 'other_check_out', 'other_status', 'other_created_at']
+NAT = np.iinfo(np.int64).min
+
+
+def parse_days(values):
+    """Convierte fechas YYYY-MM-DD a días desde 1970; las inválidas quedan en NAT"""
+    try:
+        return np.array(values, dtype='datetime64[D]').astype(np.int64)
+    except ValueError:
+        days = np.empty(len(values), dtype=np.int64)
+        for index, value in enumerate(values):
+            try:
+                days[index] = np.datetime64(value, 'D').astype(np.int64)
+            except ValueError:
+                days[index] = NAT
+        return days
+
+
+def encode_all(values, max_bytes):
+    """Codifica en UTF-8 y devuelve (bytes, máscara de los que caben en max_bytes)"""
+    encoded = [value.encode('utf-8') for value in values]
+    lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+    return encoded, lengths <= max_bytes
+
+
+class PartitionWriter:
+    """Escribe las reservas de un segmento del scan en los archivos de partición"""
+
+    def __init__(self, directory, partitions, segment, bucket_days=BUCKET_DAYS, max_nights=MAX_NIGHTS):
+        self.directory = directory
+        self.partitions = partitions
+        self.segment = segment
+        self.bucket_days = bucket_days
+        self.max_nights = max_nights
+        self.rows = 0
+        self.copies = 0
+        self.invalid_count = 0
+        self.invalid_sample = []
+
+    def _reject(self, ids, mask, reason):
+        rejected = np.nonzero(mask)[0]
+        self.invalid_count += len(rejected)
+        for index in rejected[:max(0, INVALID_SAMPLE - len(self.invalid_sample))]:
+            self.invalid_sample.append({'reservation_id': ids[index], 'reason': reason})
+
+    def write(self, ids, rooms, check_ins, check_outs, statuses, created):
+        """Agrega un bloque de reservas (listas de cadenas del mismo largo)"""
+        check_in = parse_days(check_ins)
+        check_out = parse_days(check_outs)
+        id_bytes, id_fits = encode_all(ids, ROW_DTYPE['id'].itemsize)
+        room_bytes, room_fits = encode_all(rooms, ROW_DTYPE['room'].itemsize)
+        room_present = np.fromiter(map(bool, rooms), dtype=bool, count=len(rooms))
+
+        remaining = np.ones(len(ids), dtype=bool)
+        for mask, reason in (
+            (~(id_fits & room_fits & room_present), 'habitación vacía o campos demasiado largos'),
+            ((check_in == NAT) | (check_out == NAT), 'fechas inválidas'),
+            (check_out <= check_in, 'la salida no es posterior a la entrada'),
+            (check_out - check_in > self.max_nights, f'estadía mayor a {self.max_nights} noches'),
+        ):
+            mask &= remaining
+            self._reject(ids, mask, reason)
+            remaining &= ~mask
+        source = np.nonzero(remaining)[0]
+        if not len(source):
+            return
+
+        # Una copia por cada ventana que cubre la estadía; la primera es la nativa
+        first_bucket = check_in[source] // self.bucket_days
+        span = (check_out[source] - 1) // self.bucket_days - first_bucket + 1
+        copy_source = np.repeat(source, span)
+        copy_offset = np.arange(len(copy_source)) - np.repeat(np.cumsum(span) - span, span)
+
+        rows = np.empty(len(copy_source), dtype=ROW_DTYPE)
+        rows['room'] = np.array(room_bytes, dtype=ROW_DTYPE['room'])[copy_source]
+        rows['bucket'] = np.repeat(first_bucket, span) + copy_offset
+        rows['native'] = copy_offset == 0
+        rows['check_in'] = check_in[copy_source]
+        rows['check_out'] = check_out[copy_source]
+        rows['id'] = np.array(id_bytes, dtype=ROW_DTYPE['id'])[copy_source]
+        rows['status'] = np.array([value.encode('utf-8') for value in statuses], dtype=ROW_DTYPE['status'])[copy_source]
+        rows['created'] = np.array([value.encode('utf-8') for value in created], dtype=ROW_DTYPE['created'])[copy_source]
+        self.rows += len(source)
+        self.copies += len(rows) - len(source)
+
+        # Partición por (habitación, ventana)
+        unique_rooms, room_index = np.unique(rows['room'], return_inverse=True)
+        room_hashes = np.array([zlib.crc32(room) for room in unique_rooms], dtype=np.int64)
+        partition = (room_hashes[room_index] * 1000003 + rows['bucket']) % self.partitions
+        order = np.argsort(partition, kind='stable')
+        boundaries = np.searchsorted(partition[order], np.arange(self.partitions + 1))
+        for number in range(self.partitions):
+            start, stop = boundaries[number], boundaries[number + 1]
+            if start == stop:
+                continue
+            with open(partition_path(self.directory, number, self.segment), 'ab') as partition_file:
+                rows[order[start:stop]].tofile(partition_file)
+
+
+def partition_path(directory, number, segment):
+    return os.path.join(directory, f'p{number:05d}-s{segment:04d}.bin')
+
+
+def load_partition(directory, number):
+    """Lee todos los archivos de una partición (uno por segmento del scan)"""
+    prefix = f'p{number:05d}-'
+    chunks = [
+        np.fromfile(os.path.join(directory, name), dtype=ROW_DTYPE)
+        for name in sorted(os.listdir(directory)) if name.startswith(prefix)
+    ]
+    if not chunks:
+        return np.empty(0, dtype=ROW_DTYPE)
+    return np.concatenate(chunks)
+
+
+def find_overlaps(rows, pair_chunk=PAIR_CHUNK):
+    """Barrido de una partición: genera (filas_ordenadas, i, j) por bloques de pares.
+
+    Las filas se ordenan por (habitación, ventana, check-in). Con claves
+    grupo * span + fecha, cada fila i se solapa exactamente con las filas
+    siguientes cuya entrada es menor que su salida, es decir i+1 ..
+    searchsorted(inicios, fin_i) - 1. Solo se conservan los pares cuya
+    segunda fila es la copia nativa para no repetirlos entre ventanas, y
+    nunca los de una reserva consigo misma.
+    """
+    count = len(rows)
+    if count < 2:
+        return
+    order = np.lexsort((rows['check_in'], rows['bucket'], rows['room']))
+    rows = rows[order]
+    del order
+    new_group = np.empty(count, dtype=bool)
+    new_group[0] = True
+    new_group[1:] = (rows['room'][1:] != rows['room'][:-1]) | (rows['bucket'][1:] != rows['bucket'][:-1])
+    group = np.cumsum(new_group, dtype=np.int64) - 1
+    del new_group
+
+    base = int(rows['check_in'].min())
+    span = int(rows['check_out'].max()) - base + 1
+    starts = group * span + (rows['check_in'] - base)
+    ends = group * span + (rows['check_out'] - base)
+    del group
+    counts = np.searchsorted(starts, ends, side='left') - np.arange(count) - 1
+    np.maximum(counts, 0, out=counts)
+    del starts, ends
+
+    cumulative = np.cumsum(counts)
+    start = 0
+    while start < count:
+        already = int(cumulative[start - 1]) if start else 0
+        stop = max(start + 1, int(np.searchsorted(cumulative, already + pair_chunk, side='right')))
+        chunk_counts = counts[start:stop]
+        total = int(chunk_counts.sum())
+        if total:
+            first = np.repeat(np.arange(start, stop), chunk_counts)
+            offsets = np.arange(total) - np.repeat(np.cumsum(chunk_counts) - chunk_counts, chunk_counts)
+            second = first + 1 + offsets
+            # Una página repetida del scan no debe generar un par consigo misma
+            keep = rows['native'][second] & (rows['id'][first] != rows['id'][second])
+            yield rows, first[keep], second[keep]
+        start = stop
+
+
+def later_created(rows, first, second):
+    """Para cada par, índice de la reserva creada después (desempate por ID)"""
+    first_created, second_created = rows['created'][first], rows['created'][second]
+    second_is_later = (second_created > first_created) | (
+        (second_created == first_created) & (rows['id'][second] > rows['id'][first])
+    )
+    return np.where(second_is_later, second, first)
+
+
+def decode(values):
+    return np.char.decode(values, 'utf-8')
+
+
+def to_dates(days):
+    return days.astype('datetime64[D]').astype(str)
+
+
+class ReportWriter:
+    """Escribe los pares en CSV o JSON Lines"""
+
+    def __init__(self, path, report_format):
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.format = report_format
+        if report_format == 'csv':
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(REPORT_COLUMNS)
+
+    def write(self, rows, first, second):
+        columns = [decode(rows['room'][first])]
+        for indices in (first, second):
+            columns.extend([
+                decode(rows['id'][indices]),
+                to_dates(rows['check_in'][indices]),
+                to_dates(rows['check_out'][indices]),
+                decode(rows['status'][indices]),
+                decode(rows['created'][indices]),
+            ])
+        lines = zip(*columns)
+        if self.format == 'csv':
+            self.writer.writerows(lines)
+        else:
+            self.file.writelines(json.dumps(dict(zip(REPORT_COLUMNS, line)), ensure_ascii=False) + '\n' for line in lines)
+
+    def close(self):
+        self.file.close()
+
+
+def id_buckets(ids, buckets):
+    """Cubeta por hash de cada ID (vectorizado sobre los bytes de S64)"""
+    words = ids.view(np.uint64).reshape(len(ids), -1)
+    multipliers = np.arange(1, words.shape[1] + 1, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+    hashes = (words * multipliers).sum(axis=1, dtype=np.uint64)
+    # Mezcla final (splitmix64): los IDs suelen compartir prefijo y el módulo solo ve los bits bajos
+    hashes ^= hashes >> np.uint64(30)
+    hashes *= np.uint64(0xBF58476D1CE4E5B9)
+    hashes ^= hashes >> np.uint64(27)
+    hashes *= np.uint64(0x94D049BB133111EB)
+    hashes ^= hashes >> np.uint64(31)
+    return (hashes % np.uint64(buckets)).astype(np.int64)
+
+
+def unique_ids(ids):
+    """IDs distintos de un arreglo S64 (ordenando por palabras de 8 bytes, bastante más rápido que np.unique)"""
+    if not len(ids):
+        return ids
+    words = ids.view(np.uint64).reshape(len(ids), -1)
+    ids = ids[np.lexsort(words.T[::-1])]
+    keep = np.empty(len(ids), dtype=bool)
+    keep[0] = True
+    keep[1:] = ids[1:] != ids[:-1]
+    return ids[keep]
+
+
+def spill_ids(directory, name, ids, buckets):
+    """Agrega IDs a archivos repartidos por hash para deduplicarlos luego por cubeta"""
+    ids = unique_ids(ids)
+    bucket = id_buckets(ids, buckets)
+    order = np.argsort(bucket, kind='stable')
+    boundaries = np.searchsorted(bucket[order], np.arange(buckets + 1))
+    for number in range(buckets):
+        start, stop = boundaries[number], boundaries[number + 1]
+        if start != stop:
+            with open(os.path.join(directory, f'{name}-h{number:05d}.bin'), 'ab') as spill_file:
+                ids[order[start:stop]].tofile(spill_file)
+
+
+def iter_distinct_ids(directory, name, buckets):
+    """Genera, por cubeta, los IDs distintos guardados con spill_ids"""
+    for number in range(buckets):
+        path = os.path.join(directory, f'{name}-h{number:05d}.bin')
+        if os.path.exists(path):
+            yield unique_ids(np.fromfile(path, dtype=ROW_DTYPE['id']))
+
+
+def audit_partitions(directory, partitions, on_pairs=None):
+    """Barre todas las particiones y devuelve los contadores de la auditoría.
+
+    Los IDs de las reservas involucradas y de las que deben marcarse como
+    Conflicto se guardan en disco (ver iter_distinct_ids con 'involved' y
+    'losers') para no acumularlos en memoria.
+    """
+    pair_count = 0
+    for number in range(partitions):
+        involved = []
+        losers = []
+        for rows, first, second in find_overlaps(load_partition(directory, number)):
+            pair_count += len(first)
+            involved.extend((rows['id'][first], rows['id'][second]))
+            later = later_created(rows, first, second)
+            losers.append(rows['id'][later[rows['status'][later] != b'Conflicto']])
+            if on_pairs is not None:
+                on_pairs(rows, first, second)
+        if involved:
+            spill_ids(directory, 'involved', np.concatenate(involved), partitions)
+            spill_ids(directory, 'losers', np.concatenate(losers), partitions)
+    return {
+        'overlapping_pairs': pair_count,
+        'reservations_in_conflict': sum(len(ids) for ids in iter_distinct_ids(directory, 'involved', partitions)),
+        'reservations_to_mark': sum(len(ids) for ids in iter_distinct_ids(directory, 'losers', partitions)),
+    }
+
+
+def scan_segment(client, table_name, segment, total_segments, writer):
+    """Recorre un segmento de la tabla y lo escribe por bloques en las particiones"""
+    scan_kwargs = {
+        'TableName': table_name,
+        'Segment': segment,
+        'TotalSegments': total_segments,
+        'ProjectionExpression': 'ReservationID, RoomNumber, CheckInDate, CheckOutDate, #status, CreatedAt',
+        'FilterExpression': '#status <> :canceled',
+        'ExpressionAttributeNames': {'#status': 'Status'},
+        'ExpressionAttributeValues': {':canceled': {'S': 'Cancelada'}},
+    }
+    columns = tuple([] for _ in SCAN_FIELDS)
+    scanned = 0
+    while True:
+        response = client.scan(**scan_kwargs)
+        for item in response.get('Items', []):
+            for column, field in zip(columns, SCAN_FIELDS):
+                value = item.get(field, {})
+                column.append(value.get('S') or value.get('N') or '')
+        scanned += response.get('ScannedCount', 0)
+        if len(columns[0]) >= FLUSH_ROWS:
+            writer.write(*columns)
+            columns = tuple([] for _ in SCAN_FIELDS)
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    if columns[0]:
+        writer.write(*columns)
+    return scanned
+
+
+def repair_statuses(dynamodb, table_name, id_chunks):
+    """Marca como Conflicto las reservas indicadas releyéndolas y reescribiéndolas con batch_writer.
+
+    id_chunks: bloques de IDs (listas de str), por ejemplo los de iter_distinct_ids
+    """
+    table = dynamodb.Table(table_name)
+    repaired = 0
+    updated_at = datetime.now().isoformat()
+    with table.batch_writer() as batch:
+        for reservation_ids in id_chunks:
+            repaired += _repair_chunk(dynamodb, table_name, reservation_ids, batch, updated_at)
+    return repaired
+
+
+def _repair_chunk(dynamodb, table_name, reservation_ids, batch, updated_at):
+    repaired = 0
+    for start in range(0, len(reservation_ids), 100):
+        request = {table_name: {
+            'Keys': [{'ReservationID': reservation_id} for reservation_id in reservation_ids[start:start + 100]],
+            'ConsistentRead': True,
+        }}
+        while request:
+            response = dynamodb.batch_get_item(RequestItems=request)
+            for item in response.get('Responses', {}).get(table_name, []):
+                # Solo reservas que siguen activas
+                if item.get('Status') in ('Pendiente', 'Confirmada'):
+                    item['Status'] = 'Conflicto'
+                    item['UpdatedAt'] = updated_at
+                    # Una evaluación de la Lambda en curso sobre la versión anterior no la sobrescribe
+                    item['UpdatedBy'] = 'auditoria'
+                    item['Version'] = item.get('Version', 0) + 1
+                    batch.put_item(Item=item)
+                    repaired += 1
+            request = response.get('UnprocessedKeys')
+            if request:
+                time.sleep(0.1)
+    return repaired
+
+
+def peak_memory_mb():
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--table', default=os.environ.get('DYNAMODB_TABLE'), help='Tabla de reservas')
+    parser.add_argument('--region', default=os.environ.get('AWS_REGION', 'us-east-1'))
+    parser.add_argument('--segments', type=int, default=8, help='Segmentos del scan paralelo')
+    parser.add_argument('--memory-mb', type=int, default=512, help='Memoria objetivo del barrido por partición')
+    parser.add_argument('--partitions', type=int, help='Particiones en disco (por defecto según --memory-mb)')
+    parser.add_argument('--bucket-days', type=int, default=BUCKET_DAYS)
+    parser.add_argument('--max-nights', type=int, default=MAX_NIGHTS)
+    parser.add_argument('--work-dir', help='Directorio de las particiones (por defecto uno temporal)')
+    parser.add_argument('--output', help='Archivo de reporte de pares (.csv o .jsonl)')
+    parser.add_argument('--format', choices=['csv', 'jsonl'], help='Formato del reporte (por defecto según la extensión)')
+    parser.add_argument('--repair', action='store_true', help='Marcar como Conflicto la reserva más reciente de cada par')
+    args = parser.parse_args()
+    if not args.table:
+        parser.error('Se requiere --table')
+
+    import boto3
+    from botocore.config import Config
+    client = boto3.client('dynamodb', region_name=args.region,
+                          config=Config(max_pool_connections=max(10, args.segments)))
+
+    partitions = args.partitions
+    if not partitions:
+        # ItemCount es aproximado (se actualiza cada ~6 horas); se deja margen para las copias
+        item_count = client.describe_table(TableName=args.table)['Table'].get('ItemCount', 0)
+        sweep_bytes = item_count * 1.2 * ROW_DTYPE.itemsize * SWEEP_BYTES_PER_ROW_FACTOR
+        partitions = max(1, math.ceil(sweep_bytes / (args.memory_mb * 1024 * 1024)))
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='auditoria-')
+    os.makedirs(work_dir, exist_ok=True)
+    report = None
+    if args.output:
+        report_format = args.format or ('jsonl' if args.output.endswith('.jsonl') else 'csv')
+        report = ReportWriter(args.output, report_format)
+    try:
+        started = time.perf_counter()
+        writers = [PartitionWriter(work_dir, partitions, segment, args.bucket_days, args.max_nights)
+                   for segment in range(args.segments)]
+        with ThreadPoolExecutor(max_workers=args.segments) as executor:
+            scanned = sum(executor.map(
+                lambda writer: scan_segment(client, args.table, writer.segment, args.segments, writer), writers
+            ))
+        scan_seconds = time.perf_counter() - started
+        rows = sum(writer.rows for writer in writers)
+
+        started = time.perf_counter()
+        audit = audit_partitions(work_dir, partitions, report.write if report else None)
+        sweep_seconds = time.perf_counter() - started
+        if report:
+            report.close()
+            report = None
+
+        repaired = 0
+        if args.repair and audit['reservations_to_mark']:
+            dynamodb = boto3.resource('dynamodb', region_name=args.region)
+            repaired = repair_statuses(dynamodb, args.table, (
+                decode(ids).tolist() for ids in iter_distinct_ids(work_dir, 'losers', partitions)
+            ))
+    finally:
+        if report:
+            report.close()
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    invalid_sample = [entry for writer in writers for entry in writer.invalid_sample][:INVALID_SAMPLE]
+    print(json.dumps({
+        'table': args.table,
+        'scanned_items': scanned,
+        'active_reservations': rows,
+        'window_copies': sum(writer.copies for writer in writers),
+        'invalid_reservations': sum(writer.invalid_count for writer in writers),
+        'invalid_sample': invalid_sample,
+        'partitions': partitions,
+        **audit,
+        'repaired': repaired,
+        'scan_seconds': round(scan_seconds, 3),
+        'sweep_seconds': round(sweep_seconds, 3),
+        'rows_per_second': round(rows / (scan_seconds + sweep_seconds), 1) if rows else None,
+        'peak_memory_mb': peak_memory_mb(),
+        'report': args.output,
+    }, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
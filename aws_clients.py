@@ -0,0 +1,154 @@
+"""Clientes de AWS con un pool de conexiones por servicio.
+
+Cada pool tiene su propio cliente de botocore (y por lo tanto su propio pool
+de urllib3) con tamaño, timeouts y reintentos adaptativos configurables, de
+modo que una subida lenta a S3 no deja sin conexiones a las consultas de
+DynamoDB. Un medidor por pool limita los envíos simultáneos al tamaño del
+pool y registra cuántos hay en curso y cuánto esperan los hilos por una
+conexión libre; sin el límite, urllib3 abre conexiones extra que descarta al
+devolverlas y la saturación no se ve.
+
+El medidor libera la conexión al recibir la respuesta: la lectura del cuerpo
+de una descarga en streaming de S3 (get_object) no cuenta como en curso.
+"""
+import threading
+import time
+
+import boto3
+from botocore.config import Config
+
+RETRY_MODE = 'adaptive'
+
+
+def supports_tcp_keepalive():
+    """Config(tcp_keepalive=...) existe desde botocore 1.27; antes solo se lee del archivo de configuración"""
+    return 'tcp_keepalive' in Config.OPTION_DEFAULTS
+
+
+class PoolGauge:
+    """Envíos en curso y espera por conexión de un pool"""
+
+    def __init__(self, name, limit):
+        self.name = name
+        self.limit = limit
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self._condition = threading.Condition()
+        self._held = threading.local()
+
+    def acquire(self, **kwargs):
+        """Handler de before-send: espera una conexión libre del pool"""
+        started = time.perf_counter()
+        waited = False
+        with self._condition:
+            while self.in_flight >= self.limit:
+                waited = True
+                self._condition.wait()
+            self.in_flight += 1
+            self.requests += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            if waited:
+                elapsed = time.perf_counter() - started
+                self.waits += 1
+                self.wait_seconds += elapsed
+                self.max_wait_seconds = max(self.max_wait_seconds, elapsed)
+        self._held.count = getattr(self._held, 'count', 0) + 1
+
+    def release(self, **kwargs):
+        """Handler de response-received (se emite también cuando el envío falla)"""
+        if not getattr(self._held, 'count', 0):
+            return
+        self._held.count -= 1
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+
+    def stats(self):
+        with self._condition:
+            return {
+                'max_pool_connections': self.limit,
+                'in_flight': self.in_flight,
+                'peak_in_flight': self.peak_in_flight,
+                'requests': self.requests,
+                'waits': self.waits,
+                'wait_seconds_total': round(self.wait_seconds, 4),
+                'wait_seconds_avg': round(self.wait_seconds / self.waits, 4) if self.waits else None,
+                'wait_seconds_max': round(self.max_wait_seconds, 4),
+            }
+
+
+class AwsClientFactory:
+    """Crea y reutiliza un cliente por pool con la configuración de botocore ajustada"""
+
+    def __init__(self, region_name, connect_timeout=2, read_timeout=10, max_attempts=5,
+                 retry_mode=RETRY_MODE, tcp_keepalive=True):
+        self.region_name = region_name
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_attempts = max_attempts
+        self.retry_mode = retry_mode
+        self.tcp_keepalive = tcp_keepalive and supports_tcp_keepalive()
+        self._session = boto3.session.Session(region_name=region_name)
+        self._clients = {}
+        self._gauges = {}
+        self._settings = {}
+        self._lock = threading.Lock()
+
+    def config(self, max_pool_connections, read_timeout=None):
+        options = {
+            'max_pool_connections': max_pool_connections,
+            'connect_timeout': self.connect_timeout,
+            'read_timeout': read_timeout or self.read_timeout,
+            'retries': {'mode': self.retry_mode, 'max_attempts': self.max_attempts},
+        }
+        if self.tcp_keepalive:
+            options['tcp_keepalive'] = True
+        return Config(**options)
+
+    def _register(self, pool, service_name, client, max_pool_connections, read_timeout):
+        gauge = PoolGauge(pool, max_pool_connections)
+        client.meta.events.register('before-send', gauge.acquire)
+        client.meta.events.register('response-received', gauge.release)
+        self._clients[pool] = client
+        self._gauges[pool] = gauge
+        self._settings[pool] = {'service': service_name, 'read_timeout': read_timeout or self.read_timeout}
+
+    def client(self, service_name, pool=None, max_pool_connections=10, read_timeout=None):
+        """Cliente de bajo nivel del pool indicado (por defecto, uno por servicio).
+
+        La configuración se fija al crear el pool; las llamadas siguientes con
+        el mismo nombre devuelven el mismo cliente.
+        """
+        pool = pool or service_name
+        with self._lock:
+            if pool not in self._clients:
+                client = self._session.client(service_name, config=self.config(max_pool_connections, read_timeout))
+                self._register(pool, service_name, client, max_pool_connections, read_timeout)
+            return self._clients[pool]
+
+    def resource(self, service_name, pool=None, max_pool_connections=10, read_timeout=None):
+        """Recurso de boto3 sobre el cliente del pool (comparte conexiones y medidor)"""
+        pool = pool or service_name
+        resource = self._session.resource(service_name, config=self.config(max_pool_connections, read_timeout))
+        with self._lock:
+            if pool in self._clients:
+                resource.meta.client = self._clients[pool]
+            else:
+                self._register(pool, service_name, resource.meta.client, max_pool_connections, read_timeout)
+        return resource
+
+    def stats(self):
+        return {
+            'retry_mode': self.retry_mode,
+            'max_attempts': self.max_attempts,
+            'connect_timeout': self.connect_timeout,
+            'tcp_keepalive': self.tcp_keepalive,
+            'pools': {
+                pool: dict(self._settings[pool], **gauge.stats())
+                for pool, gauge in self._gauges.items()
+            },
+        }
@@ -0,0 +1,118 @@
+"""Benchmark de la auditoría de solapamientos sobre datos sintéticos.
+
+Genera reservas sin pasar por DynamoDB, las escribe en particiones con
+PartitionWriter (como lo hace cada segmento del scan) y mide el barrido de
+audit_partitions. Con --verify compara el número de pares con una búsqueda
+por fuerza bruta (solo para volúmenes pequeños).
+
+Uso:
+    python benchmarks/bench_audit_conflicts.py --rows 1000000
+    python benchmarks/bench_audit_conflicts.py --rows 10000000 --partitions 32
+    python benchmarks/bench_audit_conflicts.py --rows 5000 --verify
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import audit_conflicts  # noqa: E402
+
+CHUNK_ROWS = 200000
+
+
+def synthetic_chunks(rows, rooms, days, seed=7):
+    """Bloques de columnas con estadías de 1 a 14 noches en un rango de days días"""
+    rng = random.Random(seed)
+    first_day = date(2023, 1, 1)
+    calendar = [(first_day + timedelta(days=offset)).isoformat() for offset in range(days + 15)]
+    room_names = [str(100 + number) for number in range(rooms)]
+    for start in range(0, rows, CHUNK_ROWS):
+        count = min(CHUNK_ROWS, rows - start)
+        check_in = [rng.randrange(days) for _ in range(count)]
+        yield (
+            [f'res-{number:012d}' for number in range(start, start + count)],
+            [rng.choice(room_names) for _ in range(count)],
+            [calendar[day] for day in check_in],
+            [calendar[day + rng.randint(1, 14)] for day in check_in],
+            ['Confirmada' if rng.random() < 0.8 else 'Pendiente' for _ in range(count)],
+            [f'2022-12-01T00:00:{number % 60:02d}.{number:06d}'[:26] for number in range(start, start + count)],
+        )
+
+
+def brute_force_pairs(chunks):
+    by_room = {}
+    for ids, rooms, check_ins, check_outs, _, _ in chunks:
+        for row in zip(ids, rooms, check_ins, check_outs):
+            by_room.setdefault(row[1], []).append(row)
+    pairs = 0
+    for stays in by_room.values():
+        for index, (_, _, check_in, check_out) in enumerate(stays):
+            for _, _, other_in, other_out in stays[index + 1:]:
+                if check_in < other_out and check_out > other_in:
+                    pairs += 1
+    return pairs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--rooms', type=int, default=5000)
+    parser.add_argument('--days', type=int, default=3 * 365)
+    parser.add_argument('--partitions', type=int, default=16)
+    parser.add_argument('--segments', type=int, default=4, help='Escritores simulados (uno por segmento del scan)')
+    parser.add_argument('--verify', action='store_true')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='bench-auditoria-')
+    try:
+        writers = [audit_conflicts.PartitionWriter(work_dir, args.partitions, segment)
+                   for segment in range(args.segments)]
+        generate_seconds = 0.0
+        write_seconds = 0.0
+        chunks = synthetic_chunks(args.rows, args.rooms, args.days)
+        number = 0
+        while True:
+            started = time.perf_counter()
+            chunk = next(chunks, None)
+            generate_seconds += time.perf_counter() - started
+            if chunk is None:
+                break
+            started = time.perf_counter()
+            writers[number % args.segments].write(*chunk)
+            write_seconds += time.perf_counter() - started
+            number += 1
+
+        started = time.perf_counter()
+        audit = audit_conflicts.audit_partitions(work_dir, args.partitions)
+        sweep_seconds = time.perf_counter() - started
+        disk_bytes = sum(entry.stat().st_size for entry in os.scandir(work_dir))
+
+        result = {
+            'rows': args.rows,
+            'rooms': args.rooms,
+            'partitions': args.partitions,
+            'window_copies': sum(writer.copies for writer in writers),
+            **audit,
+            'generate_seconds': round(generate_seconds, 2),
+            'write_seconds': round(write_seconds, 2),
+            'sweep_seconds': round(sweep_seconds, 2),
+            'rows_per_second': round(args.rows / (write_seconds + sweep_seconds)),
+            'partition_disk_mb': round(disk_bytes / 1024 / 1024, 1),
+            'peak_memory_mb': audit_conflicts.peak_memory_mb(),
+        }
+        if args.verify:
+            result['brute_force_pairs'] = brute_force_pairs(synthetic_chunks(args.rows, args.rooms, args.days))
+        print(json.dumps(result, indent=2))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Compara el índice por habitación contra el recorrido completo de /rooms/availability.
+
+Uso:
+    python benchmarks/bench_availability_index.py --sizes 1000 100000 1000000
+
+El camino original se mide sin el costo de red del scan: solo el bucle con
+strptime sobre las reservas ya cargadas, que es una cota inferior de su costo real.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from room_index import RoomIntervalIndex  # noqa: E402
+
+STATUSES = ['Pendiente', 'Confirmada', 'Conflicto', 'Cancelada']
+
+
+def synthetic_reservations(count, rooms, seed=42):
+    """Genera reservas con estancias de 1 a 14 noches repartidas en 10 años"""
+    rng = random.Random(seed)
+    base = date(2020, 1, 1).toordinal()
+    span = 3650
+    for i in range(count):
+        start = base + rng.randrange(span)
+        nights = rng.randint(1, 14)
+        yield {
+            'ReservationID': f'res-{i:08d}',
+            'RoomNumber': rooms[rng.randrange(len(rooms))],
+            'CheckInDate': date.fromordinal(start).isoformat(),
+            'CheckOutDate': date.fromordinal(start + nights).isoformat(),
+            'Status': rng.choice(STATUSES),
+        }
+
+
+def legacy_overlapping_rooms(reservations, check_in, check_out):
+    """Copia del bucle original de check_availability (sin el scan)"""
+    overlapping_reservations = []
+    check_in_date = datetime.strptime(check_in, '%Y-%m-%d')
+    check_out_date = datetime.strptime(check_out, '%Y-%m-%d')
+    for reservation in reservations:
+        res_check_in = datetime.strptime(reservation['CheckInDate'], '%Y-%m-%d')
+        res_check_out = datetime.strptime(reservation['CheckOutDate'], '%Y-%m-%d')
+        if check_in_date < res_check_out and check_out_date > res_check_in and reservation['Status'] != 'Cancelada':
+            overlapping_reservations.append(reservation['RoomNumber'])
+    return set(overlapping_reservations)
+
+
+def random_queries(count, seed=7):
+    rng = random.Random(seed)
+    base = date(2020, 1, 1)
+    for _ in range(count):
+        check_in = base + timedelta(days=rng.randrange(3650))
+        check_out = check_in + timedelta(days=rng.randint(1, 7))
+        yield check_in.isoformat(), check_out.isoformat()
+
+
+def run(size, rooms, queries, legacy_queries):
+    reservations = list(synthetic_reservations(size, rooms))
+    query_list = list(random_queries(queries))
+
+    index = RoomIntervalIndex()
+    started = time.perf_counter()
+    index.rebuild(reservations)
+    build_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for check_in, check_out in query_list:
+        index.occupied_rooms(check_in, check_out)
+    index_seconds = (time.perf_counter() - started) / len(query_list)
+
+    legacy_list = query_list[:legacy_queries]
+    started = time.perf_counter()
+    for check_in, check_out in legacy_list:
+        expected = legacy_overlapping_rooms(reservations, check_in, check_out)
+        if expected != index.occupied_rooms(check_in, check_out):
+            raise AssertionError(f'Resultados distintos para {check_in} - {check_out}')
+    legacy_seconds = (time.perf_counter() - started) / len(legacy_list)
+
+    print(f'{size:>10} reservas | construcción {build_seconds * 1000:10.1f} ms | '
+          f'índice {index_seconds * 1e6:10.1f} µs/consulta | '
+          f'recorrido {legacy_seconds * 1000:10.1f} ms/consulta | '
+          f'x{legacy_seconds / index_seconds:,.0f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--rooms', type=int, default=200, help='Número de habitaciones sintéticas')
+    parser.add_argument('--queries', type=int, default=1000, help='Consultas medidas contra el índice')
+    parser.add_argument('--legacy-queries', type=int, default=3, help='Consultas medidas contra el recorrido')
+    args = parser.parse_args()
+
+    rooms = [str(100 + i) for i in range(args.rooms)]
+    for size in args.sizes:
+        run(size, rooms, args.queries, args.legacy_queries)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""Filas por segundo de bulk_io.py (importación y exportación) contra DynamoDB simulado.
+
+Por tamaño se genera un CSV de reservas sin solapamientos (salvo una de cada
+--overlap-every filas, que repite las fechas de la anterior y debe quedar
+rechazada), se importa a una tabla vacía y luego se exporta a JSON Lines, a
+CSV y a S3 con carga multiparte. Se reporta el tiempo, las filas por segundo y
+la memoria máxima del proceso después de cada paso.
+
+Por defecto DynamoDB y S3 se simulan en el proceso con moto. moto ignora
+Segment/TotalSegments (cada segmento devuelve la tabla completa), así que con
+moto el scan usa un solo segmento. Con --endpoint-url se usa DynamoDB Local
+(docker run -p 8000:8000 amazon/dynamodb-local) con los segmentos indicados
+y la exportación a S3 se omite.
+
+Requiere moto (pip install "moto[dynamodb,s3]<4"); no es dependencia de la
+aplicación.
+
+Uso:
+    python benchmarks/bench_bulk_io.py --rows 20000 100000
+    python benchmarks/bench_bulk_io.py --rows 1000000 --endpoint-url http://localhost:8000 --segments 8 --workers 8
+"""
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import bulk_io  # noqa: E402
+
+BUCKET = 'benchmark-hotel-exports'
+FIRST_DAY = date(2025, 1, 1)
+FIELDS = ['ReservationID', 'GuestName', 'ContactEmail', 'RoomNumber', 'CheckInDate', 'CheckOutDate', 'Guests',
+          'Status']
+
+
+def write_csv(path, count, rooms, overlap_every):
+    """Reservas consecutivas por habitación; cada overlap_every filas, una que repite las fechas anteriores"""
+    previous = {}
+    overlaps = 0
+    with open(path, 'w', newline='', encoding='utf-8') as output:
+        writer = csv.writer(output)
+        writer.writerow(FIELDS)
+        for i in range(count):
+            room = rooms[i % len(rooms)]
+            if overlap_every and i % overlap_every == overlap_every - 1 and room in previous:
+                check_in, check_out = previous[room]
+                overlaps += 1
+            else:
+                check_in = FIRST_DAY + timedelta(days=(i // len(rooms)) * 3)
+                check_out = check_in + timedelta(days=1 + i % 3)
+                previous[room] = (check_in, check_out)
+            writer.writerow([f'imp-{i:08d}', f'Huésped {i}', f'huesped{i}@example.com', room,
+                             check_in.isoformat(), check_out.isoformat(), '1', 'Confirmada'])
+    return overlaps
+
+
+def run_cli(argv):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        bulk_io.main(argv)
+    return json.loads(output.getvalue())
+
+
+def report(step, summary, rows, seconds):
+    rate = f'{rows / seconds:10.0f} filas/s' if seconds else '            -'
+    print(f'    {step:<22} {rows:>9} filas | {seconds:8.2f} s | {rate} | '
+          f'memoria máxima {summary["peak_memory_mb"]:.0f} MB')
+
+
+def run(size, args, work_dir, rooms):
+    import boto3
+    table_name = f'bench-bulk-{size}'
+    client = boto3.client('dynamodb', region_name='us-east-1', endpoint_url=args.endpoint_url)
+    client.create_table(
+        TableName=table_name,
+        KeySchema=[{'AttributeName': 'ReservationID', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'ReservationID', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST',
+    )
+    source = os.path.join(work_dir, f'reservas-{size}.csv')
+    overlaps = write_csv(source, size, rooms, args.overlap_every)
+    common = ['--table', table_name, '--region', 'us-east-1']
+    if args.endpoint_url:
+        common += ['--endpoint-url', args.endpoint_url]
+    print(f'{size:>10} reservas')
+
+    summary = run_cli(common + ['import', '--input', source, '--segments', str(args.segments),
+                                '--workers', str(args.workers)])
+    if summary['written'] != size - overlaps or summary['rejected_by_reason'] != ({'solapamiento': overlaps}
+                                                                                 if overlaps else {}):
+        raise AssertionError(f'Importación inesperada: {summary}')
+    report('validación', summary, summary['rows_read'], summary['validate_seconds'])
+    report(f'escritura ({args.workers} hilos)', summary, summary['written'], summary['write_seconds'])
+
+    targets = [('exportación JSONL', os.path.join(work_dir, f'export-{size}.jsonl')),
+               ('exportación CSV', os.path.join(work_dir, f'export-{size}.csv'))]
+    if not args.endpoint_url:
+        targets.append(('exportación S3', f's3://{BUCKET}/export-{size}.jsonl'))
+    for step, target in targets:
+        summary = run_cli(common + ['export', '--output', target, '--segments', str(args.segments)])
+        if summary['rows'] != size - overlaps:
+            raise AssertionError(f'Exportación incompleta: {summary}')
+        report(step, summary, summary['rows'], summary['seconds'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[20000])
+    parser.add_argument('--workers', type=int, default=4, help='Hilos de escritura de la importación')
+    parser.add_argument('--segments', type=int, default=8, help='Segmentos del scan (con moto siempre 1)')
+    parser.add_argument('--overlap-every', type=int, default=100, help='Una fila solapada cada N (0: ninguna)')
+    parser.add_argument('--endpoint-url', help='DynamoDB Local en lugar de moto')
+    args = parser.parse_args()
+
+    for name in ('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY'):
+        os.environ.setdefault(name, 'benchmark')
+    os.environ['AWS_DEFAULT_REGION'] = 'us-east-1'
+    mocks = []
+    if not args.endpoint_url:
+        from moto import mock_dynamodb, mock_s3
+        mocks = [mock_dynamodb(), mock_s3()]
+        for mock in mocks:
+            mock.start()
+        import boto3
+        boto3.client('s3', region_name='us-east-1').create_bucket(Bucket=BUCKET)
+        args.segments = 1
+
+    with open(os.path.join(ROOT, 'rooms.json'), encoding='utf-8') as catalog_file:
+        rooms = [str(room['RoomNumber']) for room in json.load(catalog_file)]
+    work_dir = tempfile.mkdtemp(prefix='bench-bulk-')
+    try:
+        for size in args.rows:
+            run(size, args, work_dir, rooms)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        for mock in mocks:
+            mock.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""Cuenta los ítems leídos por verificación de conflictos en la Lambda.
+
+Siembra una tabla DynamoDB simulada con moto (con el GSI RoomNumber/CheckInDate)
+y ejecuta check_reservation_conflicts con scan y con consulta por índice,
+sumando los ítems que DynamoDB leería en cada llamada.
+
+Uso:
+    pip install "moto[dynamodb]"
+    python benchmarks/bench_conflict_lookup.py --reservations 5000 --rooms 50
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TABLE_NAME = 'bench-HotelReservations'
+INDEX_NAME = 'RoomNumber-CheckInDate-index'
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+os.environ['DYNAMODB_TABLE'] = TABLE_NAME
+os.environ['ROOM_INDEX_NAME'] = INDEX_NAME
+
+from moto import mock_dynamodb  # noqa: E402
+
+
+class ReadCounter:
+    """Acumula los ítems leídos por cada Scan y Query.
+
+    Para Scan se usa ScannedCount. moto reporta como ScannedCount de un Query el
+    tamaño total de la tabla, así que para Query se repite la condición de clave
+    sin filtro con Select=COUNT, que es lo que DynamoDB leería realmente.
+    """
+
+    def __init__(self, count_client):
+        self.count_client = count_client
+        self.items = 0
+        self.calls = 0
+        self._query_params = None
+
+    def before_query(self, params, **kwargs):
+        self._query_params = params
+
+    def after_scan(self, parsed, **kwargs):
+        self.items += parsed.get('ScannedCount', 0)
+        self.calls += 1
+
+    def after_query(self, parsed, **kwargs):
+        params = dict(self._query_params)
+        params.pop('FilterExpression', None)
+        params['Select'] = 'COUNT'
+        key_values = {name: value for name, value in params['ExpressionAttributeValues'].items()
+                      if name in params['KeyConditionExpression']}
+        params['ExpressionAttributeValues'] = key_values
+        params.pop('ExpressionAttributeNames', None)
+        self.items += self.count_client.query(**params)['Count']
+        self.calls += 1
+
+
+def create_table(client):
+    client.create_table(
+        TableName=TABLE_NAME,
+        KeySchema=[{'AttributeName': 'ReservationID', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[
+            {'AttributeName': 'ReservationID', 'AttributeType': 'S'},
+            {'AttributeName': 'RoomNumber', 'AttributeType': 'S'},
+            {'AttributeName': 'CheckInDate', 'AttributeType': 'S'},
+        ],
+        GlobalSecondaryIndexes=[{
+            'IndexName': INDEX_NAME,
+            'KeySchema': [
+                {'AttributeName': 'RoomNumber', 'KeyType': 'HASH'},
+                {'AttributeName': 'CheckInDate', 'KeyType': 'RANGE'},
+            ],
+            'Projection': {'ProjectionType': 'ALL'},
+        }],
+        BillingMode='PAY_PER_REQUEST',
+    )
+
+
+def seed(table, count, rooms, rng):
+    base = date(2024, 1, 1).toordinal()
+    with table.batch_writer() as batch:
+        for i in range(count):
+            start = base + rng.randrange(730)
+            batch.put_item(Item={
+                'ReservationID': f'res-{i:08d}',
+                'RoomNumber': rooms[rng.randrange(len(rooms))],
+                'CheckInDate': date.fromordinal(start).isoformat(),
+                'CheckOutDate': date.fromordinal(start + rng.randint(1, 7)).isoformat(),
+                'Status': 'Confirmada',
+            })
+
+
+def measure(lambda_function, counter, checks):
+    counter.items = counter.calls = 0
+    started = time.perf_counter()
+    conflicts = 0
+    for room, check_in, check_out in checks:
+        conflicts += len(lambda_function.check_reservation_conflicts(room, check_in, check_out, 'res-nueva'))
+    elapsed = time.perf_counter() - started
+    return counter.items / len(checks), counter.calls / len(checks), elapsed / len(checks), conflicts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reservations', type=int, default=5000)
+    parser.add_argument('--rooms', type=int, default=50)
+    parser.add_argument('--checks', type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    rooms = [str(100 + i) for i in range(args.rooms)]
+
+    with mock_dynamodb():
+        import boto3
+        create_table(boto3.client('dynamodb'))
+
+        import builtins
+        real_print = builtins.print
+        builtins.print = lambda *a, **k: None  # La Lambda imprime cada paso; se silencia para medir
+        try:
+            import lambda_function
+        finally:
+            builtins.print = real_print
+
+        seed(boto3.resource('dynamodb').Table(TABLE_NAME), args.reservations, rooms, rng)
+        # Cliente propio para que las consultas de conteo no pasen por el contador
+        counter = ReadCounter(boto3.client('dynamodb'))
+        events = lambda_function.get_client('dynamodb').meta.events
+        events.register('after-call.dynamodb.Scan', counter.after_scan)
+        events.register('provide-client-params.dynamodb.Query', counter.before_query)
+        events.register('after-call.dynamodb.Query', counter.after_query)
+
+        base = date(2024, 1, 1).toordinal()
+        checks = []
+        for _ in range(args.checks):
+            start = base + rng.randrange(730)
+            checks.append((rooms[rng.randrange(len(rooms))], date.fromordinal(start).isoformat(),
+                           date.fromordinal(start + 3).isoformat()))
+
+        results = {}
+        builtins.print = lambda *a, **k: None
+        try:
+            lambda_function.ROOM_INDEX_NAME = None
+            results['scan'] = measure(lambda_function, counter, checks)
+            lambda_function.ROOM_INDEX_NAME = INDEX_NAME
+            results['query'] = measure(lambda_function, counter, checks)
+        finally:
+            builtins.print = real_print
+
+    if results['scan'][3] != results['query'][3]:
+        raise AssertionError('El scan y la consulta por índice encontraron conflictos distintos')
+    print(f'{args.reservations} reservas en {args.rooms} habitaciones, {args.checks} verificaciones')
+    for name, (items, calls, seconds, conflicts) in results.items():
+        print(f'{name:>6}: {items:10.1f} ítems leídos/verificación | {calls:5.1f} llamadas | '
+              f'{seconds * 1000:8.2f} ms | {conflicts} conflictos')
+
+
+if __name__ == '__main__':
+    main()
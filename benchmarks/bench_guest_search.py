@@ -0,0 +1,144 @@
+"""Latencia de /api/reservations/search: índice por huésped contra un recorrido completo.
+
+Uso:
+    python benchmarks/bench_guest_search.py --sizes 100000 1000000
+
+Por tamaño se reporta el tiempo de construcción del índice (lo que tarda la
+primera búsqueda después del scan), la memoria máxima del proceso y la
+latencia p50/p99 de cada tipo de consulta. El recorrido se mide sin el costo
+del scan: solo el filtro en Python sobre las reservas ya cargadas, que es una
+cota inferior de lo que cuesta hoy buscar en /reservations.
+"""
+import argparse
+import os
+import random
+import resource
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from guest_search import GuestSearchIndex, name_tokens, normalize  # noqa: E402
+
+FIRST_NAMES = ['María', 'José', 'Juan', 'Ana', 'Luis', 'Carmen', 'Sofía', 'Andrés', 'Lucía', 'Martín',
+               'Valentina', 'Camilo', 'Daniela', 'Sebastián', 'Isabel', 'Tomás', 'Elena', 'Óscar', 'Inés', 'Raúl']
+LAST_NAMES = ['García', 'Rodríguez', 'Martínez', 'López', 'González', 'Pérez', 'Sánchez', 'Ramírez', 'Torres',
+              'Flores', 'Rivera', 'Gómez', 'Díaz', 'Cruz', 'Morales', 'Ortiz', 'Gutiérrez', 'Chávez', 'Ruiz',
+              'Álvarez', 'Jiménez', 'Muñoz', 'Castillo', 'Vargas', 'Romero', 'Herrera', 'Medina', 'Aguilar']
+STATUSES = ['Pendiente', 'Confirmada', 'Conflicto', 'Cancelada']
+
+
+def synthetic_reservations(count, seed=42):
+    """Reservas con nombre y dos apellidos, correo único y entradas repartidas en 5 años"""
+    rng = random.Random(seed)
+    base = date(2022, 1, 1).toordinal()
+    for i in range(count):
+        first, last, second = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), rng.choice(LAST_NAMES)
+        start = base + rng.randrange(1825)
+        yield {
+            'ReservationID': f'res-{i:08d}',
+            'GuestName': f'{first} {last} {second}',
+            'ContactEmail': f'{normalize(first)}.{normalize(last)}{i}@example.com',
+            'RoomNumber': str(100 + rng.randrange(200)),
+            'CheckInDate': date.fromordinal(start).isoformat(),
+            'CheckOutDate': date.fromordinal(start + rng.randint(1, 14)).isoformat(),
+            'Status': rng.choice(STATUSES),
+        }
+
+
+def random_queries(reservations, count, seed=7):
+    """Consultas de cada tipo; los nombres y correos se toman de reservas existentes"""
+    rng = random.Random(seed)
+    base = date(2022, 1, 1)
+    queries = {'nombre (apellido)': [], 'nombre + apellido': [], 'correo': [], 'entrada (7 días)': [],
+               'nombre + entrada (30 días)': []}
+    for _ in range(count):
+        reservation = reservations[rng.randrange(len(reservations))]
+        first, last = reservation['GuestName'].split()[:2]
+        check_in = base + timedelta(days=rng.randrange(1825))
+        queries['nombre (apellido)'].append({'name': last[:4].lower()})
+        queries['nombre + apellido'].append({'name': f'{first[:3]} {last}'})
+        queries['correo'].append({'email': reservation['ContactEmail'].upper()})
+        queries['entrada (7 días)'].append({'check_in_from': check_in.isoformat(),
+                                            'check_in_to': (check_in + timedelta(days=6)).isoformat()})
+        queries['nombre + entrada (30 días)'].append({'name': last, 'check_in_from': check_in.isoformat(),
+                                                      'check_in_to': (check_in + timedelta(days=29)).isoformat()})
+    return queries
+
+
+def linear_search(reservations, name=None, email=None, check_in_from=None, check_in_to=None):
+    """El mismo filtro recorriendo todas las reservas"""
+    query_tokens = name_tokens(name) if name else ()
+    query_email = normalize(email) if email else None
+    matches = []
+    for reservation in reservations:
+        if query_email and normalize(reservation['ContactEmail']) != query_email:
+            continue
+        if check_in_from and reservation['CheckInDate'] < check_in_from:
+            continue
+        if check_in_to and reservation['CheckInDate'] > check_in_to:
+            continue
+        if query_tokens:
+            tokens = name_tokens(reservation['GuestName'])
+            if any(not any(token.startswith(query) for token in tokens) for query in query_tokens):
+                continue
+        matches.append(reservation['ReservationID'])
+    return matches
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values))) - 1))]
+
+
+def peak_memory_mb():
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def run(size, queries_per_type, linear_queries, limit):
+    reservations = list(synthetic_reservations(size))
+    memory_before = peak_memory_mb()
+    index = GuestSearchIndex()
+    started = time.perf_counter()
+    index.rebuild(reservations)
+    build_seconds = time.perf_counter() - started
+    print(f'{size:>10} reservas | construcción {build_seconds:6.2f} s | '
+          f'memoria máxima {memory_before:.0f} -> {peak_memory_mb():.0f} MB')
+
+    for kind, queries in random_queries(reservations, queries_per_type).items():
+        latencies = []
+        totals = 0
+        for query in queries:
+            started = time.perf_counter()
+            _, total = index.search(limit=limit, **query)
+            latencies.append(time.perf_counter() - started)
+            totals += total
+        latencies.sort()
+
+        started = time.perf_counter()
+        for query in queries[:linear_queries]:
+            expected = linear_search(reservations, **query)
+            results, total = index.search(limit=len(expected) or 1, **query)
+            if total != len(expected) or sorted(expected) != sorted(r['ReservationID'] for r in results):
+                raise AssertionError(f'Resultados distintos para {query}')
+        linear_seconds = (time.perf_counter() - started) / linear_queries
+
+        print(f'    {kind:<28} p50 {percentile(latencies, 0.5) * 1000:8.3f} ms | '
+              f'p99 {percentile(latencies, 0.99) * 1000:8.3f} ms | '
+              f'{totals / len(queries):9.1f} coincidencias | recorrido {linear_seconds * 1000:9.1f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--queries', type=int, default=500, help='Consultas medidas por tipo')
+    parser.add_argument('--linear-queries', type=int, default=2, help='Consultas verificadas con el recorrido')
+    parser.add_argument('--limit', type=int, default=50, help='Resultados devueltos por consulta')
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        run(size, args.queries, args.linear_queries, args.limit)
+
+
+if __name__ == '__main__':
+    main()
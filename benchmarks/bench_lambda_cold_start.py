@@ -0,0 +1,91 @@
+"""Mide el tiempo de importación en frío de lambda_function.py.
+
+Cada medición corre en un intérprete nuevo. Por defecto boto3 y botocore se
+reemplazan por módulos vacíos para aislar el costo propio del módulo; con
+--real-botocore se usan los reales y se mide además la creación de clientes.
+
+Uso:
+    python benchmarks/bench_lambda_cold_start.py --runs 20
+    git show <commit>:lambda_function.py > /tmp/lambda_anterior.py
+    python benchmarks/bench_lambda_cold_start.py --path /tmp/lambda_anterior.py
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Se ejecuta en el proceso hijo: instala los stubs (si aplica), importa el
+# módulo indicado y devuelve los tiempos en JSON por stdout
+CHILD_SCRIPT = r'''
+import importlib.util, json, os, sys, time, types
+
+path, stub = sys.argv[1], sys.argv[2] == "1"
+if stub:
+    class _StubClient:
+        def __getattr__(self, name):
+            return lambda *args, **kwargs: {}
+    class _StubResource(_StubClient):
+        def Table(self, name):
+            return _StubClient()
+    boto3 = types.ModuleType("boto3")
+    boto3.client = lambda *args, **kwargs: _StubClient()
+    boto3.resource = lambda *args, **kwargs: _StubResource()
+    sys.modules["boto3"] = boto3
+    sys.modules["botocore"] = types.ModuleType("botocore")
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("DYNAMODB_TABLE", "bench-HotelReservations")
+real_stdout = sys.stdout
+sys.stdout = open(os.devnull, "w")
+started = time.perf_counter()
+spec = importlib.util.spec_from_file_location("lambda_function", path)
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+result = {"import_ms": (time.perf_counter() - started) * 1000}
+if hasattr(module, "get_client") and not stub:
+    started = time.perf_counter()
+    module.get_client("dynamodb")
+    result["dynamodb_client_ms"] = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    module.get_client("sns")
+    result["sns_client_ms"] = (time.perf_counter() - started) * 1000
+sys.stdout = real_stdout
+print(json.dumps(result))
+'''
+
+
+def measure(path, stub, runs):
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', CHILD_SCRIPT, path, '1' if stub else '0'],
+            check=True, capture_output=True, text=True
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        name: {
+            'median_ms': round(statistics.median(sample[name] for sample in samples), 3),
+            'min_ms': round(min(sample[name] for sample in samples), 3),
+        }
+        for name in samples[0]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--path', default=os.path.join(REPO_ROOT, 'lambda_function.py'))
+    parser.add_argument('--runs', type=int, default=15)
+    parser.add_argument('--real-botocore', action='store_true', help='Usar boto3/botocore reales')
+    args = parser.parse_args()
+
+    result = measure(os.path.abspath(args.path), not args.real_botocore, args.runs)
+    print(json.dumps({'path': args.path, 'stubbed_botocore': not args.real_botocore,
+                      'runs': args.runs, 'timings': result}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""Mide el costo del logging de la Lambda por registro del stream.
+
+El acceso a DynamoDB y SNS se reemplaza por funciones vacías para aislar el
+procesamiento y el logging. La salida va a un flujo que solo cuenta bytes
+(aproximación del volumen que se ingiere en CloudWatch). Escenarios:
+  - sin logs: nivel CRITICAL, referencia del procesamiento puro
+  - prints anteriores: sin logs más los print/json.dumps que hacía la versión anterior
+  - INFO: una línea por registro más el resumen del lote, con el muestreo indicado
+  - DEBUG: incluye el evento completo y las reservas extraídas
+
+Uso:
+    python benchmarks/bench_logging_overhead.py --batch-size 100 --batches 100
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import lambda_function  # noqa: E402
+
+
+class CountingStream:
+    """Descarta lo escrito y cuenta los bytes"""
+
+    def __init__(self):
+        self.bytes = 0
+
+    def write(self, text):
+        self.bytes += len(text.encode('utf-8'))
+
+    def flush(self):
+        pass
+
+
+def synthetic_events(batch_size, batches):
+    """Lotes sin solapamientos: 20 habitaciones con estadías consecutivas"""
+    start = datetime.date(2025, 1, 1)
+    events = []
+    number = 0
+    for _ in range(batches):
+        records = []
+        for _ in range(batch_size):
+            check_in = start + datetime.timedelta(days=3 * (number // 20))
+            image = {
+                'ReservationID': {'S': f'res-{number:08d}'},
+                'GuestName': {'S': 'María Pérez'},
+                'ContactEmail': {'S': f'huesped{number}@example.com'},
+                'RoomNumber': {'S': str(100 + number % 20)},
+                'CheckInDate': {'S': check_in.isoformat()},
+                'CheckOutDate': {'S': (check_in + datetime.timedelta(days=2)).isoformat()},
+                'Guests': {'S': '2'},
+                'Comments': {'S': 'Llegada tarde, requiere cuna.'},
+                'Status': {'S': 'Pendiente'},
+                'CreatedAt': {'S': '2025-01-01T10:00:00.000000'},
+            }
+            records.append({
+                'eventID': f'evento-{number}',
+                'eventName': 'INSERT',
+                'dynamodb': {
+                    'SequenceNumber': f'{number:021d}',
+                    'Keys': {'ReservationID': image['ReservationID']},
+                    'NewImage': image,
+                },
+            })
+            number += 1
+        events.append({'Records': records})
+    return events
+
+
+def legacy_prints(event, encoder):
+    """Reproduce las líneas que imprimía la versión anterior por lote y por registro"""
+    print("\n========== INICIO DE EJECUCIÓN ==========")
+    print(f"Evento recibido: {json.dumps(event, cls=encoder)}")
+    for record in event['Records']:
+        reservation = lambda_function.from_dynamodb_item(record['dynamodb']['NewImage'])
+        print(f"Procesando registro: {json.dumps(record, cls=encoder)}")
+        print("\n=== PROCESANDO EVENTO DYNAMODB STREAM ===")
+        print(f"Reserva extraída del stream: {json.dumps(reservation, cls=encoder)}")
+        print(f"\n=== VERIFICANDO CONFLICTOS ===")
+        print(f"Habitación: {reservation['RoomNumber']}")
+        print(f"Check-in: {reservation['CheckInDate']}")
+        print(f"Check-out: {reservation['CheckOutDate']}")
+        print(f"ID de reserva actual: {reservation['ReservationID']}")
+        print("Encontradas 0 reservas para verificar")
+        print("Total de conflictos encontrados: 0")
+        print(f"\n=== ACTUALIZANDO ESTADO DE RESERVA ===")
+        print(f"ID: {reservation['ReservationID']}, Nuevo estado: Confirmada")
+        print(f"Actualización exitosa: {{'Status': 'Confirmada', 'UpdatedAt': '{datetime.datetime.now().isoformat()}'}}")
+    print("========== FIN DE EJECUCIÓN ==========")
+
+
+def run(name, events, level, sample_rate=1.0, legacy=False):
+    stream = CountingStream()
+    lambda_function.log_handler.setStream(stream)
+    lambda_function.logger.setLevel(level)
+    lambda_function.LOG_SAMPLE_RATE = sample_rate
+    real_stdout = sys.stdout
+    sys.stdout = stream
+    try:
+        started = time.perf_counter()
+        for event in events:
+            if legacy:
+                legacy_prints(event, lambda_function.DecimalEncoder)
+            lambda_function.lambda_handler(event, None)
+        elapsed = time.perf_counter() - started
+    finally:
+        sys.stdout = real_stdout
+    record_count = sum(len(event['Records']) for event in events)
+    print(f'{name:>22}: {elapsed / record_count * 1e6:8.2f} µs/registro | '
+          f'{stream.bytes / record_count:8.0f} bytes/registro')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--batches', type=int, default=100)
+    args = parser.parse_args()
+
+    # Sin acceso a AWS: ninguna reserva existente y todas las escrituras exitosas
+    lambda_function.find_room_reservations = lambda *args, **kwargs: []
+    lambda_function.update_reservation_status = lambda reservation_id, new_status: True
+    events = synthetic_events(args.batch_size, args.batches)
+    # Crear el cliente (vacío) antes de medir
+    lambda_function._clients['dynamodb'] = object()
+
+    run('sin logs', events, logging.CRITICAL)
+    run('prints anteriores', events, logging.CRITICAL, legacy=True)
+    run('INFO muestreo 1.0', events, logging.INFO, 1.0)
+    run('INFO muestreo 0.1', events, logging.INFO, 0.1)
+    run('WARNING', events, logging.WARNING)
+    run('DEBUG', events, logging.DEBUG)
+
+
+if __name__ == '__main__':
+    main()
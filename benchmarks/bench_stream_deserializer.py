@@ -0,0 +1,123 @@
+"""Micro-benchmark de la conversión de NewImage de los registros del stream.
+
+Compara, sobre lotes sintéticos con la forma de las reservas reales:
+  - original: la cadena de `if 'S' in value` anterior (sin el print con json.dumps)
+  - original+json: lo mismo más el json.dumps que hacía para imprimir la reserva
+  - completo: deserialize_attribute sobre la imagen completa
+  - proyección: solo los campos que usa la verificación de conflictos
+  - boto3: TypeDeserializer de boto3, si está instalado
+
+Uso:
+    python benchmarks/bench_stream_deserializer.py --batch-size 100 --batches 200
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import lambda_function  # noqa: E402
+
+
+def legacy_convert(new_image):
+    """Copia del conversor original de process_dynamodb_stream_event"""
+    reservation = {}
+    for key, value in new_image.items():
+        if 'S' in value:
+            reservation[key] = value['S']
+        elif 'N' in value:
+            reservation[key] = Decimal(value['N'])
+        elif 'BOOL' in value:
+            reservation[key] = value['BOOL']
+        elif 'NULL' in value:
+            reservation[key] = None
+        elif 'M' in value:
+            inner_map = {}
+            for inner_key, inner_value in value['M'].items():
+                if 'S' in inner_value:
+                    inner_map[inner_key] = inner_value['S']
+                elif 'N' in inner_value:
+                    inner_map[inner_key] = Decimal(inner_value['N'])
+                elif 'NULL' in inner_value:
+                    inner_map[inner_key] = None
+            reservation[key] = inner_map
+    return reservation
+
+
+def synthetic_image(rng, number):
+    """NewImage con los atributos que escribe app.py y algunos anidados"""
+    return {
+        'ReservationID': {'S': f'{number:08d}-5f1e-4c2b-9a3d-{rng.getrandbits(48):012x}'},
+        'GuestName': {'S': rng.choice(['María Pérez', 'John Smith', 'Ana Gómez', 'Luis Díaz'])},
+        'ContactEmail': {'S': f'huesped{number}@example.com'},
+        'RoomNumber': {'S': rng.choice(['101', '102', '103', '201', '202', '301'])},
+        'CheckInDate': {'S': '2025-03-%02d' % rng.randint(1, 20)},
+        'CheckOutDate': {'S': '2025-03-%02d' % rng.randint(21, 28)},
+        'Guests': {'S': str(rng.randint(1, 4))},
+        'Comments': {'S': 'Llegada tarde, requiere cuna. ' * rng.randint(1, 3)},
+        'DocumentID': {'S': f'{number:08d}_documento.pdf'},
+        'DocumentUploadStatus': {'S': 'Subido'},
+        'Status': {'S': 'Pendiente'},
+        'CreatedAt': {'S': '2025-02-01T10:00:00.000000'},
+        'UpdatedAt': {'S': '2025-02-01T10:00:00.000000'},
+        'Version': {'N': '1'},
+        'Preferences': {'M': {
+            'Floor': {'N': str(rng.randint(1, 3))},
+            'Pillows': {'L': [{'S': 'pluma'}, {'S': 'espuma'}]},
+            'Extras': {'SS': ['desayuno', 'parqueadero']},
+        }},
+    }
+
+
+def synthetic_batches(batch_size, batches, seed=42):
+    rng = random.Random(seed)
+    number = 0
+    result = []
+    for _ in range(batches):
+        records = []
+        for _ in range(batch_size):
+            records.append({'eventName': 'INSERT', 'dynamodb': {'NewImage': synthetic_image(rng, number)}})
+            number += 1
+        result.append(records)
+    return result
+
+
+def timed(name, batches, convert, record_count):
+    started = time.perf_counter()
+    for records in batches:
+        for record in records:
+            convert(record['dynamodb']['NewImage'])
+    elapsed = time.perf_counter() - started
+    print(f'{name:>14}: {elapsed / record_count * 1e6:8.2f} µs/registro | '
+          f'{record_count / elapsed:12,.0f} registros/s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--batches', type=int, default=200)
+    args = parser.parse_args()
+
+    batches = synthetic_batches(args.batch_size, args.batches)
+    record_count = args.batch_size * args.batches
+    encoder = lambda_function.DecimalEncoder
+
+    timed('original', batches, legacy_convert, record_count)
+    timed('original+json', batches, lambda image: json.dumps(legacy_convert(image), cls=encoder), record_count)
+    timed('completo', batches, lambda_function.from_dynamodb_item, record_count)
+    fields = lambda_function.RESERVATION_FIELDS
+    timed('proyección', batches, lambda image: lambda_function.from_dynamodb_item(image, fields), record_count)
+    try:
+        from boto3.dynamodb.types import TypeDeserializer
+    except ImportError:
+        return
+    deserializer = TypeDeserializer()
+    timed('boto3', batches, lambda image: {k: deserializer.deserialize(v) for k, v in image.items()}, record_count)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,443 @@
+"""Suite de benchmarks de la aplicación y la Lambda contra AWS simulado (moto).
+
+Todo corre en el proceso y sin red: DynamoDB, S3 y SNS se simulan con moto,
+las rutas de Flask se llaman con el cliente de pruebas y la Lambda recibe
+lotes sintéticos del stream. Por escenario se reporta el rendimiento
+(operaciones por segundo), la latencia p50/p95/p99 y los ítems de DynamoDB
+leídos por operación (ScannedCount de Scan/Query, ítems de GetItem y
+BatchGetItem). Los tiempos absolutos incluyen el costo de moto: sirven para
+comparar commits en la misma máquina, no como latencia real de AWS.
+
+Escenarios: list (primera página de /reservations), view (detalle de una
+reserva), create (alta sin documento), create_document (alta con documento),
+availability (/rooms/availability), availability_search (varios rangos en
+/rooms/availability/search) y lambda (lotes del stream).
+
+Requiere moto (pip install "moto[dynamodb,s3,sns]<4"); no es dependencia de
+la aplicación.
+
+Uso:
+    python benchmarks/run_suite.py --reservations 2000 --output resultado.json
+    python benchmarks/run_suite.py --scenarios list,view --operations 500
+    python benchmarks/run_suite.py --compare base.json --output nuevo.json
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SCENARIOS = ('list', 'view', 'create', 'create_document', 'availability', 'availability_search', 'lambda')
+ROOM_INDEX_NAME = 'RoomNumber-CheckInDate-index'
+BUCKET = 'benchmark-hotel-reservations'
+FIRST_DAY = date(2025, 1, 1)
+
+
+class ItemsReadCounter:
+    """Cuenta los ítems que devuelve o recorre DynamoDB (hook after-call de botocore)"""
+
+    def __init__(self):
+        self.items = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, model, parsed=None, **kwargs):
+        parsed = parsed or {}
+        if model.name in ('Scan', 'Query'):
+            items = parsed.get('ScannedCount', parsed.get('Count', 0))
+        elif model.name == 'GetItem':
+            items = 1 if 'Item' in parsed else 0
+        elif model.name in ('BatchGetItem', 'TransactGetItems'):
+            responses = parsed.get('Responses', {})
+            items = sum(map(len, responses.values())) if isinstance(responses, dict) else len(responses)
+        else:
+            return
+        with self._lock:
+            self.items += items
+
+    def take(self):
+        with self._lock:
+            items, self.items = self.items, 0
+        return items
+
+
+def percentile(sorted_values, fraction):
+    """Percentil por rango más cercano sobre una lista ordenada"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, wall_seconds, items_read, statuses, units=None):
+    latencies = sorted(latencies)
+    operations = len(latencies)
+    result = {
+        'operations': operations,
+        'wall_seconds': round(wall_seconds, 4),
+        'throughput_per_second': round(operations / wall_seconds, 2) if wall_seconds else None,
+        'latency_ms': {
+            'mean': round(sum(latencies) / operations * 1000, 3) if operations else None,
+            'p50': round(percentile(latencies, 0.50) * 1000, 3) if operations else None,
+            'p95': round(percentile(latencies, 0.95) * 1000, 3) if operations else None,
+            'p99': round(percentile(latencies, 0.99) * 1000, 3) if operations else None,
+            'max': round(latencies[-1] * 1000, 3) if operations else None,
+        },
+        'dynamodb_items_read_per_operation': round(items_read / operations, 2) if operations else None,
+        'status_codes': dict(sorted(statuses.items())),
+    }
+    if units:
+        result.update(units)
+    return result
+
+
+def start_mocks():
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'benchmark')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'benchmark')
+    from moto import mock_dynamodb, mock_s3, mock_sns
+    mocks = [mock_dynamodb(), mock_s3(), mock_sns()]
+    for mock in mocks:
+        mock.start()
+    return mocks
+
+
+def create_resources(table_name):
+    import boto3
+    boto3.client('dynamodb', region_name='us-east-1').create_table(
+        TableName=table_name,
+        KeySchema=[{'AttributeName': 'ReservationID', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[
+            {'AttributeName': 'ReservationID', 'AttributeType': 'S'},
+            {'AttributeName': 'RoomNumber', 'AttributeType': 'S'},
+            {'AttributeName': 'CheckInDate', 'AttributeType': 'S'},
+        ],
+        GlobalSecondaryIndexes=[{
+            'IndexName': ROOM_INDEX_NAME,
+            'KeySchema': [{'AttributeName': 'RoomNumber', 'KeyType': 'HASH'},
+                          {'AttributeName': 'CheckInDate', 'KeyType': 'RANGE'}],
+            'Projection': {'ProjectionType': 'ALL'},
+        }],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    boto3.client('s3', region_name='us-east-1').create_bucket(Bucket=BUCKET)
+    return boto3.client('sns', region_name='us-east-1').create_topic(Name='benchmark-conflictos')['TopicArn']
+
+
+def synthetic_reservation(rng, number, rooms, days, status='Confirmada'):
+    check_in = FIRST_DAY + timedelta(days=rng.randrange(days))
+    return {
+        'ReservationID': f'bench-{number:08d}',
+        'GuestName': f'Huésped {number}',
+        'ContactEmail': f'huesped{number}@example.com',
+        'RoomNumber': rng.choice(rooms),
+        'CheckInDate': check_in.isoformat(),
+        'CheckOutDate': (check_in + timedelta(days=rng.randint(1, 7))).isoformat(),
+        'Guests': str(rng.randint(1, 4)),
+        'Comments': '',
+        'Status': status,
+        'CreatedAt': datetime(2024, 12, 1).isoformat(),
+        'UpdatedAt': datetime(2024, 12, 1).isoformat(),
+    }
+
+
+def seed(table, count, rooms, days, rng):
+    reservations = [synthetic_reservation(rng, number, rooms, days) for number in range(count)]
+    with table.batch_writer() as batch:
+        for reservation in reservations:
+            batch.put_item(Item=reservation)
+    return reservations
+
+
+def run_operations(operation, count, concurrency):
+    """Ejecuta operation(i) count veces con concurrency hilos; devuelve latencias, estados y tiempo"""
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def timed(index):
+        started = time.perf_counter()
+        status = operation(index)
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    started = time.perf_counter()
+    if concurrency <= 1:
+        for index in range(count):
+            timed(index)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(timed, range(count)))
+    return latencies, statuses, time.perf_counter() - started
+
+
+def http_scenarios(app_module, reservations, args, rng):
+    """Operaciones de cada escenario HTTP: función(i) -> código de estado"""
+    local = threading.local()
+    document = b'%PDF-1.4\n' + os.urandom(args.document_kb * 1024)
+    rooms = parse_rooms(args)
+    created = iter(range(10 ** 9))
+    created_lock = threading.Lock()
+
+    def client():
+        if not hasattr(local, 'client'):
+            local.client = app_module.app.test_client()
+        return local.client
+
+    def get(path):
+        response = client().get(path)
+        try:
+            response.get_data()
+            return response.status_code
+        finally:
+            response.close()
+
+    def new_reservation_form(with_document):
+        with created_lock:
+            number = next(created)
+        check_in = FIRST_DAY + timedelta(days=rng.randrange(args.days))
+        form = {
+            'guest_name': f'Nuevo {number}',
+            'contact_email': f'nuevo{number}@example.com',
+            'room_number': rng.choice(rooms),
+            'check_in_date': check_in.isoformat(),
+            'check_out_date': (check_in + timedelta(days=rng.randint(1, 5))).isoformat(),
+            'guests': '2',
+            'comments': 'Reserva de benchmark',
+        }
+        if with_document:
+            form['identity_document'] = (io.BytesIO(document), f'documento-{number}.pdf')
+        return form
+
+    def post_new(with_document):
+        response = client().post('/reservation/new', data=new_reservation_form(with_document),
+                                 content_type='multipart/form-data')
+        response.close()
+        return response.status_code
+
+    def availability(_):
+        check_in = FIRST_DAY + timedelta(days=rng.randrange(args.days))
+        check_out = check_in + timedelta(days=rng.randint(1, 7))
+        return get(f'/rooms/availability?check_in={check_in.isoformat()}&check_out={check_out.isoformat()}')
+
+    def availability_search(_):
+        # Una página del buscador: varios rangos candidatos en una sola petición
+        first = FIRST_DAY + timedelta(days=rng.randrange(args.days))
+        ranges = []
+        for offset in range(args.search_ranges):
+            check_in = first + timedelta(days=offset)
+            ranges.append({'check_in': check_in.isoformat(),
+                           'check_out': (check_in + timedelta(days=rng.randint(1, 7))).isoformat()})
+        response = client().post('/rooms/availability/search', json={'ranges': ranges, 'guests': 2})
+        response.close()
+        return response.status_code
+
+    return {
+        'list': lambda _: get(f'/reservations?limit={args.page_size}'),
+        'view': lambda _: get(f"/reservation/{rng.choice(reservations)['ReservationID']}"),
+        'create': lambda _: post_new(False),
+        'create_document': lambda _: post_new(True),
+        'availability': availability,
+        'availability_search': availability_search,
+    }
+
+
+def parse_rooms(args):
+    if not args.rooms:
+        from room_catalog import RoomCatalog
+        return RoomCatalog.load(os.path.join(ROOT, 'rooms.json')).numbers()
+    return [room.strip() for room in args.rooms.split(',') if room.strip()]
+
+
+def stream_batches(reservations, batches, batch_size, conflict_ratio, rooms, days, rng):
+    """Registros INSERT del stream para reservas nuevas; una parte se solapa con reservas existentes"""
+    from boto3.dynamodb.types import TypeSerializer
+    serializer = TypeSerializer()
+    events = []
+    new_items = []
+    number = 10 ** 7
+    sequence = 0
+    for _ in range(batches):
+        records = []
+        for _ in range(batch_size):
+            reservation = synthetic_reservation(rng, number, rooms, days, status='Pendiente')
+            reservation['CreatedAt'] = datetime.now().isoformat()
+            if reservations and rng.random() < conflict_ratio:
+                existing = rng.choice(reservations)
+                reservation.update(RoomNumber=existing['RoomNumber'], CheckInDate=existing['CheckInDate'],
+                                   CheckOutDate=existing['CheckOutDate'])
+            image = {key: serializer.serialize(value) for key, value in reservation.items()}
+            records.append({
+                'eventID': f'evento-{sequence}',
+                'eventName': 'INSERT',
+                'dynamodb': {
+                    'SequenceNumber': f'{sequence:021d}',
+                    'Keys': {'ReservationID': image['ReservationID']},
+                    'NewImage': image,
+                },
+            })
+            new_items.append(reservation)
+            number += 1
+            sequence += 1
+        events.append({'Records': records})
+    return events, new_items
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous, current):
+    """Tabla de variaciones respecto de un resultado anterior (a stderr)"""
+    lines = [f"Comparación con {previous.get('commit')} -> {current.get('commit')}"]
+    for name, result in current['scenarios'].items():
+        before = previous.get('scenarios', {}).get(name)
+        if not before:
+            continue
+        changes = []
+        for label, getter in (
+            ('ops/s', lambda r: r['throughput_per_second']),
+            ('p50', lambda r: r['latency_ms']['p50']),
+            ('p95', lambda r: r['latency_ms']['p95']),
+            ('p99', lambda r: r['latency_ms']['p99']),
+            ('ítems/op', lambda r: r['dynamodb_items_read_per_operation']),
+        ):
+            old, new = getter(before), getter(result)
+            if old:
+                changes.append(f'{label} {old} -> {new} ({(new - old) / old * 100:+.1f}%)')
+            else:
+                changes.append(f'{label} {old} -> {new}')
+        lines.append(f'  {name:>16}: ' + ' | '.join(changes))
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reservations', type=int, default=2000, help='Reservas sembradas antes de medir')
+    parser.add_argument('--operations', type=int, default=200, help='Operaciones por escenario HTTP')
+    parser.add_argument('--concurrency', type=int, default=1, help='Hilos que llaman a la aplicación')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--rooms', help='Habitaciones separadas por comas (por defecto, las de rooms.json)')
+    parser.add_argument('--search-ranges', type=int, default=20, help='Rangos por consulta de availability_search')
+    parser.add_argument('--days', type=int, default=365, help='Rango de fechas de las reservas')
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--document-kb', type=int, default=256)
+    parser.add_argument('--lambda-batches', type=int, default=20)
+    parser.add_argument('--lambda-batch-size', type=int, default=100)
+    parser.add_argument('--conflict-ratio', type=float, default=0.1)
+    parser.add_argument('--no-room-index', action='store_true', help='Lambda sin ROOM_INDEX_NAME (scan de la tabla)')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help='Archivo JSON de resultados (por defecto, stdout)')
+    parser.add_argument('--compare', help='Resultado anterior para mostrar las variaciones')
+    args = parser.parse_args()
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Escenarios desconocidos: {', '.join(sorted(unknown))}")
+    rng = random.Random(args.seed)
+    rooms = parse_rooms(args)
+
+    mocks = start_mocks()
+    work_dir = os.getcwd()
+    storage_dir = tempfile.mkdtemp(prefix='bench-suite-')
+    try:
+        table_name = 'semillero-[USUARIO]-HotelReservations'
+        topic_arn = create_resources(table_name)
+        os.environ.update(DYNAMODB_TABLE=table_name, SNS_TOPIC_ARN=topic_arn, LOG_LEVEL='ERROR')
+        if not args.no_room_index:
+            os.environ['ROOM_INDEX_NAME'] = ROOM_INDEX_NAME
+        # app.py crea local_storage en el directorio actual: usar uno temporal
+        os.chdir(storage_dir)
+        import app as app_module
+        import lambda_function
+        lambda_function.log_handler.setStream(io.StringIO())
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        app_module.S3_BUCKET_NAME = BUCKET
+        app_module.upload_pipeline.bucket = BUCKET
+        app_module.document_cache.bucket = BUCKET
+
+        counter = ItemsReadCounter()
+        app_module.dynamodb.meta.client.meta.events.register('after-call.dynamodb', counter)
+        lambda_function.get_client('dynamodb').meta.events.register('after-call.dynamodb', counter)
+
+        started = time.perf_counter()
+        reservations = seed(app_module.table, args.reservations, rooms, args.days, rng)
+        seed_seconds = time.perf_counter() - started
+
+        operations = http_scenarios(app_module, reservations, args, rng)
+        results = {}
+        for name in scenarios:
+            counter.take()
+            if name == 'lambda':
+                events, new_items = stream_batches(reservations, args.lambda_batches, args.lambda_batch_size,
+                                                   args.conflict_ratio, rooms, args.days, rng)
+                # Las reservas del stream ya están escritas, como cuando llega el evento
+                with app_module.table.batch_writer() as batch:
+                    for item in new_items:
+                        batch.put_item(Item=item)
+                counter.take()
+                latencies, statuses, wall_seconds = run_operations(
+                    lambda index: lambda_function.lambda_handler(events[index], None).get('statusCode'),
+                    len(events), 1)
+                records = sum(len(event['Records']) for event in events)
+                items_read = counter.take()
+                results[name] = summarize(latencies, wall_seconds, items_read, statuses, {
+                    'records': records,
+                    'records_per_second': round(records / wall_seconds, 2) if wall_seconds else None,
+                    'dynamodb_items_read_per_record': round(items_read / records, 2) if records else None,
+                })
+                continue
+            latencies, statuses, wall_seconds = run_operations(operations[name], args.operations, args.concurrency)
+            results[name] = summarize(latencies, wall_seconds, counter.take(), statuses)
+            if name == 'create_document':
+                drain_started = time.perf_counter()
+                app_module.upload_pipeline.drain(timeout=300)
+                results[name]['upload_drain_seconds'] = round(time.perf_counter() - drain_started, 3)
+                results[name]['document_uploads'] = app_module.upload_pipeline.stats()
+
+        report = {
+            'suite': 'hotel-reservations',
+            'commit': git_commit(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'config': vars(args),
+            'seed_seconds': round(seed_seconds, 3),
+            'scenarios': results,
+        }
+    finally:
+        os.chdir(work_dir)
+        shutil.rmtree(storage_dir, ignore_errors=True)
+        for mock in mocks:
+            mock.stop()
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            output.write(text + '\n')
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as previous:
+            print(compare(json.load(previous), report), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+"""Reserva síncrona con bloqueo de noches por habitación.
+
+Cada noche ocupada de una habitación es un ítem de la tabla de noches con
+clave SlotID = "<habitación>#<fecha>" y el ReservationID que la ocupa. La
+reserva y sus noches se escriben en una sola transacción con condiciones:
+si alguna noche ya pertenece a otra reserva, la transacción se cancela y la
+petición falla de inmediato en lugar de esperar a que la Lambda marque el
+conflicto. Las reservas escritas así llevan SlotsClaimed = True y la Lambda
+solo las confirma.
+"""
+from datetime import datetime, timedelta
+
+from botocore.exceptions import ClientError
+
+# Límite de operaciones de TransactWriteItems
+MAX_TRANSACTION_ITEMS = 100
+
+
+class SlotsUnavailable(Exception):
+    """Alguna de las noches solicitadas ya está ocupada por otra reserva"""
+
+    def __init__(self, room_number, nights):
+        self.room_number = room_number
+        self.nights = sorted(nights)
+        if self.nights:
+            detail = ', '.join(self.nights)
+        else:
+            detail = 'las fechas solicitadas'
+        super().__init__(f'La habitación {room_number} no está disponible para: {detail}')
+
+
+class ReservationChanged(Exception):
+    """La reserva cambió (habitación, fechas, estado o versión) mientras se editaba"""
+
+    def __init__(self, reservation_id):
+        self.reservation_id = reservation_id
+        super().__init__('La reserva fue modificada por otra operación; vuelva a intentarlo')
+
+
+def stay_nights(check_in_date, check_out_date):
+    """Fechas (YYYY-MM-DD) de las noches entre check-in y check-out"""
+    check_in = datetime.strptime(check_in_date, '%Y-%m-%d').date()
+    check_out = datetime.strptime(check_out_date, '%Y-%m-%d').date()
+    if check_out <= check_in:
+        raise ValueError('La fecha de salida debe ser posterior a la fecha de entrada')
+    return [(check_in + timedelta(days=offset)).isoformat() for offset in range((check_out - check_in).days)]
+
+
+def slot_id(room_number, night):
+    return f'{room_number}#{night}'
+
+
+def slot_item(slot, reservation_id):
+    """Ítem de la tabla de noches que deja una noche a nombre de una reserva"""
+    room_number, night = slot.split('#', 1)
+    return {'SlotID': slot, 'ReservationID': reservation_id, 'RoomNumber': room_number, 'Night': night}
+
+
+def claimed_slots(reservation):
+    """SlotIDs que tiene tomados una reserva según su último estado guardado"""
+    if not reservation.get('SlotsClaimed') or reservation.get('Status') == 'Cancelada':
+        return set()
+    nights = stay_nights(reservation['CheckInDate'], reservation['CheckOutDate'])
+    return {slot_id(reservation['RoomNumber'], night) for night in nights}
+
+
+class SlotBooking:
+    """Escrituras transaccionales de reservas y de sus noches"""
+
+    def __init__(self, client, reservations_table, slots_table):
+        # client: cliente de bajo nivel de un recurso boto3 (acepta tipos de Python)
+        self.client = client
+        self.reservations_table = reservations_table
+        self.slots_table = slots_table
+        self.transactions = 0
+        self.rejected = 0
+
+    def _claim(self, slot, reservation_id):
+        return {'Put': {
+            'TableName': self.slots_table,
+            'Item': slot_item(slot, reservation_id),
+            'ConditionExpression': 'attribute_not_exists(SlotID) OR ReservationID = :rid',
+            'ExpressionAttributeValues': {':rid': reservation_id},
+        }}
+
+    def _release(self, slot, reservation_id):
+        # Nunca liberar una noche que ya tomó otra reserva
+        return {'Delete': {
+            'TableName': self.slots_table,
+            'Key': {'SlotID': slot},
+            'ConditionExpression': 'attribute_not_exists(SlotID) OR ReservationID = :rid',
+            'ExpressionAttributeValues': {':rid': reservation_id},
+        }}
+
+    def _unchanged_condition(self, current):
+        """Condición de que la reserva no cambió desde la lectura: habitación, fechas, estado y Version.
+
+        Las noches que se liberan o toman se calculan sobre esa lectura; si
+        entre tanto otra operación la canceló (y otra reserva tomó sus noches)
+        la transacción debe fallar en lugar de reactivarla sin noches.
+        """
+        expression = 'RoomNumber = :prev_rn AND CheckInDate = :prev_ci AND CheckOutDate = :prev_co'
+        values = {
+            ':prev_rn': current['RoomNumber'],
+            ':prev_ci': current['CheckInDate'],
+            ':prev_co': current['CheckOutDate'],
+        }
+        if current.get('Status') is None:
+            expression += ' AND attribute_not_exists(#status)'
+        else:
+            expression += ' AND #status = :prev_status'
+            values[':prev_status'] = current['Status']
+        if current.get('Version') is None:
+            expression += ' AND attribute_not_exists(Version)'
+        else:
+            expression += ' AND Version = :prev_version'
+            values[':prev_version'] = current['Version']
+        return {
+            'ConditionExpression': expression,
+            'ExpressionAttributeNames': {'#status': 'Status'},
+            'ExpressionAttributeValues': values,
+        }
+
+    def _execute(self, transact_items, reservation_id, room_number, claimed):
+        """Ejecuta la transacción traduciendo las cancelaciones por condición.
+
+        transact_items[0] es siempre la operación sobre la reserva; claimed son
+        los SlotIDs que se intentan tomar, para reportar cuáles estaban ocupados.
+        """
+        if len(transact_items) > MAX_TRANSACTION_ITEMS:
+            raise ValueError('La estadía es demasiado larga para reservarla en una sola operación')
+        try:
+            self.client.transact_write_items(TransactItems=transact_items)
+            self.transactions += 1
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'TransactionCanceledException':
+                raise
+            self.rejected += 1
+            reasons = e.response.get('CancellationReasons') or []
+            failed = [
+                item for item, reason in zip(transact_items, reasons)
+                if reason.get('Code') == 'ConditionalCheckFailed'
+            ]
+            if failed and failed[0] is transact_items[0]:
+                raise ReservationChanged(reservation_id)
+            nights = {
+                operation['Item']['Night'] for item in failed
+                for operation in item.values() if 'Item' in operation
+            }
+            if nights or claimed:
+                raise SlotsUnavailable(room_number, nights)
+            raise
+
+    def create(self, reservation):
+        """Guarda una reserva nueva tomando sus noches; lanza SlotsUnavailable si hay solapamiento"""
+        reservation['SlotsClaimed'] = True
+        claimed = claimed_slots(reservation)
+        transact_items = [{'Put': {
+            'TableName': self.reservations_table,
+            'Item': reservation,
+            'ConditionExpression': 'attribute_not_exists(ReservationID)',
+        }}]
+        transact_items.extend(self._claim(slot, reservation['ReservationID']) for slot in sorted(claimed))
+        self._execute(transact_items, reservation['ReservationID'], reservation['RoomNumber'], claimed)
+
+    def update(self, current, changes, update_expression, expression_values, expression_names):
+        """Actualiza una reserva moviendo sus noches en la misma transacción.
+
+        current: reserva tal como está guardada (lectura consistente)
+        changes: RoomNumber, CheckInDate, CheckOutDate y Status resultantes
+        Se liberan las noches que ya no ocupa, se toman las nuevas y la
+        actualización solo se aplica si la reserva no cambió desde la lectura.
+        """
+        reservation_id = current['ReservationID']
+        previous = claimed_slots(current)
+        updated = claimed_slots(dict(changes, SlotsClaimed=True))
+        condition = self._unchanged_condition(current)
+        transact_items = [{'Update': {
+            'TableName': self.reservations_table,
+            'Key': {'ReservationID': reservation_id},
+            'UpdateExpression': update_expression + ', SlotsClaimed = :claimed',
+            'ConditionExpression': condition['ConditionExpression'],
+            'ExpressionAttributeNames': dict(expression_names, **condition['ExpressionAttributeNames']),
+            'ExpressionAttributeValues': dict(expression_values, **condition['ExpressionAttributeValues'],
+                                              **{':claimed': True}),
+        }}]
+        claimed = updated - previous
+        transact_items.extend(self._release(slot, reservation_id) for slot in sorted(previous - updated))
+        transact_items.extend(self._claim(slot, reservation_id) for slot in sorted(claimed))
+        self._execute(transact_items, reservation_id, changes['RoomNumber'], claimed)
+
+    def delete(self, current):
+        """Elimina una reserva y libera sus noches en la misma transacción"""
+        reservation_id = current['ReservationID']
+        condition = self._unchanged_condition(current)
+        transact_items = [{'Delete': {
+            'TableName': self.reservations_table,
+            'Key': {'ReservationID': reservation_id},
+            **condition,
+        }}]
+        transact_items.extend(self._release(slot, reservation_id) for slot in sorted(claimed_slots(current)))
+        self._execute(transact_items, reservation_id, current['RoomNumber'], set())
+
+    def stats(self):
+        return {
+            'slots_table': self.slots_table,
+            'transactions': self.transactions,
+            'rejected': self.rejected,
+        }
@@ -0,0 +1,845 @@
+"""Importación y exportación masiva de reservas en CSV o JSON Lines.
+
+La exportación recorre la tabla con un scan paralelo por segmentos
+(Segment/TotalSegments). Cada segmento deja sus páginas en una cola acotada y
+un solo hilo las escribe a un archivo, a la salida estándar o a S3 con una
+carga multiparte, de modo que la memoria no depende del tamaño de la tabla.
+En CSV se exportan las columnas de EXPORT_FIELDS; en JSON Lines, todos los
+atributos de cada reserva.
+
+La importación lee el archivo fila por fila en dos pasadas:
+
+1. Valida cada fila (campos obligatorios, fechas YYYY-MM-DD, salida posterior
+   a la entrada, habitación del catálogo, huéspedes, estado) y verifica en
+   bloque que no se solape con las reservas de la tabla ni con las filas
+   anteriores del mismo archivo, con un RoomIntervalIndex cargado con un scan
+   proyectado. Las filas aceptadas se guardan en un archivo temporal y las
+   rechazadas, con el motivo, en el reporte de --rejects.
+2. Escribe las filas aceptadas con varios hilos, cada uno con su propio
+   batch_writer. Los hilos toman bloques de una cola acotada (si la tabla va
+   más lenta, la lectura espera) y, cuando DynamoDB devuelve ítems sin
+   procesar, batch_writer los reenvía tras una espera exponencial.
+
+Con --on-conflict se elige qué hacer con las filas que se solapan: omitirlas
+(skip, por defecto), importarlas en estado Conflicto (mark) o no escribir nada
+(fail). Las filas sin estado se importan como Confirmada, porque el
+solapamiento ya se verificó contra el scan de la primera pasada.
+
+Con la tabla de noches de la reserva síncrona (--slots-table) las filas
+activas no van por batch_writer: cada una se guarda con sus noches en la
+misma transacción condicional que usa la aplicación (SlotBooking.create), así
+que una reserva hecha en la aplicación durante la importación nunca se
+sobrescribe; la fila que pierde esa carrera queda en el reporte de
+rechazadas. Es más lento (una transacción por fila). Sin tabla de noches no
+hay esa garantía: conviene importar sin tráfico de reservas, o revisar
+después con audit_conflicts.py.
+
+Con --endpoint-url se puede apuntar a DynamoDB Local para medir filas por
+segundo sin tocar AWS (ver también benchmarks/bench_bulk_io.py).
+
+Uso:
+    python bulk_io.py export --table <reservas> --output reservas.jsonl
+    python bulk_io.py export --table <reservas> --output s3://<bucket>/exportes/reservas.csv
+    python bulk_io.py import --table <reservas> --input reservas.csv --rejects rechazadas.csv
+    python bulk_io.py import --table <reservas> --input reservas.jsonl --dry-run
+"""
+import argparse
+import base64
+import contextlib
+import csv
+import io
+import json
+import os
+import queue
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from decimal import Decimal
+
+from booking import ReservationChanged, SlotBooking, SlotsUnavailable, claimed_slots
+from room_catalog import RoomCatalog
+from room_index import RoomIntervalIndex
+
+EXPORT_FIELDS = ['ReservationID', 'GuestName', 'ContactEmail', 'RoomNumber', 'CheckInDate', 'CheckOutDate',
+                 'Guests', 'Comments', 'DocumentID', 'Status', 'CreatedAt', 'UpdatedAt', 'Version', 'UpdatedBy',
+                 'SlotsClaimed', 'DocumentUploadStatus']
+REQUIRED_FIELDS = ('GuestName', 'ContactEmail', 'RoomNumber', 'CheckInDate', 'CheckOutDate')
+STATUSES = ('Pendiente', 'Confirmada', 'Conflicto', 'Cancelada')
+# Columnas de CSV que no son texto
+CSV_INTEGER_FIELDS = ('Version',)
+CSV_BOOLEAN_FIELDS = ('SlotsClaimed',)
+REJECT_COLUMNS = ['line', 'reservation_id', 'reason', 'detail']
+# UpdatedBy de las reservas importadas
+IMPORT_WRITER = 'importacion'
+MAX_NIGHTS = 365
+# Filas por bloque en la cola de escritura
+CHUNK_ROWS = 500
+# Tamaño de cada parte de la carga multiparte (S3 exige al menos 5 MB salvo en la última)
+PART_SIZE_MB = 8
+PARTS_IN_FLIGHT = 4
+# Espera ante ítems sin procesar: base * 2^(intentos seguidos - 1), con tope
+BACKOFF_BASE_SECONDS = 0.05
+BACKOFF_MAX_SECONDS = 5.0
+REJECT_SAMPLE = 20
+DEFAULT_ROOMS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rooms.json')
+
+
+def split_s3_url(location):
+    """('bucket', 'clave') de una URL s3://bucket/clave; None si es una ruta local"""
+    if not location.startswith('s3://'):
+        return None
+    bucket, _, key = location[len('s3://'):].partition('/')
+    if not bucket or not key:
+        raise ValueError(f'URL de S3 inválida: {location}')
+    return bucket, key
+
+
+def detect_format(location, explicit=None):
+    if explicit:
+        return explicit
+    return 'jsonl' if location.endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=str)
+    if isinstance(value, (bytes, bytearray)):
+        return base64.b64encode(value).decode('ascii')
+    if hasattr(value, 'value'):  # boto3.dynamodb.types.Binary
+        return base64.b64encode(value.value).decode('ascii')
+    raise TypeError(f'Tipo no serializable: {type(value).__name__}')
+
+
+_deserializer = None
+
+
+def from_dynamodb(item):
+    """Ítem en formato de DynamoDB a tipos de Python; cadenas y números sin pasar por TypeDeserializer"""
+    global _deserializer
+    result = {}
+    for name, value in item.items():
+        if 'S' in value:
+            result[name] = value['S']
+        elif 'N' in value:
+            result[name] = Decimal(value['N'])
+        elif 'BOOL' in value:
+            result[name] = value['BOOL']
+        else:
+            if _deserializer is None:
+                from boto3.dynamodb.types import TypeDeserializer
+                _deserializer = TypeDeserializer()
+            result[name] = _deserializer.deserialize(value)
+    return result
+
+
+def parallel_scan(client, table_name, segments, queue_pages=None, **scan_kwargs):
+    """Genera las páginas (listas de ítems en formato de DynamoDB) de un scan paralelo.
+
+    Cada segmento corre en un hilo y deja sus páginas en una cola acotada; si
+    quien consume va más lento, los segmentos esperan. Un error en cualquier
+    segmento se relanza aquí.
+    """
+    pages = queue.Queue(maxsize=queue_pages or segments * 2)
+    stop = threading.Event()
+
+    def put(value):
+        while not stop.is_set():
+            try:
+                pages.put(value, timeout=0.5)
+                return
+            except queue.Full:
+                pass
+
+    def scan(segment):
+        kwargs = dict(scan_kwargs, TableName=table_name)
+        if segments > 1:
+            kwargs.update(Segment=segment, TotalSegments=segments)
+        try:
+            while not stop.is_set():
+                response = client.scan(**kwargs)
+                put(response.get('Items', []))
+                if 'LastEvaluatedKey' not in response:
+                    break
+                kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+            put(None)
+        except BaseException as error:
+            put(error)
+
+    for segment in range(segments):
+        threading.Thread(target=scan, args=(segment,), daemon=True).start()
+    try:
+        finished = 0
+        while finished < segments:
+            page = pages.get()
+            if page is None:
+                finished += 1
+            elif isinstance(page, BaseException):
+                raise page
+            else:
+                yield page
+    finally:
+        stop.set()
+
+
+class LineEncoder:
+    """Convierte páginas de reservas en texto CSV o JSON Lines"""
+
+    def __init__(self, data_format):
+        self.format = data_format
+
+    def header(self):
+        if self.format != 'csv':
+            return ''
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(EXPORT_FIELDS)
+        return buffer.getvalue()
+
+    @staticmethod
+    def _csv_value(value):
+        if value is None:
+            return ''
+        if isinstance(value, bool):
+            return 'true' if value else 'false'
+        if isinstance(value, (str, Decimal)):
+            return str(value)
+        return json.dumps(value, default=_json_default, ensure_ascii=False)
+
+    def encode(self, reservations):
+        if self.format != 'csv':
+            return ''.join(json.dumps(reservation, default=_json_default, ensure_ascii=False) + '\n'
+                           for reservation in reservations)
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(
+            [self._csv_value(reservation.get(field)) for field in EXPORT_FIELDS] for reservation in reservations
+        )
+        return buffer.getvalue()
+
+
+class FileSink:
+    """Destino local (o la salida estándar con '-')"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = sys.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
+        self.bytes = 0
+
+    def write(self, text):
+        self.file.write(text)
+        self.bytes += len(text.encode('utf-8'))
+
+    def close(self):
+        if self.file is sys.stdout:
+            self.file.flush()
+        else:
+            self.file.close()
+
+    def abort(self):
+        self.close()
+
+
+class S3MultipartSink:
+    """Destino en S3 con carga multiparte.
+
+    El texto se acumula hasta part_size y cada parte se sube en un hilo; como
+    mucho hay max_in_flight partes en memoria esperando su subida.
+    """
+
+    def __init__(self, client, bucket, key, part_size=PART_SIZE_MB * 1024 * 1024, max_in_flight=PARTS_IN_FLIGHT,
+                 content_type='text/plain; charset=utf-8'):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.max_in_flight = max_in_flight
+        self.upload_id = client.create_multipart_upload(Bucket=bucket, Key=key, ContentType=content_type)['UploadId']
+        self.buffer = bytearray()
+        self.futures = []
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight)
+        self.bytes = 0
+
+    def write(self, text):
+        data = text.encode('utf-8')
+        self.buffer += data
+        self.bytes += len(data)
+        if len(self.buffer) >= self.part_size:
+            self._upload_part()
+
+    def _upload_part(self):
+        body, self.buffer = bytes(self.buffer), bytearray()
+        pending = [future for future in self.futures if not future.done()]
+        while len(pending) >= self.max_in_flight:
+            _, not_done = wait(pending, return_when=FIRST_COMPLETED)
+            pending = list(not_done)
+        # Un error de una parte anterior se reporta antes de seguir
+        for future in self.futures:
+            if future.done():
+                future.result()
+        self.futures.append(self.executor.submit(self._put_part, len(self.futures) + 1, body))
+
+    def _put_part(self, number, body):
+        response = self.client.upload_part(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                           PartNumber=number, Body=body)
+        return {'PartNumber': number, 'ETag': response['ETag']}
+
+    def close(self):
+        if self.buffer or not self.futures:
+            self._upload_part()
+        parts = [future.result() for future in self.futures]
+        self.executor.shutdown()
+        self.client.complete_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                              MultipartUpload={'Parts': parts})
+
+    def abort(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+
+
+def export_reservations(client, table_name, sink, data_format, segments, queue_pages=None):
+    """Escribe todas las reservas de la tabla en sink; devuelve cuántas se exportaron"""
+    encoder = LineEncoder(data_format)
+    sink.write(encoder.header())
+    rows = 0
+    for page in parallel_scan(client, table_name, segments, queue_pages):
+        if page:
+            sink.write(encoder.encode(from_dynamodb(item) for item in page))
+            rows += len(page)
+    return rows
+
+
+@contextlib.contextmanager
+def open_input(location, s3_client=None):
+    """Flujo de texto de un archivo local, de la entrada estándar ('-') o de un objeto de S3"""
+    s3_location = split_s3_url(location)
+    if s3_location:
+        body = s3_client.get_object(Bucket=s3_location[0], Key=s3_location[1])['Body']
+        stream = io.TextIOWrapper(io.BufferedReader(_ReadableBody(body)), encoding='utf-8-sig', newline='')
+    elif location == '-':
+        stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig', newline='')
+    else:
+        stream = open(location, encoding='utf-8-sig', newline='')
+    try:
+        yield stream
+    finally:
+        stream.close()
+
+
+class _ReadableBody(io.RawIOBase):
+    """Adapta el StreamingBody de S3 a io para leerlo por líneas sin descargarlo completo"""
+
+    def __init__(self, body):
+        self.body = body
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.body.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        self.body.close()
+        super().close()
+
+
+def read_rows(stream, data_format):
+    """Genera (línea, fila, error) de un flujo CSV o JSON Lines; fila es None si la línea no se pudo leer"""
+    if data_format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            if None in row:
+                yield reader.line_num, None, 'columnas de más'
+                continue
+            values = {}
+            for field, value in row.items():
+                value = (value or '').strip()
+                if not field or not value:
+                    continue
+                if field in CSV_INTEGER_FIELDS:
+                    values[field] = int(value) if value.isdigit() else value
+                elif field in CSV_BOOLEAN_FIELDS:
+                    values[field] = value.lower() in ('true', '1', 'si', 'sí')
+                else:
+                    values[field] = value
+            yield reader.line_num, values, None
+        return
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line, parse_float=Decimal)
+        except ValueError:
+            yield number, None, 'JSON inválido'
+            continue
+        if not isinstance(row, dict):
+            yield number, None, 'la línea no es un objeto JSON'
+            continue
+        yield number, {field: value.strip() if isinstance(value, str) else value for field, value in row.items()
+                       if value is not None and value != ''}, None
+
+
+class RowValidator:
+    """Valida una fila y la completa como lo haría el formulario de nueva reserva"""
+
+    def __init__(self, catalog=None, max_nights=MAX_NIGHTS):
+        self.catalog = catalog
+        self.max_nights = max_nights
+        self.imported_at = datetime.now().isoformat()
+
+    def validate(self, row):
+        """Devuelve (reserva, None) o (None, motivo del rechazo)"""
+        missing = [field for field in REQUIRED_FIELDS if not row.get(field)]
+        if missing:
+            return None, f'faltan campos obligatorios: {", ".join(missing)}'
+        reservation = dict(row)
+        for field in REQUIRED_FIELDS + ('ReservationID', 'Status'):
+            if field in reservation:
+                reservation[field] = str(reservation[field])
+        try:
+            check_in = datetime.strptime(reservation['CheckInDate'], '%Y-%m-%d').date()
+            check_out = datetime.strptime(reservation['CheckOutDate'], '%Y-%m-%d').date()
+        except ValueError:
+            return None, 'fechas inválidas (se espera YYYY-MM-DD)'
+        nights = (check_out - check_in).days
+        if nights <= 0:
+            return None, 'la salida no es posterior a la entrada'
+        if nights > self.max_nights:
+            return None, f'estadía mayor a {self.max_nights} noches'
+        # Fechas con ceros a la izquierda, como las compara el resto de la aplicación
+        reservation['CheckInDate'], reservation['CheckOutDate'] = check_in.isoformat(), check_out.isoformat()
+        if '@' not in reservation['ContactEmail']:
+            return None, 'correo inválido'
+
+        room = self.catalog.get(reservation['RoomNumber']) if self.catalog else None
+        if self.catalog and room is None:
+            return None, 'habitación fuera del catálogo'
+        if 'Guests' in reservation:
+            try:
+                guests = int(reservation['Guests'])
+            except (TypeError, ValueError):
+                guests = 0
+            if guests < 1:
+                return None, 'número de huéspedes inválido'
+            if room and guests > room['Capacity']:
+                return None, f'la habitación admite {room["Capacity"]} huéspedes'
+            reservation['Guests'] = str(guests)
+        if reservation.setdefault('Status', 'Confirmada') not in STATUSES:
+            return None, f'estado inválido: {reservation["Status"]}'
+
+        reservation.setdefault('ReservationID', str(uuid.uuid4()))
+        reservation.setdefault('Comments', 'Sin comentarios')
+        reservation.setdefault('DocumentID', 'Sin documento')
+        reservation.setdefault('CreatedAt', self.imported_at)
+        reservation['UpdatedAt'] = self.imported_at
+        reservation.setdefault('Version', 1)
+        reservation['UpdatedBy'] = IMPORT_WRITER
+        return reservation, None
+
+
+class BulkOverlapCheck:
+    """Solapamientos de las filas importadas contra la tabla y entre sí.
+
+    Las reservas existentes se cargan una vez en un RoomIntervalIndex y cada
+    fila aceptada se agrega al índice, así que una fila posterior del mismo
+    archivo que se cruce con ella también se detecta.
+    """
+
+    def __init__(self):
+        self.index = RoomIntervalIndex()
+        self.ids = set()
+        self.existing = 0
+
+    def load(self, reservations):
+        self.index.rebuild(self._remember(reservations))
+        self.existing = len(self.ids)
+
+    def _remember(self, reservations):
+        for reservation in reservations:
+            if reservation.get('ReservationID'):
+                self.ids.add(reservation['ReservationID'])
+            yield reservation
+
+    def check(self, reservation):
+        """Devuelve (motivo, IDs con los que choca) o (None, []) si la fila puede escribirse"""
+        reservation_id = reservation['ReservationID']
+        if reservation_id in self.ids:
+            return 'ReservationID repetido', [reservation_id]
+        self.ids.add(reservation_id)
+        if reservation['Status'] in ('Cancelada', 'Conflicto'):
+            return None, []
+        overlaps = self.index.overlapping(reservation['CheckInDate'], reservation['CheckOutDate'],
+                                          rooms=[reservation['RoomNumber']])
+        if overlaps:
+            return 'solapamiento', sorted(other_id for _, _, _, other_id in overlaps)
+        self.index.upsert(reservation)
+        return None, []
+
+
+def existing_reservations(client, table_name, segments):
+    """Reservas de la tabla con solo los campos que usa la verificación de solapamientos"""
+    for page in parallel_scan(client, table_name, segments,
+                              ProjectionExpression='ReservationID, RoomNumber, CheckInDate, CheckOutDate, #status',
+                              ExpressionAttributeNames={'#status': 'Status'}):
+        for item in page:
+            yield {field: value.get('S') for field, value in item.items()}
+
+
+class RejectWriter:
+    """Escribe las filas rechazadas en CSV o JSON Lines"""
+
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.format = detect_format(path)
+        if self.format == 'csv':
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(REJECT_COLUMNS)
+
+    def write(self, line, reservation_id, reason, detail):
+        values = [line, reservation_id or '', reason, ' '.join(detail)]
+        if self.format == 'csv':
+            self.writer.writerow(values)
+        else:
+            self.file.write(json.dumps(dict(zip(REJECT_COLUMNS, values)), ensure_ascii=False) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+class UnprocessedBackoff:
+    """Hook after-call de BatchWriteItem: cuenta los ítems sin procesar y espera antes del reintento.
+
+    batch_writer reenvía los ítems sin procesar en el siguiente lote, pero sin
+    pausa; dormir en el hilo que escribe (con espera exponencial y jitter) le
+    da tiempo a la tabla y frena solo a ese hilo.
+    """
+
+    def __init__(self, base=BACKOFF_BASE_SECONDS, cap=BACKOFF_MAX_SECONDS):
+        self.base = base
+        self.cap = cap
+        self.unprocessed = 0
+        self.waits = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def __call__(self, parsed=None, **kwargs):
+        unprocessed = sum(len(requests) for requests in ((parsed or {}).get('UnprocessedItems') or {}).values())
+        if not unprocessed:
+            self._local.streak = 0
+            return
+        streak = getattr(self._local, 'streak', 0) + 1
+        self._local.streak = streak
+        with self._lock:
+            self.unprocessed += unprocessed
+            self.waits += 1
+        time.sleep(min(self.cap, self.base * 2 ** (streak - 1)) * random.uniform(0.5, 1))
+
+
+def _put_chunk(chunks, chunk, failed):
+    """Encola un bloque esperando si la cola está llena; devuelve False si algún hilo de escritura falló"""
+    while not failed.is_set():
+        try:
+            chunks.put(chunk, timeout=0.5)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _stop_writers(chunks, futures):
+    """Envía a cada hilo de escritura vivo su marca de fin; nunca falla.
+
+    Si todos los hilos terminaron (por ejemplo, con error) deja de esperar
+    lugar en la cola en vez de bloquearse para siempre.
+    """
+    for _ in [future for future in futures if not future.done()]:
+        while True:
+            try:
+                chunks.put(None, timeout=0.5)
+                break
+            except queue.Full:
+                if all(future.done() for future in futures):
+                    return
+
+
+def write_reservations(tables, reservations, chunk_rows=CHUNK_ROWS, queue_chunks=None):
+    """Escribe reservas con un batch_writer por hilo; devuelve (reservas, noches, perdidas).
+
+    tables: un par (tabla de reservas, SlotBooking o None) por hilo
+    reservations: pares (línea, reserva)
+    Las reservas con SlotsClaimed se guardan con SlotBooking.create, la misma
+    transacción condicional de la aplicación: si una reserva hecha después
+    del scan de la primera pasada ya tomó alguna de sus noches, la fila no se
+    escribe y se devuelve en perdidas como (línea, id, motivo, detalle).
+    """
+    chunks = queue.Queue(maxsize=queue_chunks or len(tables) * 2)
+    # Si un hilo falla, se deja de leer y los demás descartan los bloques pendientes
+    failed = threading.Event()
+
+    def worker(reservations_table, booking):
+        try:
+            return write_chunks(reservations_table, booking)
+        except BaseException:
+            failed.set()
+            raise
+
+    def write_chunks(reservations_table, booking):
+        written = slots = 0
+        lost = []
+        with reservations_table.batch_writer(overwrite_by_pkeys=['ReservationID']) as batch:
+            while True:
+                chunk = chunks.get()
+                if chunk is None or failed.is_set():
+                    return written, slots, lost
+                for line, reservation in chunk:
+                    reservation_id = reservation['ReservationID']
+                    if booking is None or not reservation.get('SlotsClaimed'):
+                        batch.put_item(Item=reservation)
+                        written += 1
+                        continue
+                    try:
+                        booking.create(reservation)
+                    except SlotsUnavailable as e:
+                        lost.append((line, reservation_id, 'noches tomadas durante la importación', e.nights))
+                        continue
+                    except ReservationChanged:
+                        lost.append((line, reservation_id, 'ReservationID repetido', [reservation_id]))
+                        continue
+                    except ValueError as e:
+                        lost.append((line, reservation_id, str(e), []))
+                        continue
+                    written += 1
+                    slots += len(claimed_slots(reservation))
+
+    with ThreadPoolExecutor(max_workers=len(tables)) as executor:
+        futures = [executor.submit(worker, *pair) for pair in tables]
+        chunk = []
+        try:
+            for pair in reservations:
+                chunk.append(pair)
+                if len(chunk) == chunk_rows:
+                    if not _put_chunk(chunks, chunk, failed):
+                        break
+                    chunk = []
+            else:
+                if chunk:
+                    _put_chunk(chunks, chunk, failed)
+        except BaseException:
+            failed.set()
+            raise
+        finally:
+            _stop_writers(chunks, futures)
+        # Propaga el error del hilo que falló
+        results = [future.result() for future in futures]
+    return (sum(written for written, _, _ in results), sum(slots for _, slots, _ in results),
+            [entry for _, _, lost in results for entry in lost])
+
+
+def _read_spool(spool):
+    spool.seek(0)
+    for line in spool:
+        yield tuple(json.loads(line, parse_float=Decimal))
+
+
+def peak_memory_mb():
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def _aws(args):
+    import boto3
+    from botocore.config import Config
+    workers = max(getattr(args, 'segments', 1), getattr(args, 'workers', 1))
+    options = {'region_name': args.region, 'endpoint_url': args.endpoint_url,
+               'config': Config(max_pool_connections=max(10, workers * 2))}
+    # El scan usa un cliente de bajo nivel: el del recurso ya convierte los ítems a tipos de Python
+    return boto3, boto3.client('dynamodb', **options), boto3.resource('dynamodb', **options)
+
+
+def run_export(args):
+    boto3, client, dynamodb = _aws(args)
+    data_format = detect_format(args.output, args.format)
+    s3_location = split_s3_url(args.output)
+    if s3_location:
+        sink = S3MultipartSink(boto3.client('s3', region_name=args.region), *s3_location,
+                               part_size=args.part_size_mb * 1024 * 1024,
+                               content_type='text/csv; charset=utf-8' if data_format == 'csv'
+                               else 'application/x-ndjson')
+    else:
+        sink = FileSink(args.output)
+    started = time.perf_counter()
+    try:
+        rows = export_reservations(client, args.table, sink, data_format, args.segments)
+    except BaseException:
+        sink.abort()
+        raise
+    sink.close()
+    seconds = time.perf_counter() - started
+    return {
+        'command': 'export',
+        'table': args.table,
+        'output': args.output,
+        'format': data_format,
+        'rows': rows,
+        'bytes': sink.bytes,
+        'segments': args.segments,
+        'seconds': round(seconds, 3),
+        'rows_per_second': round(rows / seconds, 1) if rows else None,
+        'peak_memory_mb': peak_memory_mb(),
+    }
+
+
+def run_import(args):
+    boto3, client, dynamodb = _aws(args)
+    data_format = detect_format(args.input, args.format)
+    catalog = RoomCatalog.load(args.rooms) if args.rooms and os.path.exists(args.rooms) else None
+    validator = RowValidator(catalog, args.max_nights)
+
+    started = time.perf_counter()
+    overlap_check = BulkOverlapCheck()
+    overlap_check.load(existing_reservations(client, args.table, args.segments))
+    load_seconds = time.perf_counter() - started
+
+    rows_read = accepted = 0
+    rejected_by_reason = {}
+    reject_sample = []
+    rejects = RejectWriter(args.rejects) if args.rejects else None
+
+    def reject(line, reservation_id, reason, detail):
+        rejected_by_reason[reason] = rejected_by_reason.get(reason, 0) + 1
+        if len(reject_sample) < REJECT_SAMPLE:
+            reject_sample.append({'line': line, 'reservation_id': reservation_id, 'reason': reason,
+                                  'detail': detail[:5]})
+        if rejects:
+            rejects.write(line, reservation_id, reason, detail)
+
+    written = slots_written = 0
+    write_seconds = 0.0
+    backoff = UnprocessedBackoff()
+    try:
+        with tempfile.TemporaryFile('w+', encoding='utf-8') as spool:
+            started = time.perf_counter()
+            with open_input(args.input, boto3.client('s3', region_name=args.region)) as stream:
+                for line, row, error in read_rows(stream, data_format):
+                    rows_read += 1
+                    reservation, detail = None, []
+                    if error is None:
+                        reservation, error = validator.validate(row)
+                    if error is None:
+                        error, detail = overlap_check.check(reservation)
+                        if error == 'solapamiento' and args.on_conflict == 'mark':
+                            reservation['Status'] = 'Conflicto'
+                            error = None
+                    if error is not None:
+                        reject(line, (reservation or row or {}).get('ReservationID'), error, detail)
+                        continue
+                    # Con la tabla de noches, las reservas activas quedan con sus noches tomadas
+                    if args.slots_table and reservation['Status'] not in ('Cancelada', 'Conflicto'):
+                        reservation['SlotsClaimed'] = True
+                    else:
+                        reservation.pop('SlotsClaimed', None)
+                    spool.write(json.dumps([line, reservation], default=_json_default, ensure_ascii=False) + '\n')
+                    accepted += 1
+            validate_seconds = time.perf_counter() - started
+
+            conflicts = rejected_by_reason.get('solapamiento', 0)
+            aborted = args.on_conflict == 'fail' and conflicts > 0
+            if accepted and not args.dry_run and not aborted:
+                dynamodb.meta.client.meta.events.register('after-call.dynamodb.BatchWriteItem', backoff)
+                tables = [
+                    (dynamodb.Table(args.table),
+                     SlotBooking(dynamodb.meta.client, args.table, args.slots_table) if args.slots_table else None)
+                    for _ in range(args.workers)
+                ]
+                started = time.perf_counter()
+                written, slots_written, lost = write_reservations(tables, _read_spool(spool), args.chunk_rows)
+                write_seconds = time.perf_counter() - started
+                for rejected in lost:
+                    reject(*rejected)
+    finally:
+        if rejects:
+            rejects.close()
+
+    return {
+        'command': 'import',
+        'table': args.table,
+        'input': args.input,
+        'format': data_format,
+        'existing_reservations': overlap_check.existing,
+        'rows_read': rows_read,
+        'accepted': accepted,
+        'rejected': sum(rejected_by_reason.values()),
+        'rejected_by_reason': rejected_by_reason,
+        'reject_sample': reject_sample,
+        'on_conflict': args.on_conflict,
+        'aborted': aborted,
+        'dry_run': args.dry_run,
+        'written': written,
+        'slots_written': slots_written,
+        'unprocessed_items': backoff.unprocessed,
+        'backoff_waits': backoff.waits,
+        'workers': args.workers,
+        'load_seconds': round(load_seconds, 3),
+        'validate_seconds': round(validate_seconds, 3),
+        'write_seconds': round(write_seconds, 3),
+        'validate_rows_per_second': round(rows_read / validate_seconds, 1) if rows_read else None,
+        'rows_per_second': round(written / write_seconds, 1) if written else None,
+        'peak_memory_mb': peak_memory_mb(),
+        'rejects': args.rejects,
+    }
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--table', default=os.environ.get('DYNAMODB_TABLE'), help='Tabla de reservas')
+    parser.add_argument('--region', default=os.environ.get('AWS_REGION', 'us-east-1'))
+    parser.add_argument('--endpoint-url', help='Endpoint de DynamoDB (por ejemplo DynamoDB Local)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export = commands.add_parser('export', help='Exporta la tabla a CSV o JSON Lines')
+    export.add_argument('--output', required=True, help="Archivo, '-' para la salida estándar o s3://bucket/clave")
+    export.add_argument('--format', choices=['csv', 'jsonl'], help='Por defecto según la extensión')
+    export.add_argument('--segments', type=int, default=8, help='Segmentos del scan paralelo')
+    export.add_argument('--part-size-mb', type=int, default=PART_SIZE_MB, help='Tamaño de parte en S3 (mínimo 5)')
+
+    bulk_import = commands.add_parser('import', help='Importa reservas desde CSV o JSON Lines')
+    bulk_import.add_argument('--input', required=True, help="Archivo, '-' para la entrada estándar o s3://bucket/clave")
+    bulk_import.add_argument('--format', choices=['csv', 'jsonl'], help='Por defecto según la extensión')
+    bulk_import.add_argument('--workers', type=int, default=4, help='Hilos de escritura')
+    bulk_import.add_argument('--segments', type=int, default=8, help='Segmentos del scan de reservas existentes')
+    bulk_import.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help='Filas por bloque de la cola')
+    bulk_import.add_argument('--on-conflict', choices=['skip', 'mark', 'fail'], default='skip',
+                             help='Qué hacer con las filas que se solapan')
+    bulk_import.add_argument('--rejects', help='Reporte de filas rechazadas (.csv o .jsonl)')
+    bulk_import.add_argument('--rooms', default=os.environ.get('ROOM_CATALOG_PATH', DEFAULT_ROOMS_PATH),
+                             help='Catálogo de habitaciones para validar (se omite si no existe)')
+    bulk_import.add_argument('--slots-table', default=os.environ.get('BOOKING_SLOTS_TABLE'),
+                             help='Tabla de noches de la reserva síncrona')
+    bulk_import.add_argument('--max-nights', type=int, default=MAX_NIGHTS)
+    bulk_import.add_argument('--dry-run', action='store_true', help='Solo validar, sin escribir')
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not args.table:
+        parser.error('Se requiere --table')
+    if args.command == 'export' and args.part_size_mb < 5:
+        parser.error('--part-size-mb debe ser al menos 5')
+
+    summary = run_export(args) if args.command == 'export' else run_import(args)
+    # Con la exportación a la salida estándar, el resumen va a stderr
+    output = sys.stderr if getattr(args, 'output', None) == '-' else sys.stdout
+    print(json.dumps(summary, indent=2, ensure_ascii=False), file=output)
+    return 1 if summary.get('aborted') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
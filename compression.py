@@ -0,0 +1,155 @@
+"""Compresión gzip/brotli de las respuestas de texto (HTML, CSS, JS, JSON).
+
+Se negocia con Accept-Encoding: brotli si el paquete está instalado y el
+navegador lo acepta, si no gzip. Las respuestas en streaming se comprimen
+por fragmentos con un flush al final de cada uno, de modo que el navegador
+sigue recibiendo el HTML a medida que se renderiza.
+
+Los ETag fuertes pasan a débiles (W/"...") al comprimir, igual que hace
+nginx: el contenido en bytes cambia, pero la validación con If-None-Match
+sigue respondiendo 304.
+"""
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # Sin brotli (requirements.txt) solo se usa gzip
+    brotli = None
+
+COMPRESSIBLE_TYPES = {
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+}
+DEFAULT_MIN_SIZE = 500
+GZIP_LEVEL = 6
+# Calidad 11 es demasiado lenta para contenido dinámico
+BROTLI_QUALITY = 5
+
+
+def is_compressible(mimetype):
+    return bool(mimetype) and (mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES)
+
+
+class _GzipStream:
+    def __init__(self, level):
+        # wbits=31: formato gzip (encabezado y CRC) en lugar de zlib
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _BrotliStream:
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class ResponseCompressor:
+    """Comprime en after_request las respuestas de texto que lo admitan"""
+
+    def __init__(self, min_size=DEFAULT_MIN_SIZE, gzip_level=GZIP_LEVEL, brotli_quality=BROTLI_QUALITY):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.responses = {'br': 0, 'gzip': 0}
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def init_app(self, app):
+        app.after_request(self.compress_response)
+
+    def choose_encoding(self):
+        accepted = request.accept_encodings
+        if brotli is not None and accepted['br'] > 0:
+            return 'br'
+        if accepted['gzip'] > 0:
+            return 'gzip'
+        return None
+
+    def _stream(self, encoding):
+        if encoding == 'br':
+            return _BrotliStream(self.brotli_quality)
+        return _GzipStream(self.gzip_level)
+
+    def compress_response(self, response):
+        # Con Accept-Encoding la misma URL tiene varias representaciones
+        if is_compressible(response.mimetype):
+            response.vary.add('Accept-Encoding')
+        # Con X-Sendfile el cuerpo lo pone el proxy: el de Flask está vacío
+        if (response.status_code < 200 or response.status_code in (204, 206, 304)
+                or 'Content-Encoding' in response.headers or 'X-Sendfile' in response.headers
+                or not is_compressible(response.mimetype)):
+            return response
+        streamed = response.is_streamed or response.direct_passthrough
+        if not streamed and (response.content_length or 0) < self.min_size:
+            return response
+        encoding = self.choose_encoding()
+        if encoding is None:
+            return response
+
+        if streamed:
+            # send_file marca direct_passthrough; al envolver el iterable hay
+            # que quitarlo para que Werkzeug lo recorra
+            response.direct_passthrough = False
+            response.response = self._compress_chunks(response.response, self._stream(encoding), response.charset)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            stream = self._stream(encoding)
+            compressed = stream.compress(data) + stream.finish()
+            self.bytes_in += len(data)
+            self.bytes_out += len(compressed)
+            response.set_data(compressed)
+
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        self.responses[encoding] += 1
+        return response
+
+    def _compress_chunks(self, chunks, stream, charset):
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode(charset)
+                if not chunk:
+                    continue
+                self.bytes_in += len(chunk)
+                data = stream.compress(chunk) + stream.flush()
+                self.bytes_out += len(data)
+                yield data
+            data = stream.finish()
+            self.bytes_out += len(data)
+            yield data
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+
+    def stats(self):
+        return {
+            'brotli': brotli is not None,
+            'responses': dict(self.responses),
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'ratio': round(self.bytes_out / self.bytes_in, 3) if self.bytes_in else None,
+        }
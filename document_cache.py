@@ -0,0 +1,137 @@
+"""Caché en disco de documentos traídos desde S3.
+
+Cuando un nodo no tiene la copia local de un documento (la carga llegó a otro
+nodo detrás del balanceador), se descarga de S3 una sola vez a este directorio
+y se sirve desde disco en las siguientes peticiones. El tamaño total está
+acotado: al superar max_bytes se eliminan los archivos usados hace más tiempo.
+"""
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from botocore.exceptions import ClientError
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class DocumentTooLarge(Exception):
+    """El objeto no cabe en la caché; se entrega su cuerpo para enviarlo directamente"""
+
+    def __init__(self, response):
+        super().__init__('Documento mayor que la caché')
+        self.response = response
+
+
+class DocumentDiskCache:
+    """Archivos de S3 en disco con desalojo LRU por bytes totales"""
+
+    def __init__(self, directory, max_bytes, s3_client, bucket, prefix='documents/'):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+        self._entries = OrderedDict()  # nombre -> bytes, del menos al más reciente
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._fetch_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        self._load_existing()
+
+    def _load_existing(self):
+        """Recupera el contenido del directorio ordenado por último acceso"""
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.startswith('.'):
+                stat = entry.stat()
+                files.append((stat.st_atime, entry.name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._total_bytes += size
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and self._entries:
+            name, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+    def _touch(self, filename):
+        with self._lock:
+            if filename in self._entries:
+                self._entries.move_to_end(filename)
+                return True
+            return False
+
+    def fetch(self, filename):
+        """Garantiza que el documento esté en la caché y devuelve su ruta.
+
+        Lanza FileNotFoundError si no existe en S3 y DocumentTooLarge si su
+        tamaño supera la capacidad de la caché.
+        """
+        path = os.path.join(self.directory, filename)
+        if self._touch(filename) and os.path.exists(path):
+            self.hits += 1
+            return path
+
+        # Una sola descarga por archivo aunque lleguen peticiones concurrentes
+        with self._lock:
+            fetch_lock = self._fetch_locks.setdefault(filename, threading.Lock())
+        with fetch_lock:
+            if self._touch(filename) and os.path.exists(path):
+                self.hits += 1
+                return path
+            self.misses += 1
+            try:
+                self._download(filename, path)
+            finally:
+                with self._lock:
+                    self._fetch_locks.pop(filename, None)
+        return path
+
+    def _download(self, filename, path):
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=self.prefix + filename)
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                raise FileNotFoundError(filename)
+            raise
+        if response.get('ContentLength', 0) > self.max_bytes:
+            raise DocumentTooLarge(response)
+
+        # Escribir a un temporal y renombrar para no servir archivos a medias
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix='.descarga-')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                for chunk in response['Body'].iter_chunks(CHUNK_SIZE):
+                    temp_file.write(chunk)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        size = os.path.getsize(path)
+        with self._lock:
+            self._total_bytes += size - self._entries.pop(filename, 0)
+            self._entries[filename] = size
+            self._evict()
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'bytes': self._total_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
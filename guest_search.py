@@ -0,0 +1,286 @@
+"""Índice en memoria para buscar reservas por huésped.
+
+Permite buscar por prefijo del nombre (sin distinguir mayúsculas ni tildes,
+por cualquiera de sus palabras), por correo exacto y por rango de fechas de
+entrada. Cada criterio es una lista ordenada de claves con el ReservationID
+al lado, de modo que sus candidatas salen de un par de bisect. Se parte del
+criterio con menos candidatas, el resto se interseca como conjunto y, si
+hay muchas coincidencias, las primeras por fecha de entrada se toman
+recorriendo esa lista en orden en lugar de ordenarlas todas.
+"""
+import bisect
+import functools
+import heapq
+import re
+import sys
+import threading
+import time
+import unicodedata
+
+# Campos que devuelve una búsqueda, en este orden
+RESULT_FIELDS = ('ReservationID', 'GuestName', 'ContactEmail', 'RoomNumber', 'CheckInDate', 'CheckOutDate', 'Status')
+_PREFIX_END = '\U0010ffff'
+_TOKEN_SEPARATOR = re.compile(r'[^\w]+')
+
+
+def normalize(text):
+    """Minúsculas y sin tildes"""
+    text = str(text)
+    if text.isascii():
+        return text.casefold().strip()
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).casefold().strip()
+
+
+@functools.lru_cache(maxsize=65536)
+def _word_tokens(word):
+    # Los nombres y apellidos se repiten mucho: cada palabra se normaliza una vez
+    return tuple(sys.intern(token) for token in _TOKEN_SEPARATOR.split(normalize(word)) if token)
+
+
+def name_tokens(name):
+    """Palabras normalizadas de un nombre ('María  García-Pérez' -> ('maria', 'garcia', 'perez'))"""
+    return tuple(token for word in str(name).split() for token in _word_tokens(word))
+
+
+def _intern(value):
+    return sys.intern(value) if value.__class__ is str else value
+
+
+# Campos de RESULT_FIELDS, a partir del cuarto, con pocos valores distintos
+_SHARED_FIELDS = RESULT_FIELDS[3:]
+
+
+# Posición de CheckInDate en los valores de cada entrada
+_CHECK_IN = RESULT_FIELDS.index('CheckInDate')
+# Si la lista de un criterio es mucho más grande que las candidatas, se verifica
+# en cada candidata en lugar de intersecar conjuntos
+_INTERSECT_RATIO = 8
+# Con más coincidencias que esto, las primeras por fecha de entrada se buscan
+# recorriendo la lista de entradas en orden en lugar de ordenar todas
+_ORDERED_WALK_MIN = 2048
+
+
+class _SortedKeys:
+    """Pares (clave, id) ordenados, guardados como dos listas paralelas.
+
+    Dos listas de referencias ocupan bastante menos que una lista de tuplas
+    con millones de reservas, y bisect trabaja directamente sobre las claves.
+    """
+
+    def __init__(self, pairs=()):
+        pairs = sorted(pairs)
+        self.keys = [key for key, _ in pairs]
+        self.ids = [reservation_id for _, reservation_id in pairs]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _position(self, key, reservation_id):
+        low = bisect.bisect_left(self.keys, key)
+        high = bisect.bisect_right(self.keys, key, low)
+        return bisect.bisect_left(self.ids, reservation_id, low, high), high
+
+    def insert(self, key, reservation_id):
+        position, _ = self._position(key, reservation_id)
+        self.keys.insert(position, key)
+        self.ids.insert(position, reservation_id)
+
+    def remove(self, key, reservation_id):
+        position, high = self._position(key, reservation_id)
+        if position < high and self.ids[position] == reservation_id:
+            del self.keys[position]
+            del self.ids[position]
+
+    def prefix(self, prefix):
+        low = bisect.bisect_left(self.keys, prefix)
+        return low, bisect.bisect_left(self.keys, prefix + _PREFIX_END, low)
+
+    def between(self, first=None, last=None):
+        """Posiciones de las claves en [first, last]; None deja el extremo abierto"""
+        low = 0 if first is None else bisect.bisect_left(self.keys, first)
+        high = len(self.keys) if last is None else bisect.bisect_right(self.keys, last, low)
+        return low, high
+
+
+class GuestSearchIndex:
+    """Reservas indexadas por palabras del nombre, correo y fecha de entrada"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._names = _SortedKeys()
+        self._emails = _SortedKeys()
+        self._check_ins = _SortedKeys()
+        self._by_id = {}   # id -> (palabras del nombre, correo normalizado, valores de RESULT_FIELDS)
+        self._journal = None   # cambios recibidos durante una reconstrucción: [(id, entrada o None)]
+        self.loaded_at = None
+
+    def __len__(self):
+        return len(self._by_id)
+
+    @staticmethod
+    def _entry(reservation):
+        """Entrada del índice de una reserva; None si no tiene ReservationID"""
+        reservation_id = reservation.get('ReservationID')
+        if not reservation_id:
+            return None
+        get = reservation.get
+        # Los valores repetidos (fechas, habitaciones, estados) se comparten entre reservas
+        values = (reservation_id, get('GuestName'), get('ContactEmail'),
+                  *[_intern(get(field)) for field in _SHARED_FIELDS])
+        email = normalize(values[2]) if values[2] else ''
+        return reservation_id, (name_tokens(values[1] or ''), email, values)
+
+    @staticmethod
+    def _keys(entry):
+        """Claves de (nombres, correos, entradas) de una entrada"""
+        tokens, email, values = entry
+        check_in = values[_CHECK_IN]
+        return set(tokens), [email] if email else [], [check_in] if isinstance(check_in, str) else []
+
+    def _add(self, reservation_id, entry):
+        self._by_id[reservation_id] = entry
+        for keys, sorted_keys in zip(self._keys(entry), (self._names, self._emails, self._check_ins)):
+            for key in keys:
+                sorted_keys.insert(key, reservation_id)
+
+    def _remove(self, reservation_id):
+        entry = self._by_id.pop(reservation_id, None)
+        if entry is None:
+            return
+        for keys, sorted_keys in zip(self._keys(entry), (self._names, self._emails, self._check_ins)):
+            for key in keys:
+                sorted_keys.remove(key, reservation_id)
+
+    def upsert(self, reservation):
+        """Agrega o reemplaza una reserva en el índice"""
+        indexed = self._entry(reservation)
+        if indexed is None:
+            return
+        with self._lock:
+            self._remove(indexed[0])
+            self._add(*indexed)
+            if self._journal is not None:
+                self._journal.append(indexed)
+
+    def remove(self, reservation_id):
+        """Elimina una reserva del índice"""
+        with self._lock:
+            self._remove(reservation_id)
+            if self._journal is not None:
+                self._journal.append((reservation_id, None))
+
+    def rebuild(self, reservations):
+        """Reconstruye el índice completo a partir de un iterable de reservas.
+
+        Las altas, cambios y bajas que llegan mientras se recorre el iterable
+        (un scan puede tardar varios segundos) se reaplican sobre el índice
+        nuevo, así que no se pierden ni los pisa una lectura anterior.
+        """
+        with self._lock:
+            self._journal = []
+        try:
+            by_id = {}
+            for reservation in reservations:
+                indexed = self._entry(reservation)
+                if indexed is not None:
+                    by_id[indexed[0]] = indexed[1]
+        except BaseException:
+            with self._lock:
+                self._journal = None
+            raise
+        names, emails, check_ins = [], [], []
+        for reservation_id, entry in by_id.items():
+            for keys, pairs in zip(self._keys(entry), (names, emails, check_ins)):
+                pairs.extend((key, reservation_id) for key in keys)
+        names, emails, check_ins = _SortedKeys(names), _SortedKeys(emails), _SortedKeys(check_ins)
+        with self._lock:
+            self._names, self._emails, self._check_ins, self._by_id = names, emails, check_ins, by_id
+            journal, self._journal = self._journal, None
+            for reservation_id, entry in journal:
+                self._remove(reservation_id)
+                if entry is not None:
+                    self._add(reservation_id, entry)
+            self.loaded_at = time.monotonic()
+
+    def search(self, name=None, email=None, check_in_from=None, check_in_to=None, limit=50):
+        """Reservas que cumplen todos los criterios dados, ordenadas por fecha de entrada.
+
+        name: prefijos de palabras del nombre ('mar gar' encuentra 'María García')
+        email: correo completo
+        check_in_from / check_in_to: fechas YYYY-MM-DD inclusivas (cualquiera puede faltar)
+        Devuelve (resultados como diccionarios, total de coincidencias).
+        """
+        query_tokens = name_tokens(name) if name else ()
+        query_email = normalize(email) if email else None
+        if not (query_tokens or query_email or check_in_from or check_in_to):
+            raise ValueError('Indique al menos un criterio de búsqueda')
+
+        with self._lock:
+            criteria = [(self._names, self._names.prefix(token), 'name', token) for token in query_tokens]
+            if query_email:
+                criteria.append((self._emails, self._emails.between(query_email, query_email), 'email', query_email))
+            if check_in_from or check_in_to:
+                criteria.append((self._check_ins, self._check_ins.between(check_in_from, check_in_to), 'check_in', None))
+            criteria.sort(key=lambda criterion: criterion[1][1] - criterion[1][0])
+
+            # Un solo criterio de fechas: la lista ya está en el orden del resultado
+            if len(criteria) == 1 and criteria[0][2] == 'check_in':
+                low, high = criteria[0][1]
+                ids = self._check_ins.ids[low:min(high, low + limit)]
+                return [dict(zip(RESULT_FIELDS, self._by_id[reservation_id][2])) for reservation_id in ids], high - low
+
+            # Candidatas del criterio más selectivo; el resto se interseca como
+            # conjunto (en C) o, si su lista es mucho más grande, se verifica en cada una
+            (sorted_keys, (low, high), _, _), others = criteria[0], criteria[1:]
+            matches = set(sorted_keys.ids[low:high])
+            for sorted_keys, (low, high), kind, value in others:
+                if not matches:
+                    break
+                if high - low <= len(matches) * _INTERSECT_RATIO:
+                    matches.intersection_update(sorted_keys.ids[low:high])
+                elif kind == 'name':
+                    matches = {rid for rid in matches if any(t.startswith(value) for t in self._by_id[rid][0])}
+                elif kind == 'email':
+                    matches = {rid for rid in matches if self._by_id[rid][1] == value}
+                else:
+                    matches = {rid for rid in matches if self._check_in_between(rid, check_in_from, check_in_to)}
+
+            total = len(matches)
+            if total >= _ORDERED_WALK_MIN:
+                # Muchas coincidencias: las primeras aparecen pronto en la lista de entradas
+                low, high = self._check_ins.between(check_in_from, check_in_to)
+                ids = self._check_ins.ids
+                first = []
+                for position in range(low, high):
+                    reservation_id = ids[position]
+                    if reservation_id in matches:
+                        first.append(reservation_id)
+                        if len(first) == limit:
+                            break
+                if len(first) < limit:
+                    # Reservas sin fecha de entrada (no están en esa lista) van al final
+                    first.extend(sorted(matches.difference(first))[:limit - len(first)])
+            else:
+                first = heapq.nsmallest(limit, matches, key=self._order_key)
+            return [dict(zip(RESULT_FIELDS, self._by_id[reservation_id][2])) for reservation_id in first], total
+
+    def _check_in_between(self, reservation_id, first, last):
+        # Igual que between() sobre la lista de entradas: sin fecha de entrada no cumple ningún rango
+        check_in = self._by_id[reservation_id][2][_CHECK_IN]
+        return isinstance(check_in, str) and (not first or check_in >= first) and (not last or check_in <= last)
+
+    def _order_key(self, reservation_id):
+        # Mismo orden que la lista de entradas; sin fecha de entrada, al final
+        check_in = self._by_id[reservation_id][2][_CHECK_IN]
+        return check_in is None, check_in or '', reservation_id
+
+    def stats(self):
+        with self._lock:
+            return {
+                'reservations': len(self._by_id),
+                'ready': self.loaded_at is not None,
+                'rebuilding': self._journal is not None,
+                'name_keys': len(self._names),
+                'loaded_seconds_ago': round(time.monotonic() - self.loaded_at, 1) if self.loaded_at else None,
+            }
@@ -0,0 +1,183 @@
+"""Variantes de las imágenes de habitaciones con hash de contenido.
+
+Por cada imagen de static/rooms genera, en un directorio de caché, copias
+redimensionadas a varios anchos en JPEG y WebP con el hash del contenido en
+el nombre (room1-640w.3f9a1c2b7d4e.webp). Como el nombre cambia cuando cambia
+la imagen, se pueden servir con Cache-Control immutable. Pillow está en
+requirements.txt; si falta solo se copia el original con su hash: se mantiene
+la caché de larga duración pero no hay variantes.
+
+Se ejecuta al iniciar la aplicación (los archivos ya generados se reutilizan)
+o durante el despliegue. Las variantes que ya no corresponden a ninguna
+imagen no se borran al iniciar, porque otros procesos (o los de la versión
+anterior durante un despliegue) pueden estar generándolas o sirviéndolas; se
+eliminan explícitamente cuando ya no queda ninguno:
+
+    python image_derivatives.py
+    python image_derivatives.py --prune
+"""
+import argparse
+import hashlib
+import os
+import tempfile
+
+try:
+    from PIL import Image
+except ImportError:  # Sin Pillow no hay variantes, solo el original con hash
+    Image = None
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png'}
+TEMPORARY_PREFIX = '.tmp-'
+DEFAULT_WIDTHS = (320, 640, 960)
+JPEG_QUALITY = 82
+WEBP_QUALITY = 80
+# Forma parte del hash: cambiar anchos o calidad genera nombres nuevos
+PIPELINE_VERSION = f'1:{JPEG_QUALITY}:{WEBP_QUALITY}'
+
+
+def _write_atomic(path, write):
+    """Escribe en un temporal del mismo directorio y lo renombra (otro proceso puede estar generando lo mismo)"""
+    descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path), prefix=TEMPORARY_PREFIX)
+    try:
+        with os.fdopen(descriptor, 'wb') as output:
+            write(output)
+        # mkstemp crea el archivo con permisos 0600: con X-Sendfile lo lee el proxy, otro usuario
+        os.chmod(temporary, 0o644)
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+class ImageDerivatives:
+    """Genera las variantes y resuelve rutas de imagen a URLs con hash"""
+
+    def __init__(self, static_dir, cache_dir, subdirectory='rooms', widths=DEFAULT_WIDTHS):
+        self.static_dir = static_dir
+        self.cache_dir = cache_dir
+        self.subdirectory = subdirectory
+        self.widths = tuple(sorted(widths))
+        # 'rooms/room1.jpg' -> {'original': nombre, 'jpeg': [(ancho, nombre)], 'webp': [(ancho, nombre)]}
+        self.manifest = {}
+        self.files = set()
+        self.generated = 0
+
+    def build(self):
+        """Genera las variantes que falten (no borra nada; ver prune)"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        manifest = {}
+        source_root = os.path.join(self.static_dir, self.subdirectory)
+        for name in sorted(os.listdir(source_root)) if os.path.isdir(source_root) else []:
+            stem, extension = os.path.splitext(name)
+            if extension.lower() not in IMAGE_EXTENSIONS:
+                continue
+            with open(os.path.join(source_root, name), 'rb') as source:
+                content = source.read()
+            digest = hashlib.sha256(content + f'|{self.widths}|{PIPELINE_VERSION}'.encode()).hexdigest()[:12]
+            manifest[f'{self.subdirectory}/{name}'] = self._derive(stem, extension.lower(), content, digest)
+        self.manifest = manifest
+        self.files = {
+            file_name for entry in manifest.values()
+            for file_name in [entry['original']] + [file_name for _, file_name in entry['jpeg'] + entry['webp']]
+        }
+        return self
+
+    def prune(self):
+        """Elimina del directorio de caché las variantes que no están en el manifiesto de build().
+
+        Los temporales de escrituras en curso se respetan y un archivo que ya
+        borró otro proceso no es un error. Devuelve cuántos se eliminaron.
+        """
+        removed = 0
+        for name in os.listdir(self.cache_dir):
+            if name in self.files or name.startswith(TEMPORARY_PREFIX):
+                continue
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+                removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def _derive(self, stem, extension, content, digest):
+        entry = {'original': f'{stem}.{digest}{extension}', 'jpeg': [], 'webp': []}
+        self._ensure(entry['original'], lambda output: output.write(content))
+        if Image is None:
+            return entry
+        with Image.open(os.path.join(self.static_dir, self.subdirectory, stem + extension)) as image:
+            image.load()
+            width, height = image.size
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            # Anchos configurados menores que la imagen, más el propio si no pasa del mayor
+            targets = [w for w in self.widths if w < width]
+            if width <= self.widths[-1]:
+                targets.append(width)
+            for target in targets:
+                if target == width:
+                    resized = image
+                else:
+                    resized = image.resize((target, max(1, round(height * target / width))), Image.LANCZOS)
+                for image_format, options in (
+                    ('jpeg', {'format': 'JPEG', 'quality': JPEG_QUALITY, 'optimize': True, 'progressive': True}),
+                    ('webp', {'format': 'WEBP', 'quality': WEBP_QUALITY, 'method': 6}),
+                ):
+                    name = f'{stem}-{target}w.{digest}.{"jpg" if image_format == "jpeg" else "webp"}'
+                    self._ensure(name, lambda output, resized=resized, options=options: resized.save(output, **options))
+                    entry[image_format].append((target, name))
+        return entry
+
+    def _ensure(self, name, write):
+        path = os.path.join(self.cache_dir, name)
+        if not os.path.exists(path):
+            _write_atomic(path, write)
+            self.generated += 1
+
+    def image(self, path, url_for_file, url_for_static):
+        """src, srcset (JPEG) y webp_srcset de una imagen; sin variantes, la URL estática original"""
+        entry = self.manifest.get(path)
+        if entry is None:
+            return {'src': url_for_static(path), 'srcset': '', 'webp_srcset': ''}
+        jpeg = entry['jpeg']
+        # src de respaldo: la variante de ancho medio, o el original con hash
+        src = url_for_file(jpeg[len(jpeg) // 2][1]) if jpeg else url_for_file(entry['original'])
+        return {
+            'src': src,
+            'srcset': ', '.join(f'{url_for_file(name)} {width}w' for width, name in jpeg),
+            'webp_srcset': ', '.join(f'{url_for_file(name)} {width}w' for width, name in entry['webp']),
+        }
+
+    def stats(self):
+        return {
+            'pillow': Image is not None,
+            'images': len(self.manifest),
+            'files': len(self.files),
+            'generated': self.generated,
+            'bytes': sum(self._size(name) for name in self.files),
+        }
+
+    def _size(self, name):
+        try:
+            return os.path.getsize(os.path.join(self.cache_dir, name))
+        except FileNotFoundError:
+            return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('cache_dir', nargs='?', default=os.path.join('local_storage', 'image_cache'))
+    parser.add_argument('--prune', action='store_true',
+                        help='Eliminar variantes obsoletas (solo cuando ningún proceso anterior las sirve)')
+    args = parser.parse_args()
+    root = os.path.dirname(os.path.abspath(__file__))
+    derivatives = ImageDerivatives(os.path.join(root, 'static'), args.cache_dir).build()
+    for path, entry in derivatives.manifest.items():
+        print(path, '->', entry['original'], *(name for _, name in entry['jpeg'] + entry['webp']))
+    if args.prune:
+        print('eliminados:', derivatives.prune())
+    print(derivatives.stats())
+
+
+if __name__ == '__main__':
+    main()
@@ -1,279 +1,1018 @@
+import time
+_MODULE_LOAD_STARTED = time.perf_counter()
+
+import base64
 import json
-import boto3
+import logging
 import os
-from datetime import datetime
+import random
+import sys
+import threading
+from datetime import datetime, timedelta
 from decimal import Decimal
-import traceback
 
-# Inicializar clientes de AWS
-print("Inicializando clientes de AWS...")
-dynamodb = boto3.resource('dynamodb')
-sns = boto3.client('sns')
+# boto3 y los clientes de AWS se crean al primer uso (ver get_client): SNS solo
+# se necesita cuando hay conflictos y no debe pagarse en cada arranque en frío
 
 # Obtener el ARN del tema SNS desde las variables de entorno
-print("Obteniendo variables de entorno...")
 SNS_TOPIC_ARN = os.environ.get('SNS_TOPIC_ARN')
 TABLE_NAME = os.environ.get('DYNAMODB_TABLE')
-print(f"SNS_TOPIC_ARN: {SNS_TOPIC_ARN}")
-print(f"TABLE_NAME: {TABLE_NAME}")
+# GSI opcional con clave de partición RoomNumber y clave de ordenamiento CheckInDate
+ROOM_INDEX_NAME = os.environ.get('ROOM_INDEX_NAME')
+# Estancia más larga esperada (noches, igual que --max-nights de bulk_io.py): la
+# consulta por índice solo lee reservas que empiezan dentro de esa distancia
+# antes del check-in, así que una estancia más larga no se detectaría
+MAX_STAY_NIGHTS = int(os.environ.get('MAX_STAY_NIGHTS', '365'))
+# Vista de ocupación opcional (clave RoomDate = "<habitación>#<fecha>", atributo
+# ReservationIDs). Requiere que el stream incluya OldImage (NEW_AND_OLD_IMAGES)
+OCCUPANCY_TABLE = os.environ.get('OCCUPANCY_TABLE')
+# Hilos usados para escribir en paralelo los cambios de estado de un lote
+STATUS_WRITE_WORKERS = int(os.environ.get('STATUS_WRITE_WORKERS', '8'))
+# Reporte opcional de tiempos de arranque en frío (carga, clientes, primera invocación)
+COLD_START_REPORT = os.environ.get('COLD_START_REPORT', '').lower() in ('1', 'true')
+# Un mismo conjunto de conflictos de una habitación no se vuelve a notificar dentro de
+# esta ventana (segundos, por contenedor); los envíos a SNS usan hasta NOTIFICATION_WORKERS hilos
+NOTIFICATION_DEDUP_SECONDS = int(os.environ.get('NOTIFICATION_DEDUP_SECONDS', '900'))
+NOTIFICATION_WORKERS = int(os.environ.get('NOTIFICATION_WORKERS', '4'))
+# Nivel de log (DEBUG, INFO, WARNING, ERROR) y fracción de registros del stream sin
+# conflicto ni error cuyo resultado se registra (los conflictos y errores siempre se registran)
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', '1'))
+# Valor de UpdatedBy en los cambios de estado que escribe la Lambda: los MODIFY que
+# ella misma genera se descartan sin leer DynamoDB
+STATUS_WRITER = 'lambda'
+# Tabla opcional de eventos ya procesados (clave EventID, TTL en el atributo ExpiresAt):
+# los registros que el stream reentrega tras un reintento no se vuelven a evaluar
+IDEMPOTENCY_TABLE = os.environ.get('IDEMPOTENCY_TABLE')
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', str(24 * 3600)))
+
+# Clientes de AWS de bajo nivel, creados una sola vez por contenedor
+_clients = {}
+_clients_lock = threading.Lock()
+cold_start_timings = {}
+_first_invocation = True
+
+# Conflictos ya notificados: (habitación, frozenset de ReservationID) -> instante del envío
+_notified_conflicts = {}
+_notified_conflicts_lock = threading.Lock()
+_notification_executor = None
+
+def _elapsed_ms(started):
+    return round((time.perf_counter() - started) * 1000, 2)
+
+def get_client(service_name):
+    """Devuelve el cliente de bajo nivel del servicio, creándolo al primer uso"""
+    client = _clients.get(service_name)
+    if client is not None:
+        return client
+    with _clients_lock:
+        if service_name not in _clients:
+            started = time.perf_counter()
+            import boto3
+            if 'boto3_import_ms' not in cold_start_timings:
+                cold_start_timings['boto3_import_ms'] = _elapsed_ms(started)
+            started = time.perf_counter()
+            _clients[service_name] = boto3.client(service_name)
+            cold_start_timings[f'{service_name}_client_ms'] = _elapsed_ms(started)
+        return _clients[service_name]
+
+def to_attribute_values(values):
+    """Convierte valores de expresión de Python al formato de atributos de DynamoDB"""
+    converted = {}
+    for name, value in values.items():
+        if isinstance(value, bool):
+            converted[name] = {'BOOL': value}
+        elif isinstance(value, (int, float, Decimal)):
+            converted[name] = {'N': str(value)}
+        elif value is None:
+            converted[name] = {'NULL': True}
+        else:
+            converted[name] = {'S': str(value)}
+    return converted
+
+def _deserialize_binary(value):
+    # En los eventos del stream los binarios llegan en base64; en las respuestas del cliente, como bytes
+    return value if isinstance(value, (bytes, bytearray)) else base64.b64decode(value)
+
+# Conversión por tipo de AttributeValue; L y M se resuelven recursivamente
+_ATTRIBUTE_DESERIALIZERS = {
+    'S': str,
+    'N': Decimal,
+    'BOOL': bool,
+    'NULL': lambda value: None,
+    'B': _deserialize_binary,
+    'SS': set,
+    'NS': lambda values: {Decimal(value) for value in values},
+    'BS': lambda values: {_deserialize_binary(value) for value in values},
+    'L': lambda values: [deserialize_attribute(value) for value in values],
+    'M': lambda values: {key: deserialize_attribute(value) for key, value in values.items()},
+}
+
+# Campos que usan la verificación de conflictos y la notificación (SlotsClaimed lo
+# escribe la aplicación cuando la reserva ya tomó sus noches en una transacción;
+# Version y UpdatedBy, quien escribe, condicionan los cambios de estado)
+RESERVATION_FIELDS = ('ReservationID', 'RoomNumber', 'CheckInDate', 'CheckOutDate', 'Status',
+                      'GuestName', 'ContactEmail', 'SlotsClaimed', 'Version', 'UpdatedBy')
+RESERVATION_PROJECTION = 'ReservationID, RoomNumber, CheckInDate, CheckOutDate, #status, GuestName, ContactEmail'
 
-table = dynamodb.Table(TABLE_NAME) if TABLE_NAME else None
+def deserialize_attribute(value):
+    """Convierte un AttributeValue de DynamoDB ({'S': 'x'}, {'M': {...}}, ...) a Python"""
+    (type_name, raw), = value.items()
+    if type_name == 'S':  # El tipo más común se resuelve sin llamada adicional
+        return raw
+    return _ATTRIBUTE_DESERIALIZERS[type_name](raw)
+
+def from_dynamodb_item(item, fields=None):
+    """Convierte un ítem de DynamoDB a diccionario Python.
+
+    Con fields se convierten solo esos atributos (los ausentes se omiten).
+    """
+    if fields is None:
+        return {key: deserialize_attribute(value) for key, value in item.items()}
+    return {key: deserialize_attribute(item[key]) for key in fields if key in item}
 
 class DecimalEncoder(json.JSONEncoder):
-    """Clase auxiliar para manejar Decimal en la serialización JSON"""
+    """Clase auxiliar para manejar Decimal, conjuntos y binarios en la serialización JSON"""
     def default(self, o):
         if isinstance(o, Decimal):
             return float(o)
+        if isinstance(o, set):
+            return sorted(o, key=str)
+        if isinstance(o, (bytes, bytearray)):
+            return base64.b64encode(o).decode('ascii')
         return super(DecimalEncoder, self).default(o)
 
+class JsonLogFormatter(logging.Formatter):
+    """Una línea JSON por entrada; los campos diferidos se evalúan solo al emitirla"""
+    def format(self, record):
+        entry = {'level': record.levelname, 'message': record.getMessage()}
+        for key, value in getattr(record, 'fields', {}).items():
+            entry[key] = value() if callable(value) else value
+        if record.exc_info:
+            entry['error'] = self.formatException(record.exc_info)
+        return json.dumps(entry, cls=DecimalEncoder, ensure_ascii=False)
+
+logger = logging.getLogger('reservas')
+logger.setLevel(LOG_LEVEL)
+# El runtime de Lambda agrega su propio handler de texto a la raíz; no duplicar las líneas
+logger.propagate = False
+log_handler = logging.StreamHandler(sys.stdout)
+log_handler.setFormatter(JsonLogFormatter())
+logger.addHandler(log_handler)
+
+def log(level, message, exc_info=False, **fields):
+    """Registra una entrada estructurada si el nivel está habilitado.
+
+    Los campos pueden ser funciones sin argumentos (por ejemplo lambda: event)
+    para que el contenido solo se construya y serialice cuando se emite.
+    """
+    if logger.isEnabledFor(level):
+        logger.log(level, message, exc_info=exc_info, extra={'fields': fields})
+
+def sampled():
+    """Decide si se registra el resultado de un registro sin novedades"""
+    return LOG_SAMPLE_RATE >= 1 or random.random() < LOG_SAMPLE_RATE
+
+def query_room_reservations(room_number, check_in_date, check_out_date, current_reservation_id=None):
+    """Consulta el GSI por habitación leyendo solo reservas que pueden solaparse.
+
+    Se leen las que empiezan entre MAX_STAY_NIGHTS noches antes del check-in y
+    la noche anterior al check-out: el costo no crece con el historial.
+    """
+    check_in = datetime.strptime(check_in_date, '%Y-%m-%d')
+    check_out = datetime.strptime(check_out_date, '%Y-%m-%d')
+    query_kwargs = {
+        'TableName': TABLE_NAME,
+        'IndexName': ROOM_INDEX_NAME,
+        'ProjectionExpression': RESERVATION_PROJECTION,
+        'KeyConditionExpression': "RoomNumber = :room AND CheckInDate BETWEEN :earliest AND :last_start",
+        'FilterExpression': "CheckOutDate > :check_in AND #status <> :canceled",
+        'ExpressionAttributeValues': {
+            ':room': room_number,
+            ':earliest': (check_in - timedelta(days=MAX_STAY_NIGHTS)).strftime('%Y-%m-%d'),
+            ':last_start': (check_out - timedelta(days=1)).strftime('%Y-%m-%d'),
+            ':check_in': check_in_date,
+            ':canceled': 'Cancelada'
+        },
+        'ExpressionAttributeNames': {
+            '#status': 'Status'
+        }
+    }
+    if current_reservation_id:
+        query_kwargs['FilterExpression'] += " AND ReservationID <> :rid"
+        query_kwargs['ExpressionAttributeValues'][':rid'] = current_reservation_id
+    query_kwargs['ExpressionAttributeValues'] = to_attribute_values(query_kwargs['ExpressionAttributeValues'])
+    client = get_client('dynamodb')
+    items = []
+    while True:
+        response = client.query(**query_kwargs)
+        items.extend(from_dynamodb_item(item) for item in response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return items
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def scan_room_reservations(room_number, current_reservation_id=None):
+    """Scan completo filtrado por habitación (respaldo cuando no hay GSI)"""
+    filter_expression = "RoomNumber = :room AND #status <> :canceled"
+    scan_kwargs = {
+        'TableName': TABLE_NAME,
+        'ProjectionExpression': RESERVATION_PROJECTION,
+        'FilterExpression': filter_expression,
+        'ExpressionAttributeValues': {
+            ':room': room_number,
+            ':canceled': 'Cancelada'
+        },
+        'ExpressionAttributeNames': {
+            '#status': 'Status'
+        }
+    }
+    if current_reservation_id:
+        scan_kwargs['FilterExpression'] += " AND ReservationID <> :rid"
+        scan_kwargs['ExpressionAttributeValues'][':rid'] = current_reservation_id
+    scan_kwargs['ExpressionAttributeValues'] = to_attribute_values(scan_kwargs['ExpressionAttributeValues'])
+    client = get_client('dynamodb')
+    items = []
+    while True:
+        response = client.scan(**scan_kwargs)
+        items.extend(from_dynamodb_item(item) for item in response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return items
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def find_room_reservations(room_number, check_in_date, check_out_date, current_reservation_id=None):
+    """Obtiene las reservas candidatas de la habitación, por GSI si está disponible"""
+    if ROOM_INDEX_NAME:
+        try:
+            return query_room_reservations(room_number, check_in_date, check_out_date, current_reservation_id)
+        except Exception as e:
+            log(logging.WARNING, 'No se pudo consultar el índice, usando scan', index=ROOM_INDEX_NAME, reason=str(e))
+    return scan_room_reservations(room_number, current_reservation_id)
+
 def check_reservation_conflicts(room_number, check_in_date, check_out_date, current_reservation_id):
     """Verifica conflictos con otras reservas"""
-    print(f"\n=== VERIFICANDO CONFLICTOS ===")
-    print(f"Habitación: {room_number}")
-    print(f"Check-in: {check_in_date}")
-    print(f"Check-out: {check_out_date}")
-    print(f"ID de reserva actual: {current_reservation_id}")
-    
     try:
         # Convertir fechas para comparación
         check_in = datetime.strptime(check_in_date, '%Y-%m-%d')
         check_out = datetime.strptime(check_out_date, '%Y-%m-%d')
         
-        # Scan para encontrar reservas en la misma habitación
-        filter_expression = "RoomNumber = :room AND ReservationID <> :rid AND #status <> :canceled"
-        response = table.scan(
-            FilterExpression=filter_expression,
-            ExpressionAttributeValues={
-                ':room': room_number,
-                ':rid': current_reservation_id,
-                ':canceled': 'Cancelada'
-            },
-            ExpressionAttributeNames={
-                '#status': 'Status'
-            }
-        )
-        
-        print(f"Encontradas {len(response.get('Items', []))} reservas para verificar")
+        # Buscar reservas candidatas en la misma habitación
+        candidates = find_room_reservations(room_number, check_in_date, check_out_date, current_reservation_id)
         
         # Verificar solapamientos
         conflicts = []
-        for item in response.get('Items', []):
+        for item in candidates:
             existing_check_in = datetime.strptime(item['CheckInDate'], '%Y-%m-%d')
             existing_check_out = datetime.strptime(item['CheckOutDate'], '%Y-%m-%d')
             
             if check_in < existing_check_out and check_out > existing_check_in:
-                print(f"¡CONFLICTO! con reserva {item['ReservationID']}")
                 conflicts.append(item)
         
-        print(f"Total de conflictos encontrados: {len(conflicts)}")
+        log(logging.DEBUG, 'Conflictos verificados', room=room_number, check_in=check_in_date,
+            check_out=check_out_date, reservation_id=current_reservation_id, candidates=len(candidates),
+            conflicts=lambda: [conflict['ReservationID'] for conflict in conflicts])
         return conflicts
     
-    except Exception as e:
-        print(f"ERROR en check_reservation_conflicts: {str(e)}")
-        print(traceback.format_exc())
+    except Exception:
+        log(logging.ERROR, 'Error al verificar conflictos', exc_info=True, room=room_number,
+            reservation_id=current_reservation_id)
         return []
 
-def send_conflict_notification(reservation, conflicts):
-    """Envía notificación SNS sobre conflictos"""
-    print(f"\n=== ENVIANDO NOTIFICACIÓN DE CONFLICTO ===")
-    
-    if not SNS_TOPIC_ARN:
-        print("ERROR: No se ha configurado SNS_TOPIC_ARN")
-        return False
-    
-    try:
-        # Crear mensaje
-        subject = f"¡ALERTA! Conflicto de reservas para la habitación {reservation['RoomNumber']}"
-        
-        message_body = f"""
+# Plantillas del mensaje de conflicto: se arman una vez y se llenan con format_map
+NOTIFICATION_SUBJECT = "¡ALERTA! Conflicto de reservas para la habitación {room}"
+NOTIFICATION_HEADER = """
         Se ha detectado un conflicto de reservas en el sistema del Hotel Cloud Suites.
-        
+        Habitación: {room}
+        """
+NOTIFICATION_RESERVATION = """
         Detalles de la nueva reserva:
-        - ID: {reservation['ReservationID']}
-        - Habitación: {reservation['RoomNumber']}
-        - Huésped: {reservation.get('GuestName', 'No disponible')}
-        - Fecha de entrada: {reservation['CheckInDate']}
-        - Fecha de salida: {reservation['CheckOutDate']}
-        - Email: {reservation.get('ContactEmail', 'No disponible')}
+        - ID: {ReservationID}
+        - Habitación: {RoomNumber}
+        - Huésped: {GuestName}
+        - Fecha de entrada: {CheckInDate}
+        - Fecha de salida: {CheckOutDate}
+        - Email: {ContactEmail}
         
         Esta reserva tiene conflicto con las siguientes reservas existentes:
         """
-        
-        for conflict in conflicts:
-            message_body += f"""
-        * Reserva ID: {conflict['ReservationID']}
-          - Huésped: {conflict.get('GuestName', 'No disponible')}
-          - Fecha de entrada: {conflict['CheckInDate']}
-          - Fecha de salida: {conflict['CheckOutDate']}
-          - Email: {conflict.get('ContactEmail', 'No disponible')}
+NOTIFICATION_CONFLICT = """
+        * Reserva ID: {ReservationID}
+          - Huésped: {GuestName}
+          - Fecha de entrada: {CheckInDate}
+          - Fecha de salida: {CheckOutDate}
+          - Email: {ContactEmail}
         """
-        
-        message_body += """
+NOTIFICATION_MORE_CONFLICTS = """
+        * ... y {count} reservas más
+        """
+# Conflictos listados por reserva; mantiene el mensaje de un grupo grande bajo el límite de SNS
+NOTIFICATION_MAX_LISTED = 10
+NOTIFICATION_FOOTER = """
         Por favor, contacte a los huéspedes para resolver este conflicto lo antes posible.
         
         Este es un mensaje automático del sistema de reservas del Hotel Cloud Suites.
         """
-        
-        # Enviar notificación
-        print(f"Enviando a SNS Topic: {SNS_TOPIC_ARN}")
-        response = sns.publish(
+
+class _NotificationFields(dict):
+    """Valores para las plantillas; los campos ausentes se muestran como no disponibles"""
+    def __missing__(self, key):
+        return 'No disponible'
+
+def render_conflict_message(room_number, conflicts_by_reservation, reservations):
+    """Arma un solo mensaje con todas las reservas en conflicto de la habitación"""
+    parts = [NOTIFICATION_HEADER.format(room=room_number)]
+    for reservation_id, conflicts in sorted(conflicts_by_reservation.items()):
+        parts.append(NOTIFICATION_RESERVATION.format_map(_NotificationFields(reservations[reservation_id])))
+        listed = conflicts[:NOTIFICATION_MAX_LISTED]
+        parts.extend(NOTIFICATION_CONFLICT.format_map(_NotificationFields(conflict)) for conflict in listed)
+        if len(conflicts) > len(listed):
+            parts.append(NOTIFICATION_MORE_CONFLICTS.format(count=len(conflicts) - len(listed)))
+    parts.append(NOTIFICATION_FOOTER)
+    return ''.join(parts)
+
+def conflict_set_key(room_number, conflicts_by_reservation):
+    """Identidad de un conflicto: la habitación y todas las reservas involucradas"""
+    reservation_ids = set(conflicts_by_reservation)
+    for conflicts in conflicts_by_reservation.values():
+        reservation_ids.update(conflict['ReservationID'] for conflict in conflicts)
+    return room_number, frozenset(reservation_ids)
+
+def _recently_notified(key):
+    """Indica si el mismo conjunto de conflictos ya se notificó dentro de la ventana"""
+    now = time.monotonic()
+    with _notified_conflicts_lock:
+        for expired in [k for k, sent_at in _notified_conflicts.items() if now - sent_at > NOTIFICATION_DEDUP_SECONDS]:
+            del _notified_conflicts[expired]
+        return key in _notified_conflicts
+
+def send_conflict_notification(room_number, conflicts_by_reservation, reservations):
+    """Envía una notificación SNS con los conflictos de una habitación"""
+    reservation_ids = sorted(conflicts_by_reservation)
+    if not SNS_TOPIC_ARN:
+        log(logging.ERROR, 'No se ha configurado SNS_TOPIC_ARN', room=room_number, reservation_ids=reservation_ids)
+        return False
+    
+    try:
+        response = get_client('sns').publish(
             TopicArn=SNS_TOPIC_ARN,
-            Subject=subject,
-            Message=message_body
+            Subject=NOTIFICATION_SUBJECT.format(room=room_number),
+            Message=render_conflict_message(room_number, conflicts_by_reservation, reservations)
         )
-        print(f"Notificación enviada con éxito: {response['MessageId']}")
+        with _notified_conflicts_lock:
+            _notified_conflicts[conflict_set_key(room_number, conflicts_by_reservation)] = time.monotonic()
+        log(logging.INFO, 'Notificación de conflicto enviada', room=room_number, reservation_ids=reservation_ids,
+            message_id=response['MessageId'])
         return True
     
-    except Exception as e:
-        print(f"ERROR al enviar notificación SNS: {str(e)}")
-        print(traceback.format_exc())
+    except Exception:
+        log(logging.ERROR, 'Error al enviar notificación SNS', exc_info=True, room=room_number,
+            reservation_ids=reservation_ids, topic=SNS_TOPIC_ARN)
         return False
 
-def update_reservation_status(reservation_id, new_status):
-    """Actualiza el estado de una reserva en DynamoDB"""
-    print(f"\n=== ACTUALIZANDO ESTADO DE RESERVA ===")
-    print(f"ID: {reservation_id}, Nuevo estado: {new_status}")
-    
+def notify_room_conflicts(conflicts_by_room, reservations):
+    """Publica en segundo plano un mensaje por habitación con conflictos.
+
+    Devuelve {habitación: future} para esperar los envíos antes de terminar la
+    invocación; las habitaciones cuyo conjunto de conflictos ya se notificó
+    dentro de NOTIFICATION_DEDUP_SECONDS quedan con None.
+    """
+    global _notification_executor
+    pending = {}
+    for room_number, conflicts_by_reservation in conflicts_by_room.items():
+        if _recently_notified(conflict_set_key(room_number, conflicts_by_reservation)):
+            pending[room_number] = None
+            continue
+        if _notification_executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            _notification_executor = ThreadPoolExecutor(max_workers=NOTIFICATION_WORKERS,
+                                                        thread_name_prefix='notificaciones')
+        pending[room_number] = _notification_executor.submit(
+            send_conflict_notification, room_number, conflicts_by_reservation, reservations
+        )
+    return pending
+
+# Resultado de update_reservation_status
+WRITE_OK = 'ok'
+WRITE_STALE = 'obsoleta'
+WRITE_ERROR = 'error'
+
+def update_reservation_status(reservation_id, new_status, expected_version=None):
+    """Actualiza el estado de una reserva en DynamoDB si sigue como se evaluó.
+
+    La escritura solo se aplica si la reserva sigue Pendiente y con la Version
+    de la imagen evaluada (o sin Version, si es anterior a ese atributo). Si
+    otra escritura llegó antes (una edición, una cancelación o esta misma
+    Lambda con un registro reentregado) devuelve WRITE_STALE: el registro más
+    reciente de la reserva llegará después por el stream.
+    """
+    client = get_client('dynamodb')
     try:
         updated_at = datetime.now().isoformat()
+        values = {
+            ':s': new_status,
+            ':u': updated_at,
+            ':by': STATUS_WRITER,
+            ':pending': 'Pendiente',
+            ':zero': 0,
+            ':one': 1,
+        }
+        if expected_version is None:
+            condition = '#status = :pending AND attribute_not_exists(Version)'
+        else:
+            condition = '#status = :pending AND Version = :v'
+            values[':v'] = expected_version
         
-        response = table.update_item(
-            Key={'ReservationID': reservation_id},
-            UpdateExpression="SET #status = :s, UpdatedAt = :u",
+        response = client.update_item(
+            TableName=TABLE_NAME,
+            Key={'ReservationID': {'S': reservation_id}},
+            UpdateExpression="SET #status = :s, UpdatedAt = :u, UpdatedBy = :by, "
+                             "Version = if_not_exists(Version, :zero) + :one",
+            ConditionExpression=condition,
             ExpressionAttributeNames={'#status': 'Status'},
-            ExpressionAttributeValues={
-                ':s': new_status,
-                ':u': updated_at
-            },
+            ExpressionAttributeValues=to_attribute_values(values),
             ReturnValues="UPDATED_NEW"
         )
-        print(f"Actualización exitosa: {response.get('Attributes')}")
-        return True
+        log(logging.DEBUG, 'Estado actualizado', reservation_id=reservation_id, status=new_status,
+            attributes=lambda: from_dynamodb_item(response.get('Attributes', {})))
+        return WRITE_OK
     
-    except Exception as e:
-        print(f"ERROR al actualizar reserva: {str(e)}")
-        print(traceback.format_exc())
-        return False
+    except client.exceptions.ConditionalCheckFailedException:
+        log(logging.DEBUG, 'Estado no actualizado: la reserva cambió desde el evento', reservation_id=reservation_id,
+            status=new_status, expected_version=expected_version)
+        return WRITE_STALE
+    except Exception:
+        log(logging.ERROR, 'Error al actualizar reserva', exc_info=True, reservation_id=reservation_id,
+            status=new_status)
+        return WRITE_ERROR
 
-def process_dynamodb_stream_event(record):
-    """Procesa un evento de DynamoDB Stream"""
-    print("\n=== PROCESANDO EVENTO DYNAMODB STREAM ===")
-    
+def process_dynamodb_stream_event(record, fields=RESERVATION_FIELDS):
+    """Procesa un evento de DynamoDB Stream (fields=None convierte la imagen completa)"""
     try:
         # Solo procesamos eventos INSERT o MODIFY
         if record['eventName'] not in ['INSERT', 'MODIFY']:
-            print(f"Ignorando evento {record['eventName']}")
+            log(logging.DEBUG, 'Evento ignorado', event_name=record['eventName'])
             return None
         
         # Extraer los datos de la imagen nueva - CORREGIDO: acceso a través de dynamodb
         if 'dynamodb' not in record or 'NewImage' not in record['dynamodb']:
-            print("No hay NewImage en el registro")
+            log(logging.DEBUG, 'No hay NewImage en el registro', event_id=record.get('eventID'))
             return None
         
-        # Convertir de formato DynamoDB a diccionario Python
-        reservation = {}
-        for key, value in record['dynamodb']['NewImage'].items():
-            # Manejar los diferentes tipos de datos de DynamoDB
-            if 'S' in value:
-                reservation[key] = value['S']
-            elif 'N' in value:
-                reservation[key] = Decimal(value['N'])
-            elif 'BOOL' in value:
-                reservation[key] = value['BOOL']
-            elif 'NULL' in value:  # AÑADIDO: manejo de valores NULL
-                reservation[key] = None
-            elif 'M' in value:
-                # Mapa (diccionario)
-                inner_map = {}
-                for inner_key, inner_value in value['M'].items():
-                    if 'S' in inner_value:
-                        inner_map[inner_key] = inner_value['S']
-                    elif 'N' in inner_value:
-                        inner_map[inner_key] = Decimal(inner_value['N'])
-                    elif 'NULL' in inner_value:  # AÑADIDO: manejo de valores NULL en mapas
-                        inner_map[inner_key] = None
-                reservation[key] = inner_map
+        # Convertir de formato DynamoDB a diccionario Python (solo los campos que se usan)
+        reservation = from_dynamodb_item(record['dynamodb']['NewImage'], fields)
         
-        print(f"Reserva extraída del stream: {json.dumps(reservation, cls=DecimalEncoder)}")
+        log(logging.DEBUG, 'Reserva extraída del stream', reservation=reservation)
         return reservation
     
-    except Exception as e:
-        print(f"ERROR al procesar evento DynamoDB Stream: {str(e)}")
-        print(traceback.format_exc())
+    except Exception:
+        log(logging.ERROR, 'Error al procesar evento DynamoDB Stream', exc_info=True,
+            event_id=record.get('eventID'))
         return None
 
+def get_record_reservation_id(record):
+    """Obtiene el ReservationID de las claves del registro del stream"""
+    try:
+        return record['dynamodb']['Keys']['ReservationID']['S']
+    except (KeyError, TypeError):
+        return None
+
+def get_record_identifier(record):
+    """Identificador del registro para reportar batchItemFailures"""
+    return record.get('dynamodb', {}).get('SequenceNumber') or record.get('eventID')
+
+def is_own_status_write(record):
+    """Indica si el registro es un MODIFY producido por un cambio de estado de esta Lambda.
+
+    Esos cambios solo pasan una reserva de Pendiente a Confirmada o Conflicto:
+    no cambian sus noches ni dejan nada que verificar.
+    """
+    if record.get('eventName') != 'MODIFY':
+        return False
+    updated_by = record.get('dynamodb', {}).get('NewImage', {}).get('UpdatedBy', {})
+    return updated_by.get('S') == STATUS_WRITER
+
+def processed_event_ids(event_ids):
+    """EventIDs de la lista que ya figuran en la tabla de idempotencia (y no vencieron)"""
+    if not IDEMPOTENCY_TABLE or not event_ids:
+        return set()
+    now = int(time.time())
+    try:
+        items = batch_get_items(IDEMPOTENCY_TABLE, [{'EventID': {'S': event_id}} for event_id in event_ids],
+                                'EventID, ExpiresAt')
+    except Exception:
+        # Sin la tabla se evalúan todos: las escrituras condicionadas siguen evitando estados incorrectos
+        log(logging.WARNING, 'No se pudo leer la tabla de idempotencia', exc_info=True, events=len(event_ids))
+        return set()
+    # El TTL de DynamoDB borra con retraso: los vencidos se ignoran aquí
+    return {item['EventID'] for item in items if item.get('ExpiresAt', now + 1) > now}
+
+def mark_events_processed(event_ids):
+    """Registra los EventIDs procesados con vencimiento; un fallo solo se registra en el log.
+
+    Si no se registran, un reintento los vuelve a evaluar y las escrituras
+    condicionadas evitan que eso cambie algún estado.
+    """
+    if not IDEMPOTENCY_TABLE or not event_ids:
+        return
+    client = get_client('dynamodb')
+    expires_at = int(time.time()) + IDEMPOTENCY_TTL_SECONDS
+    event_ids = sorted(event_ids)
+    try:
+        for start in range(0, len(event_ids), 25):
+            request = {IDEMPOTENCY_TABLE: [
+                {'PutRequest': {'Item': {'EventID': {'S': event_id}, 'ExpiresAt': {'N': str(expires_at)}}}}
+                for event_id in event_ids[start:start + 25]
+            ]}
+            attempt = 0
+            while request:
+                response = client.batch_write_item(RequestItems=request)
+                request = response.get('UnprocessedItems')
+                if request:
+                    attempt += 1
+                    time.sleep(min(1.0, 0.05 * 2 ** attempt))
+    except Exception:
+        log(logging.WARNING, 'No se pudieron registrar los eventos procesados', exc_info=True,
+            events=len(event_ids))
+
+def reservations_overlap(reservation, other):
+    """Indica si dos reservas se solapan en fechas"""
+    return (reservation['_check_in'] < other['_check_out'] and
+            reservation['_check_out'] > other['_check_in'])
+
+def with_parsed_dates(reservation):
+    """Devuelve una copia de la reserva con sus fechas convertidas para comparación"""
+    parsed = dict(reservation)
+    parsed['_check_in'] = datetime.strptime(reservation['CheckInDate'], '%Y-%m-%d')
+    parsed['_check_out'] = datetime.strptime(reservation['CheckOutDate'], '%Y-%m-%d')
+    return parsed
+
+def resolve_room_conflicts(room_number, pending, batch_images):
+    """Busca conflictos de todas las reservas pendientes de una habitación con una sola consulta.
+
+    pending: lista de reservas pendientes del lote para la habitación
+    batch_images: imagen más reciente del lote por ReservationID (None si se eliminó)
+    Devuelve {ReservationID: [conflictos]}
+    """
+    pending = [with_parsed_dates(reservation) for reservation in pending]
+    range_start = min(reservation['CheckInDate'] for reservation in pending)
+    range_end = max(reservation['CheckOutDate'] for reservation in pending)
+    
+    # Una sola lectura cubre el rango de fechas de todas las pendientes de la habitación
+    candidates = {}
+    for item in find_room_reservations(room_number, range_start, range_end):
+        candidates[item['ReservationID']] = item
+    
+    # Las imágenes del lote son más recientes que lo leído: reemplazan, agregan o quitan candidatas
+    for reservation_id, image in batch_images.items():
+        if image is None or image.get('Status') == 'Cancelada' or image.get('RoomNumber') != room_number:
+            candidates.pop(reservation_id, None)
+        else:
+            candidates[reservation_id] = image
+    
+    parsed_candidates = []
+    for item in candidates.values():
+        try:
+            parsed_candidates.append(with_parsed_dates(item))
+        except (KeyError, ValueError):
+            log(logging.WARNING, 'Fechas inválidas en reserva candidata', reservation_id=item.get('ReservationID'))
+    
+    conflicts_by_reservation = {}
+    for reservation in pending:
+        conflicts_by_reservation[reservation['ReservationID']] = [
+            {key: value for key, value in other.items() if not key.startswith('_')}
+            for other in parsed_candidates
+            if other['ReservationID'] != reservation['ReservationID'] and reservations_overlap(reservation, other)
+        ]
+    return conflicts_by_reservation
+
+def occupancy_key(room_number, night):
+    return f'{room_number}#{night}'
+
+def reservation_nights(reservation):
+    """Claves de ocupación de una reserva; vacío si no existe, está cancelada o no es válida"""
+    if not reservation or reservation.get('Status') == 'Cancelada' or not reservation.get('RoomNumber'):
+        return set()
+    try:
+        check_in = datetime.strptime(reservation['CheckInDate'], '%Y-%m-%d').date()
+        check_out = datetime.strptime(reservation['CheckOutDate'], '%Y-%m-%d').date()
+    except (KeyError, TypeError, ValueError):
+        return set()
+    return {
+        occupancy_key(reservation['RoomNumber'], (check_in + timedelta(days=offset)).isoformat())
+        for offset in range((check_out - check_in).days)
+    }
+
+def nights_before_record(record):
+    """Noches que ocupaba la reserva antes del registro, según su OldImage"""
+    if record.get('eventName') == 'INSERT':
+        return set()
+    old_image = record.get('dynamodb', {}).get('OldImage')
+    if old_image is None:
+        log(logging.WARNING, 'Registro sin OldImage; el stream debe usar NEW_AND_OLD_IMAGES para mantener la ocupación',
+            record=get_record_identifier(record))
+        return set()
+    return reservation_nights(from_dynamodb_item(old_image, RESERVATION_FIELDS))
+
+def change_occupancy(reservation_id, key, add):
+    """Agrega o quita la reserva de una noche; ambas operaciones son idempotentes"""
+    client = get_client('dynamodb')
+    if add:
+        room_number, night = key.split('#', 1)
+        client.update_item(
+            TableName=OCCUPANCY_TABLE,
+            Key={'RoomDate': {'S': key}},
+            UpdateExpression='ADD ReservationIDs :ids SET RoomNumber = :room, Night = :night',
+            ExpressionAttributeValues={
+                ':ids': {'SS': [reservation_id]},
+                ':room': {'S': room_number},
+                ':night': {'S': night}
+            }
+        )
+        return
+    try:
+        client.update_item(
+            TableName=OCCUPANCY_TABLE,
+            Key={'RoomDate': {'S': key}},
+            UpdateExpression='DELETE ReservationIDs :ids',
+            ConditionExpression='attribute_exists(RoomDate)',
+            ExpressionAttributeValues={':ids': {'SS': [reservation_id]}}
+        )
+    except client.exceptions.ConditionalCheckFailedException:
+        pass  # La noche no estaba registrada
+
+def apply_occupancy_changes(changes):
+    """Aplica en paralelo {ReservationID: (noches a quitar, noches a agregar)}; devuelve {ReservationID: éxito}"""
+    tasks = [
+        (reservation_id, key, add)
+        for reservation_id, (removed, added) in changes.items()
+        for keys, add in ((removed, False), (added, True))
+        for key in sorted(keys)
+    ]
+    if not tasks:
+        return {}
+    from concurrent.futures import ThreadPoolExecutor
+    get_client('dynamodb')
+    with ThreadPoolExecutor(max_workers=min(STATUS_WRITE_WORKERS, len(tasks))) as executor:
+        futures = [(task[0], executor.submit(change_occupancy, *task)) for task in tasks]
+    success = {reservation_id: True for reservation_id in changes}
+    for reservation_id, future in futures:
+        if future.exception() is not None:
+            log(logging.ERROR, 'Error al actualizar la ocupación', reservation_id=reservation_id,
+                reason=str(future.exception()))
+            success[reservation_id] = False
+    return success
+
+def batch_get_items(table_name, keys, projection_expression, expression_attribute_names=None):
+    """Lee con BatchGetItem (lectura consistente) los ítems de las claves dadas"""
+    client = get_client('dynamodb')
+    keys = list(keys)
+    items = []
+    for start in range(0, len(keys), 100):
+        request = {table_name: {
+            'Keys': keys[start:start + 100],
+            'ProjectionExpression': projection_expression,
+            'ConsistentRead': True,
+        }}
+        if expression_attribute_names:
+            request[table_name]['ExpressionAttributeNames'] = expression_attribute_names
+        attempt = 0
+        while request:
+            response = client.batch_get_item(RequestItems=request)
+            items.extend(from_dynamodb_item(item) for item in response.get('Responses', {}).get(table_name, []))
+            request = response.get('UnprocessedKeys')
+            if request:
+                attempt += 1
+                time.sleep(min(1.0, 0.05 * 2 ** attempt))
+    return items
+
+def resolve_room_conflicts_from_occupancy(room_number, pending, batch_images):
+    """Como resolve_room_conflicts, pero leyendo solo las noches de las pendientes en la vista de ocupación.
+
+    La vista ya incluye los cambios del lote, así que también refleja los
+    solapamientos entre registros del mismo lote. Solo se leen los datos de
+    las reservas que comparten alguna noche.
+    """
+    pending = [with_parsed_dates(reservation) for reservation in pending]
+    nights_by_reservation = {reservation['ReservationID']: reservation_nights(reservation) for reservation in pending}
+    occupancy = {
+        item['RoomDate']: item.get('ReservationIDs', set())
+        for item in batch_get_items(
+            OCCUPANCY_TABLE,
+            [{'RoomDate': {'S': key}} for key in sorted(set().union(*nights_by_reservation.values()))],
+            'RoomDate, ReservationIDs'
+        )
+    }
+    occupants = {
+        reservation_id: set().union(*(occupancy.get(key, set()) for key in nights)) - {reservation_id}
+        for reservation_id, nights in nights_by_reservation.items()
+    }
+    
+    # Datos de las reservas ocupantes: la imagen del lote si aparece en él, si no la tabla
+    needed = set().union(*occupants.values())
+    details = {reservation_id: batch_images[reservation_id] for reservation_id in needed if reservation_id in batch_images}
+    for item in batch_get_items(
+        TABLE_NAME,
+        [{'ReservationID': {'S': reservation_id}} for reservation_id in sorted(needed - set(details))],
+        RESERVATION_PROJECTION,
+        {'#status': 'Status'}
+    ):
+        details[item['ReservationID']] = item
+    
+    # Una vista desactualizada no genera conflictos: se confirman con los datos de la reserva
+    parsed_details = {}
+    for reservation_id, item in details.items():
+        if item is None or item.get('Status') == 'Cancelada' or item.get('RoomNumber') != room_number:
+            continue
+        try:
+            parsed_details[reservation_id] = with_parsed_dates(item)
+        except (KeyError, ValueError):
+            log(logging.WARNING, 'Fechas inválidas en reserva candidata', reservation_id=reservation_id)
+    
+    conflicts_by_reservation = {}
+    for reservation in pending:
+        conflicts = []
+        for other_id in sorted(occupants[reservation['ReservationID']]):
+            other = parsed_details.get(other_id)
+            if other is not None and reservations_overlap(reservation, other):
+                conflicts.append({key: value for key, value in other.items() if not key.startswith('_')})
+        conflicts_by_reservation[reservation['ReservationID']] = conflicts
+    return conflicts_by_reservation
+
+def update_statuses(status_changes, versions=None, timings=None):
+    """Escribe en paralelo los cambios de estado; devuelve {ReservationID: WRITE_OK/WRITE_STALE/WRITE_ERROR}.
+
+    versions: Version de la imagen evaluada de cada reserva (ausente si no tiene).
+    Si se pasa timings, se llena con la duración en ms de cada escritura.
+    """
+    if not status_changes:
+        return {}
+    from concurrent.futures import ThreadPoolExecutor
+    versions = versions or {}
+    
+    def timed_update(reservation_id, new_status):
+        started = time.perf_counter()
+        try:
+            return update_reservation_status(reservation_id, new_status, versions.get(reservation_id))
+        finally:
+            if timings is not None:
+                timings[reservation_id] = _elapsed_ms(started)
+    
+    # Crear el cliente antes de repartir el trabajo entre hilos
+    get_client('dynamodb')
+    with ThreadPoolExecutor(max_workers=min(STATUS_WRITE_WORKERS, len(status_changes))) as executor:
+        futures = {
+            reservation_id: executor.submit(timed_update, reservation_id, new_status)
+            for reservation_id, new_status in status_changes.items()
+        }
+    return {reservation_id: future.result() for reservation_id, future in futures.items()}
+
+def log_record_results(record_entries, results):
+    """Emite una línea por registro del lote con su resultado y tiempos.
+
+    Los registros con error, conflicto o datos inválidos siempre se registran;
+    el resto según LOG_SAMPLE_RATE.
+    """
+    for entry in record_entries:
+        entry.update(results.get(entry['reservation_id'], ()))
+        outcome = entry.get('outcome')
+        if outcome == 'error':
+            log(logging.ERROR, 'Registro procesado', **entry)
+        elif outcome in ('Conflicto', 'inválida', 'ignorado'):
+            log(logging.WARNING, 'Registro procesado', **entry)
+        elif logger.isEnabledFor(logging.INFO) and sampled():
+            log(logging.INFO, 'Registro procesado', **entry)
+
 def lambda_handler(event, context):
-    """Función principal de la Lambda"""
-    print("\n========== INICIO DE EJECUCIÓN ==========")
-    print(f"Evento recibido: {json.dumps(event, cls=DecimalEncoder)}")
+    """Función principal de la Lambda.
+
+    Con COLD_START_REPORT activo, la primera invocación del contenedor registra
+    los tiempos de carga del módulo, creación de clientes y de la invocación.
+    """
+    global _first_invocation
+    if _first_invocation and COLD_START_REPORT:
+        invocation_started = time.perf_counter()
+        try:
+            return process_stream_batch(event)
+        finally:
+            _first_invocation = False
+            cold_start_timings['first_invocation_ms'] = _elapsed_ms(invocation_started)
+            log(logging.INFO, 'Arranque en frío', cold_start=cold_start_timings)
+    _first_invocation = False
+    return process_stream_batch(event)
+
+def process_stream_batch(event):
+    """Procesa el lote completo del stream.
+
+    Descarta sin leer DynamoDB los MODIFY generados por la propia Lambda y,
+    con IDEMPOTENCY_TABLE, los registros ya procesados en una invocación
+    anterior. Agrupa las reservas pendientes por habitación, hace una
+    consulta de conflictos por habitación, resuelve en memoria los conflictos
+    entre registros del mismo lote y reporta los registros fallidos en
+    batchItemFailures (requiere ReportBatchItemFailures en el Event Source
+    Mapping). Registra una línea por registro y un resumen del lote.
+    """
+    batch_started = time.perf_counter()
+    log(logging.DEBUG, 'Evento recibido', event=event)
+    
+    records = event.get('Records', [])
+    failed_identifiers = set()
     
     try:
-        # Procesar cada registro del stream
-        for record in event.get('Records', []):
-            print(f"Procesando registro: {json.dumps(record, cls=DecimalEncoder)}")
+        own_writes = [record for record in records if is_own_status_write(record)]
+        if own_writes:
+            records = [record for record in records if not is_own_status_write(record)]
+        already_processed = processed_event_ids(
+            sorted({record['eventID'] for record in records if record.get('eventID')}))
+        
+        # Imagen más reciente de cada reserva en el lote y registros que la produjeron
+        batch_images = {}
+        record_identifiers = {}
+        # Resultado por registro (record_entries) y por reserva (results) para el log
+        record_entries = [
+            {'record': get_record_identifier(record), 'event_name': record.get('eventName'),
+             'reservation_id': get_record_reservation_id(record), 'outcome': 'propia'}
+            for record in own_writes
+        ]
+        results = {}
+        # Noches de cada reserva antes del lote y resultado de mantener la ocupación
+        nights_before_batch = {}
+        occupancy_results = {}
+        for record in records:
+            started = time.perf_counter()
+            reservation_id = get_record_reservation_id(record)
+            entry = {
+                'record': get_record_identifier(record),
+                'event_name': record.get('eventName'),
+                'reservation_id': reservation_id,
+            }
+            record_entries.append(entry)
+            if record.get('eventID') in already_processed:
+                entry['outcome'] = 'repetido'
+                continue
+            if reservation_id:
+                record_identifiers.setdefault(reservation_id, []).append(entry['record'])
+                # Noches ocupadas antes del lote: las del primer registro de la reserva
+                if OCCUPANCY_TABLE and reservation_id not in nights_before_batch:
+                    nights_before_batch[reservation_id] = nights_before_record(record)
+            if record.get('eventName') == 'REMOVE' and reservation_id:
+                batch_images[reservation_id] = None
+                entry['outcome'] = 'eliminada'
+                continue
             
             # Extraer datos de reserva del evento de stream
             reservation = process_dynamodb_stream_event(record)
+            entry['parse_ms'] = _elapsed_ms(started)
             
             # Validar que se obtuvo información válida
             if not reservation or 'ReservationID' not in reservation:
-                print("ERROR: No se pudo extraer información válida de reserva")
+                entry['outcome'] = 'ignorado'
+                continue
+            
+            entry['reservation_id'] = reservation['ReservationID']
+            batch_images[reservation['ReservationID']] = reservation
+        
+        # Mantener la vista de ocupación con el cambio neto de cada reserva en el lote
+        occupancy_changes = {}
+        for reservation_id, nights_before in nights_before_batch.items():
+            if reservation_id not in batch_images:
+                continue  # Sin una imagen válida no se conoce el estado final
+            nights_after = reservation_nights(batch_images[reservation_id])
+            if nights_before != nights_after:
+                occupancy_changes[reservation_id] = (nights_before - nights_after, nights_after - nights_before)
+        occupancy_failed_rooms = set()
+        for reservation_id, occupancy_success in apply_occupancy_changes(occupancy_changes).items():
+            removed, added = occupancy_changes[reservation_id]
+            occupancy_results[reservation_id] = {'occupancy_writes': len(removed) + len(added)}
+            if not occupancy_success:
+                occupancy_results[reservation_id]['occupancy_error'] = True
+                failed_identifiers.update(record_identifiers[reservation_id])
+                occupancy_failed_rooms.update(key.split('#', 1)[0] for key in removed | added)
+        
+        # Agrupar por habitación las reservas pendientes (según su imagen más reciente)
+        pending_by_room = {}
+        status_changes = {}
+        for reservation_id, reservation in batch_images.items():
+            if reservation is None:
                 continue
             
             # Solo procesar reservas con estado "Pendiente"
             if reservation.get('Status') != 'Pendiente':
-                print(f"⚠️ Reserva con estado '{reservation.get('Status')}'. Solo se procesan reservas pendientes.")
+                results[reservation_id] = {'outcome': 'omitida', 'status': reservation.get('Status')}
                 continue
             
             # Verificar campos necesarios
             required_fields = ['RoomNumber', 'CheckInDate', 'CheckOutDate']
             missing_fields = [field for field in required_fields if field not in reservation]
             if missing_fields:
-                print(f"ERROR: Faltan campos necesarios en la reserva: {missing_fields}")
+                results[reservation_id] = {'outcome': 'inválida', 'missing_fields': missing_fields}
+                continue
+            
+            try:
+                with_parsed_dates(reservation)
+            except ValueError:
+                results[reservation_id] = {'outcome': 'inválida', 'reason': 'Fechas inválidas'}
                 continue
             
-            # Verificar si hay conflictos
-            conflicts = check_reservation_conflicts(
-                reservation['RoomNumber'],
-                reservation['CheckInDate'],
-                reservation['CheckOutDate'],
-                reservation['ReservationID']
-            )
+            # La aplicación ya rechazó los solapamientos al tomar las noches: solo confirmar
+            if reservation.get('SlotsClaimed'):
+                status_changes[reservation_id] = 'Confirmada'
+                results[reservation_id] = {'outcome': 'Confirmada', 'room': reservation['RoomNumber'],
+                                           'slots_claimed': True}
+                continue
             
-            # Procesar según resultado de la verificación
-            if conflicts:
-                print(f"Se encontraron {len(conflicts)} conflictos")
-                # Marcar reserva como conflictiva
-                update_success = update_reservation_status(reservation['ReservationID'], 'Conflicto')
-                if not update_success:
-                    print("ADVERTENCIA: No se pudo actualizar el estado a 'Conflicto'")
-                
-                # Enviar notificación
-                notification_sent = send_conflict_notification(reservation, conflicts)
-                if not notification_sent:
-                    print("ADVERTENCIA: No se pudo enviar la notificación de conflicto")
-                else:
-                    print("Notificación de conflicto enviada correctamente")
+            pending_by_room.setdefault(reservation['RoomNumber'], []).append(reservation)
+        
+        # Una consulta de conflictos por habitación
+        conflicts_by_room = {}
+        for room_number, pending in pending_by_room.items():
+            started = time.perf_counter()
+            # Con la vista de ocupación al día solo se leen las noches de las pendientes
+            if OCCUPANCY_TABLE and room_number not in occupancy_failed_rooms:
+                resolve_conflicts = resolve_room_conflicts_from_occupancy
             else:
-                print("No se encontraron conflictos")
-                # Si es pendiente, marcarla como confirmada
-                if reservation.get('Status') == 'Pendiente':
-                    update_success = update_reservation_status(reservation['ReservationID'], 'Confirmada')
-                    if update_success:
-                        print("Reserva marcada como 'Confirmada' exitosamente")
-                    else:
-                        print("ADVERTENCIA: No se pudo actualizar el estado a 'Confirmada'")
+                resolve_conflicts = resolve_room_conflicts
+            try:
+                room_conflicts = resolve_conflicts(room_number, pending, batch_images)
+            except Exception:
+                log(logging.ERROR, 'Error al verificar conflictos de la habitación', exc_info=True,
+                    room=room_number, pending=len(pending))
+                for reservation in pending:
+                    failed_identifiers.update(record_identifiers[reservation['ReservationID']])
+                    results[reservation['ReservationID']] = {'outcome': 'error', 'room': room_number}
+                continue
+            lookup_ms = _elapsed_ms(started)
+            
+            for reservation_id, conflicts in room_conflicts.items():
+                status_changes[reservation_id] = 'Conflicto' if conflicts else 'Confirmada'
+                if conflicts:
+                    conflicts_by_room.setdefault(room_number, {})[reservation_id] = conflicts
+                results[reservation_id] = {
+                    'outcome': status_changes[reservation_id],
+                    'room': room_number,
+                    'room_pending': len(pending),
+                    'conflicts': [conflict['ReservationID'] for conflict in conflicts],
+                    'lookup_ms': lookup_ms,
+                }
+        
+        # Escribir todos los cambios de estado del lote, condicionados a la versión evaluada
+        write_timings = {}
+        versions = {
+            reservation_id: batch_images[reservation_id]['Version']
+            for reservation_id in status_changes if 'Version' in batch_images[reservation_id]
+        }
+        for reservation_id, write_result in update_statuses(status_changes, versions, write_timings).items():
+            results[reservation_id]['write_ms'] = write_timings.get(reservation_id)
+            if write_result == WRITE_STALE:
+                # Una escritura posterior ganó: su registro decide el estado
+                results[reservation_id]['outcome'] = WRITE_STALE
+                for conflicts_by_reservation in conflicts_by_room.values():
+                    conflicts_by_reservation.pop(reservation_id, None)
+            elif write_result != WRITE_OK:
+                results[reservation_id]['outcome'] = 'error'
+                results[reservation_id]['reason'] = f"No se pudo actualizar el estado a '{status_changes[reservation_id]}'"
+                failed_identifiers.update(record_identifiers[reservation_id])
+        
+        # Un mensaje por habitación, solo con los conflictos que quedaron registrados
+        conflicts_by_room = {
+            room_number: conflicts_by_reservation
+            for room_number, conflicts_by_reservation in conflicts_by_room.items() if conflicts_by_reservation
+        }
+        notifications = notify_room_conflicts(conflicts_by_room, batch_images)
+        
+        # Esperar los envíos: el contenedor se congela al terminar la invocación
+        for room_number, notification in notifications.items():
+            notified = 'duplicada' if notification is None else notification.result()
+            for reservation_id in conflicts_by_room[room_number]:
+                results[reservation_id]['notified'] = notified
         
-        print("========== FIN DE EJECUCIÓN ==========")
+        for reservation_id, occupancy_result in occupancy_results.items():
+            results.setdefault(reservation_id, {}).update(occupancy_result)
+        # Los registros del lote sin fallos no se vuelven a evaluar si el stream los reentrega
+        mark_events_processed([
+            record['eventID'] for record in records
+            if record.get('eventID') and record['eventID'] not in already_processed
+            and get_record_identifier(record) not in failed_identifiers
+        ])
+        
+        log_record_results(record_entries, results)
+        log(logging.INFO, 'Lote procesado', records=len(records) + len(own_writes), own_writes=len(own_writes),
+            repeated=len(already_processed), rooms=len(pending_by_room),
+            failures=len(failed_identifiers), duration_ms=_elapsed_ms(batch_started))
         return {
             'statusCode': 200,
-            'body': json.dumps('Procesamiento completado con éxito')
+            'body': json.dumps('Procesamiento completado con éxito'),
+            'batchItemFailures': [{'itemIdentifier': identifier} for identifier in sorted(failed_identifiers) if identifier]
         }
     
     except Exception as e:
-        print(f"ERROR CRÍTICO: {str(e)}")
-        print(traceback.format_exc())
+        log(logging.ERROR, 'Error crítico, se reintentará el lote completo', exc_info=True,
+            records=len(records), duration_ms=_elapsed_ms(batch_started))
+        # Reintentar el lote completo
         return {
             'statusCode': 500,
-            'body': json.dumps(f'Error en el procesamiento: {str(e)}')
+            'body': json.dumps(f'Error en el procesamiento: {str(e)}'),
+            'batchItemFailures': [
+                {'itemIdentifier': get_record_identifier(record)} for record in records if get_record_identifier(record)
+            ]
         }
+
+cold_start_timings['module_load_ms'] = _elapsed_ms(_MODULE_LOAD_STARTED)
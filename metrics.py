@@ -0,0 +1,313 @@
+"""Métricas de latencia de la aplicación en formato de texto de Prometheus.
+
+Registra, con un lock y una búsqueda binaria por observación:
+  - duración de cada petición por ruta, método y código de estado
+  - duración de cada llamada a AWS por servicio y operación (eventos de botocore)
+  - tiempo de renderizado de cada plantilla de Jinja
+  - bytes y duración de las subidas de documentos a S3
+
+La duración de las respuestas en streaming se mide hasta que el servidor
+cierra la respuesta, y el renderizado de plantillas en streaming suma solo el
+tiempo que pasa generando cada fragmento (no el envío por la red).
+
+El perfilador por petición (cProfile) es opcional: se activa con un token y
+solo perfila las peticiones que lo envían en el encabezado X-Profile.
+"""
+import bisect
+import cProfile
+import os
+import pstats
+import threading
+import time
+from datetime import datetime
+
+from flask import g, request
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (16 * 1024, 64 * 1024, 256 * 1024, 1024 * 1024, 4 * 1024 * 1024, 16 * 1024 * 1024)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+PROFILE_HEADER = 'X-Profile'
+PROFILE_TOP_FUNCTIONS = 30
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labelnames, labels, extra=()):
+    pairs = list(zip(labelnames, labels)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}')
+        return lines
+
+
+class Histogram:
+    """Histograma acumulativo con límites fijos por combinación de etiquetas"""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # etiquetas -> [conteos por límite..., +Inf], suma
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((labels, list(counts), total) for labels, (counts, total) in self._series.items())
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                label_text = _format_labels(self.labelnames, labels, [('le', _format_value(bound))])
+                lines.append(f'{self.name}_bucket{label_text} {cumulative}')
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{label_text} {_format_value(total)}')
+            lines.append(f'{self.name}_count{label_text} {cumulative}')
+        return lines
+
+
+class CallbackMetric:
+    """Métrica cuyo valor se lee al exponerla: fn() -> {etiquetas: valor}.
+
+    Sirve para publicar contadores que ya llevan otros componentes (pools de
+    AWS, cachés) sin duplicarlos.
+    """
+
+    def __init__(self, name, documentation, labelnames, fn, kind='gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.fn = fn
+        self.kind = kind
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for labels, value in sorted(self.fn().items()):
+            if value is not None:
+                lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}')
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name, documentation, labelnames, fn, kind='gauge'):
+        return self.register(CallbackMetric(name, documentation, labelnames, fn, kind))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.expose())
+        return '\n'.join(lines) + '\n'
+
+
+class AppMetrics:
+    """Métricas de la aplicación y los hooks que las alimentan"""
+
+    def __init__(self, registry=None):
+        self.registry = registry or MetricsRegistry()
+        self.requests = self.registry.histogram(
+            'hotel_http_request_duration_seconds', 'Duración de las peticiones HTTP',
+            ('route', 'method', 'status'))
+        self.aws_calls = self.registry.histogram(
+            'hotel_aws_call_duration_seconds', 'Duración de las llamadas a AWS (incluye reintentos)',
+            ('service', 'operation', 'outcome'))
+        self.aws_retries = self.registry.counter(
+            'hotel_aws_call_retries_total', 'Reintentos hechos por botocore', ('service', 'operation'))
+        self.templates = self.registry.histogram(
+            'hotel_template_render_seconds', 'Tiempo de renderizado de plantillas', ('template',))
+        self.upload_seconds = self.registry.histogram(
+            'hotel_document_upload_duration_seconds', 'Duración de las subidas de documentos a S3',
+            ('outcome',), buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0))
+        self.upload_bytes = self.registry.histogram(
+            'hotel_document_upload_bytes', 'Tamaño de los documentos subidos a S3',
+            ('outcome',), buckets=SIZE_BUCKETS)
+
+    # Flask
+    def instrument_app(self, app, profiler=None):
+        """Mide cada petición por ruta; con profiler, perfila las que lo piden"""
+
+        @app.before_request
+        def start_request_timer():
+            g.metrics_started = time.perf_counter()
+            if profiler is not None:
+                profiler.start()
+
+        @app.after_request
+        def observe_request(response):
+            started = g.pop('metrics_started', None)
+            if started is None:
+                return response
+            if profiler is not None:
+                response = profiler.finish(response)
+            route = request.url_rule.rule if request.url_rule is not None else 'sin_ruta'
+            labels = (route, request.method, str(response.status_code))
+            # En las respuestas en streaming el cuerpo se genera después de after_request
+            response.call_on_close(lambda: self.requests.observe(time.perf_counter() - started, *labels))
+            return response
+
+        app.jinja_env.template_class = self.timed_template_class(app.jinja_env.template_class)
+
+    def timed_template_class(self, base):
+        histogram = self.templates
+
+        class TimedTemplate(base):
+            def render(self, *args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return super().render(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - started, self.name or 'cadena')
+
+            def generate(self, *args, **kwargs):
+                elapsed = 0.0
+                chunks = super().generate(*args, **kwargs)
+                try:
+                    while True:
+                        started = time.perf_counter()
+                        try:
+                            chunk = next(chunks)
+                        except StopIteration:
+                            elapsed += time.perf_counter() - started
+                            break
+                        elapsed += time.perf_counter() - started
+                        yield chunk
+                finally:
+                    histogram.observe(elapsed, self.name or 'cadena')
+
+        return TimedTemplate
+
+    # botocore
+    def instrument_client(self, client):
+        """Registra los hooks de duración en un cliente de botocore"""
+        service = client.meta.service_model.service_name
+        client.meta.events.register('before-call', self._start_call)
+        client.meta.events.register(
+            'after-call', lambda model, context, parsed=None, **kwargs: self._finish_call(
+                service, model.name, context, 'error' if parsed and 'Error' in parsed else 'ok', parsed))
+        client.meta.events.register(
+            'after-call-error', lambda context, **kwargs: self._finish_call(
+                service, context.get('metrics_operation', 'desconocida'), context, 'exception'))
+
+    def _start_call(self, model, context, **kwargs):
+        context['metrics_started'] = time.perf_counter()
+        context['metrics_operation'] = model.name
+
+    def _finish_call(self, service, operation, context, outcome, parsed=None):
+        started = context.pop('metrics_started', None)
+        if started is None:
+            return
+        self.aws_calls.observe(time.perf_counter() - started, service, operation, outcome)
+        retries = (parsed or {}).get('ResponseMetadata', {}).get('RetryAttempts')
+        if retries:
+            self.aws_retries.inc(service, operation, amount=retries)
+
+    # Subidas
+    def observe_upload(self, size_bytes, seconds, succeeded):
+        outcome = 'ok' if succeeded else 'error'
+        self.upload_seconds.observe(seconds, outcome)
+        self.upload_bytes.observe(size_bytes, outcome)
+
+    def render(self):
+        return self.registry.render()
+
+
+class RequestProfiler:
+    """Perfila con cProfile las peticiones que envían X-Profile con el token configurado.
+
+    El perfil se guarda en directory (para abrirlo con pstats o snakeviz) y
+    su nombre se devuelve en el encabezado X-Profile-File. Las respuestas en
+    streaming se consumen dentro del perfil para incluir el renderizado.
+    """
+
+    def __init__(self, directory, token):
+        self.directory = directory
+        self.token = token
+        self.profiles = 0
+
+    def start(self):
+        if not self.token or request.headers.get(PROFILE_HEADER) != self.token:
+            return
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+    def finish(self, response):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return response
+        try:
+            if response.is_streamed:
+                response.make_sequence()
+        finally:
+            profiler.disable()
+        os.makedirs(self.directory, exist_ok=True)
+        route = (request.url_rule.rule if request.url_rule is not None else 'sin_ruta').strip('/')
+        name = '{}-{}.prof'.format(
+            datetime.now().strftime('%Y%m%dT%H%M%S%f'),
+            ''.join(char if char.isalnum() else '_' for char in route) or 'index'
+        )
+        path = os.path.join(self.directory, name)
+        profiler.dump_stats(path)
+        self.profiles += 1
+        response.headers['X-Profile-File'] = name
+        response.headers['X-Profile-Top'] = '; '.join(self.top_functions(profiler, 5))
+        return response
+
+    @staticmethod
+    def top_functions(profiler, limit=PROFILE_TOP_FUNCTIONS):
+        """Funciones con mayor tiempo acumulado: 'archivo:línea(función) segundos'"""
+        stats = pstats.Stats(profiler)
+        entries = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+        return [
+            f'{os.path.basename(filename)}:{line}({function}) {cumulative:.4f}s'
+            for (filename, line, function), (_, _, _, cumulative, _) in entries
+        ]
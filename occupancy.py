@@ -0,0 +1,189 @@
+"""Vista materializada de ocupación por habitación y noche.
+
+La Lambda del stream mantiene una tabla con un ítem por habitación y noche
+(clave RoomDate = "<habitación>#<fecha>") cuyo atributo ReservationIDs es el
+conjunto de reservas no canceladas que ocupan esa noche. La disponibilidad se
+resuelve leyendo solo las claves de las noches consultadas.
+
+También se usa como comando para reconstruir la vista o verificarla contra la
+tabla de reservas:
+
+    python occupancy.py check --table <reservas> --occupancy-table <ocupación>
+    python occupancy.py check --repair ...
+    python occupancy.py rebuild ...
+
+La reparación escribe el conjunto completo de cada noche; conviene ejecutarla
+con poco tráfico para no pisar actualizaciones concurrentes de la Lambda.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from booking import stay_nights
+
+# Límite de claves de BatchGetItem
+BATCH_GET_KEYS = 100
+
+
+def occupancy_key(room_number, night):
+    return f'{room_number}#{night}'
+
+
+def reservation_nights(reservation):
+    """Claves de ocupación de una reserva; vacío si está cancelada o sus datos no son válidos"""
+    if reservation.get('Status') == 'Cancelada' or not reservation.get('RoomNumber'):
+        return set()
+    try:
+        nights = stay_nights(reservation['CheckInDate'], reservation['CheckOutDate'])
+    except (KeyError, TypeError, ValueError):
+        return set()
+    return {occupancy_key(reservation['RoomNumber'], night) for night in nights}
+
+
+class OccupancyView:
+    """Lecturas por clave sobre la tabla de ocupación"""
+
+    def __init__(self, client, table_name):
+        # client: cliente de bajo nivel de un recurso boto3 (acepta tipos de Python)
+        self.client = client
+        self.table_name = table_name
+
+    def get(self, keys, consistent=False):
+        """Devuelve {RoomDate: conjunto de ReservationID} de las claves con ocupación"""
+        occupancy = {}
+        keys = sorted(set(keys))
+        for start in range(0, len(keys), BATCH_GET_KEYS):
+            request = {self.table_name: {
+                'Keys': [{'RoomDate': key} for key in keys[start:start + BATCH_GET_KEYS]],
+                'ProjectionExpression': 'RoomDate, ReservationIDs',
+                'ConsistentRead': consistent,
+            }}
+            attempt = 0
+            while request:
+                response = self.client.batch_get_item(RequestItems=request)
+                for item in response.get('Responses', {}).get(self.table_name, []):
+                    if item.get('ReservationIDs'):
+                        occupancy[item['RoomDate']] = set(item['ReservationIDs'])
+                request = response.get('UnprocessedKeys')
+                if request:
+                    attempt += 1
+                    time.sleep(min(1.0, 0.05 * 2 ** attempt))
+        return occupancy
+
+    def occupied_rooms(self, room_numbers, check_in, check_out):
+        """Habitaciones de room_numbers con alguna noche ocupada en [check_in, check_out)"""
+        nights = stay_nights(check_in, check_out)
+        keys = [occupancy_key(room, night) for room in room_numbers for night in nights]
+        return {key.split('#', 1)[0] for key in self.get(keys)}
+
+    def occupied_rooms_by_range(self, room_numbers, ranges):
+        """Para cada (check_in, check_out) de ranges, habitaciones de room_numbers ocupadas.
+
+        Se leen una sola vez las claves de todas las noches que cubren los rangos.
+        """
+        nights_by_range = [set(stay_nights(check_in, check_out)) for check_in, check_out in ranges]
+        all_nights = set().union(*nights_by_range)
+        occupied_nights = {}
+        for key in self.get(occupancy_key(room, night) for room in room_numbers for night in all_nights):
+            room, night = key.split('#', 1)
+            occupied_nights.setdefault(room, set()).add(night)
+        return [
+            {room for room, nights in occupied_nights.items() if not nights.isdisjoint(range_nights)}
+            for range_nights in nights_by_range
+        ]
+
+
+def expected_occupancy(reservations):
+    """Ocupación calculada a partir de las reservas: {RoomDate: conjunto de ReservationID}"""
+    expected = {}
+    for reservation in reservations:
+        for key in reservation_nights(reservation):
+            expected.setdefault(key, set()).add(reservation['ReservationID'])
+    return expected
+
+
+def scan_table(table, **scan_kwargs):
+    while True:
+        response = table.scan(**scan_kwargs)
+        yield from response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def compare(expected, stored):
+    """Diferencias por clave entre la ocupación esperada y la guardada"""
+    differences = {}
+    for key in set(expected) | set(stored):
+        missing = expected.get(key, set()) - stored.get(key, set())
+        extra = stored.get(key, set()) - expected.get(key, set())
+        if missing or extra:
+            differences[key] = {'missing': sorted(missing), 'extra': sorted(extra)}
+    return differences
+
+
+def repair(occupancy_table, expected, keys):
+    """Reescribe las claves indicadas con el conjunto esperado (o las elimina si quedan vacías)"""
+    with occupancy_table.batch_writer() as batch:
+        for key in keys:
+            reservation_ids = expected.get(key)
+            if reservation_ids:
+                room_number, night = key.split('#', 1)
+                batch.put_item(Item={'RoomDate': key, 'RoomNumber': room_number, 'Night': night,
+                                     'ReservationIDs': reservation_ids})
+            else:
+                batch.delete_item(Key={'RoomDate': key})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['check', 'rebuild'])
+    parser.add_argument('--table', default=os.environ.get('DYNAMODB_TABLE'), help='Tabla de reservas')
+    parser.add_argument('--occupancy-table', default=os.environ.get('OCCUPANCY_TABLE'))
+    parser.add_argument('--region', default=os.environ.get('AWS_REGION', 'us-east-1'))
+    parser.add_argument('--repair', action='store_true', help='Con check: corregir las diferencias')
+    args = parser.parse_args()
+    if not args.table or not args.occupancy_table:
+        parser.error('Se requieren --table y --occupancy-table')
+
+    import boto3
+    dynamodb = boto3.resource('dynamodb', region_name=args.region)
+    reservations_table = dynamodb.Table(args.table)
+    occupancy_table = dynamodb.Table(args.occupancy_table)
+
+    started = time.perf_counter()
+    expected = expected_occupancy(scan_table(
+        reservations_table,
+        ProjectionExpression='ReservationID, RoomNumber, CheckInDate, CheckOutDate, #status',
+        ExpressionAttributeNames={'#status': 'Status'}
+    ))
+    stored = {
+        item['RoomDate']: set(item.get('ReservationIDs', ()))
+        for item in scan_table(occupancy_table, ProjectionExpression='RoomDate, ReservationIDs')
+    }
+    differences = compare(expected, stored)
+
+    if args.command == 'rebuild':
+        keys = set(expected) | set(stored)
+    else:
+        keys = set(differences) if args.repair else set()
+    if keys:
+        repair(occupancy_table, expected, keys)
+
+    print(json.dumps({
+        'command': args.command,
+        'expected_nights': len(expected),
+        'stored_nights': sum(1 for reservation_ids in stored.values() if reservation_ids),
+        'inconsistent_nights': len(differences),
+        'repaired_nights': len(keys),
+        'seconds': round(time.perf_counter() - started, 3),
+        'differences': dict(sorted(differences.items())[:50]),
+    }, indent=2, ensure_ascii=False))
+    if differences and not keys:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
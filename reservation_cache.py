@@ -0,0 +1,133 @@
+"""Caché de lectura para reservas individuales.
+
+ReservationCache implementa la lectura a través de caché (read-through) sobre
+un backend intercambiable: LRUCacheBackend guarda los ítems en memoria del
+proceso y RedisCacheBackend los comparte entre nodos. El TTL acota cuánto
+tiempo puede verse un estado desactualizado cuando la Lambda modifica una
+reserva sin pasar por la aplicación.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal
+
+
+class LRUCacheBackend:
+    """Caché en memoria con expiración por TTL y desalojo del menos usado"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # clave -> (expira_en, valor)
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        """Devuelve el valor o None si no existe o expiró"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def size(self):
+        return len(self._entries)
+
+
+def _encode_value(value):
+    return json.dumps(value, default=lambda o: {'__decimal__': str(o)} if isinstance(o, Decimal) else str(o))
+
+
+def _decode_object(obj):
+    if len(obj) == 1 and '__decimal__' in obj:
+        return Decimal(obj['__decimal__'])
+    return obj
+
+
+class RedisCacheBackend:
+    """Caché compartida en Redis (requiere el paquete redis)"""
+
+    def __init__(self, url, prefix='reservation:'):
+        import redis  # Dependencia opcional: solo se necesita con este backend
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.evictions = 0  # Redis desaloja por su cuenta; no se observa desde aquí
+
+    def get(self, key):
+        raw = self._client.get(self.prefix + key)
+        if raw is None:
+            return None
+        return json.loads(raw, object_hook=_decode_object)
+
+    def set(self, key, value, ttl):
+        self._client.set(self.prefix + key, _encode_value(value), ex=max(1, int(ttl)))
+
+    def delete(self, key):
+        self._client.delete(self.prefix + key)
+
+    def size(self):
+        return None
+
+
+class ReservationCache:
+    """Lectura a través de caché con invalidación explícita y contadores"""
+
+    def __init__(self, backend, ttl=10):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    def get(self, reservation_id, loader):
+        """Devuelve la reserva desde caché o la carga con loader() y la guarda"""
+        if self.ttl <= 0:
+            return loader()
+        value = self.backend.get(reservation_id)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        epoch = self._epoch
+        value = loader()
+        # Si hubo una invalidación mientras se cargaba, el valor puede ser anterior
+        # a esa escritura y no se guarda
+        if value is not None and epoch == self._epoch:
+            self.backend.set(reservation_id, value, self.ttl)
+        return value
+
+    def invalidate(self, reservation_id):
+        """Descarta la reserva de la caché tras una escritura"""
+        with self._lock:
+            self._epoch += 1
+        self.backend.delete(reservation_id)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__,
+            'ttl_seconds': self.ttl,
+            'entries': self.backend.size(),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.backend.evictions,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+        }
@@ -0,0 +1,54 @@
+"""Catálogo de habitaciones del hotel.
+
+Se carga una sola vez desde un archivo JSON (por defecto rooms.json junto a
+la aplicación) con una entrada por habitación: RoomNumber, RoomType, Title,
+Capacity (huéspedes) y Features. La disponibilidad y la búsqueda filtran
+sobre este catálogo en lugar de una lista fija de números.
+"""
+import json
+import unicodedata
+
+
+def _normalize(text):
+    """Minúsculas y sin tildes, para comparar tipos de habitación"""
+    decomposed = unicodedata.normalize('NFKD', str(text))
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).casefold().strip()
+
+
+class RoomCatalog:
+    """Habitaciones ordenadas por número con filtros por capacidad y tipo"""
+
+    def __init__(self, rooms):
+        self._rooms = {}
+        for room in rooms:
+            number = str(room['RoomNumber'])
+            if number in self._rooms:
+                raise ValueError(f'Habitación duplicada en el catálogo: {number}')
+            self._rooms[number] = dict(room, RoomNumber=number, Capacity=int(room.get('Capacity', 1)))
+        self._rooms = dict(sorted(self._rooms.items()))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as catalog_file:
+            return cls(json.load(catalog_file))
+
+    def __len__(self):
+        return len(self._rooms)
+
+    def numbers(self):
+        return list(self._rooms)
+
+    def get(self, room_number):
+        return self._rooms.get(str(room_number))
+
+    def room_types(self):
+        return sorted({room.get('RoomType') for room in self._rooms.values() if room.get('RoomType')})
+
+    def filter(self, guests=None, room_types=None):
+        """Habitaciones con capacidad para guests y de alguno de los tipos indicados"""
+        wanted_types = {_normalize(room_type) for room_type in room_types} if room_types else None
+        return [
+            room for room in self._rooms.values()
+            if (guests is None or room['Capacity'] >= guests)
+            and (wanted_types is None or _normalize(room.get('RoomType', '')) in wanted_types)
+        ]
@@ -0,0 +1,133 @@
+"""Índice en memoria de intervalos de reserva por habitación.
+
+Mantiene, para cada habitación, la lista de estancias ordenada por fecha de
+entrada. Una consulta de solapamiento busca con bisect solo las estancias que
+pueden cruzar el rango pedido, sin recorrer todas las reservas.
+"""
+import bisect
+import itertools
+import threading
+import time
+from datetime import date
+
+
+def to_ordinal(value):
+    """Convierte una fecha 'YYYY-MM-DD' a su número ordinal"""
+    return date.fromisoformat(value).toordinal()
+
+
+class RoomIntervalIndex:
+    """Intervalos [entrada, salida) ordenados por habitación"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._rooms = {}        # habitación -> [(entrada, salida, id), ...] ordenada
+        self._max_nights = {}   # habitación -> estancia más larga vista (cota superior)
+        self._by_id = {}        # id de reserva -> (habitación, entrada, salida, id)
+        self.loaded_at = None
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def _insert(self, rooms, max_nights, by_id, reservation):
+        """Inserta una reserva en las estructuras indicadas; ignora canceladas o incompletas"""
+        if reservation.get('Status') == 'Cancelada':
+            return
+        try:
+            room = reservation['RoomNumber']
+            start = to_ordinal(reservation['CheckInDate'])
+            end = to_ordinal(reservation['CheckOutDate'])
+            reservation_id = reservation['ReservationID']
+        except (KeyError, TypeError, ValueError):
+            return
+        if end <= start:
+            return
+        entry = (start, end, reservation_id)
+        bisect.insort(rooms.setdefault(room, []), entry)
+        max_nights[room] = max(max_nights.get(room, 0), end - start)
+        by_id[reservation_id] = (room,) + entry
+
+    def _remove(self, reservation_id):
+        entry = self._by_id.pop(reservation_id, None)
+        if entry is None:
+            return
+        room, start, end, _ = entry
+        intervals = self._rooms.get(room, [])
+        position = bisect.bisect_left(intervals, (start, end, reservation_id))
+        if position < len(intervals) and intervals[position][2] == reservation_id:
+            del intervals[position]
+
+    def upsert(self, reservation):
+        """Agrega o reemplaza una reserva en el índice"""
+        with self._lock:
+            self._remove(reservation['ReservationID'])
+            self._insert(self._rooms, self._max_nights, self._by_id, reservation)
+
+    def remove(self, reservation_id):
+        """Elimina una reserva del índice"""
+        with self._lock:
+            self._remove(reservation_id)
+
+    def rebuild(self, reservations):
+        """Reconstruye el índice completo a partir de un iterable de reservas"""
+        rooms, max_nights, by_id = {}, {}, {}
+        for reservation in reservations:
+            self._insert(rooms, max_nights, by_id, reservation)
+        with self._lock:
+            self._rooms, self._max_nights, self._by_id = rooms, max_nights, by_id
+            self.loaded_at = time.monotonic()
+
+    def overlapping(self, check_in, check_out, rooms=None):
+        """Devuelve (habitación, entrada, salida, id) de las estancias que cruzan [check_in, check_out)"""
+        start = to_ordinal(check_in)
+        end = to_ordinal(check_out)
+        result = []
+        with self._lock:
+            for room in (self._rooms if rooms is None else rooms):
+                intervals = self._rooms.get(room)
+                if not intervals:
+                    continue
+                # Solo pueden solaparse estancias que empiezan antes de la salida pedida
+                # y no antes de (entrada pedida - estancia más larga de la habitación)
+                low = bisect.bisect_right(intervals, (start - self._max_nights[room],))
+                high = bisect.bisect_left(intervals, (end,))
+                for interval_start, interval_end, reservation_id in intervals[low:high]:
+                    if interval_end > start:
+                        result.append((room, interval_start, interval_end, reservation_id))
+        return result
+
+    def occupied_rooms(self, check_in, check_out):
+        """Conjunto de habitaciones con alguna estancia que cruza [check_in, check_out)"""
+        return {room for room, _, _, _ in self.overlapping(check_in, check_out)}
+
+    def occupied_rooms_by_range(self, ranges, rooms=None):
+        """Para cada (check_in, check_out) de ranges, conjunto de habitaciones ocupadas.
+
+        Las estancias de cada habitación que cruzan la envolvente de todos los
+        rangos se buscan una sola vez; cada rango se resuelve sobre ellas con
+        bisect y el máximo acumulado de las salidas.
+        """
+        bounds = [(to_ordinal(check_in), to_ordinal(check_out)) for check_in, check_out in ranges]
+        result = [set() for _ in bounds]
+        if not bounds:
+            return result
+        first = min(start for start, _ in bounds)
+        last = max(end for _, end in bounds)
+        with self._lock:
+            for room in (self._rooms if rooms is None else rooms):
+                intervals = self._rooms.get(room)
+                if not intervals:
+                    continue
+                low = bisect.bisect_right(intervals, (first - self._max_nights[room],))
+                high = bisect.bisect_left(intervals, (last,))
+                if low >= high:
+                    continue
+                candidates = intervals[low:high]
+                starts = [interval_start for interval_start, _, _ in candidates]
+                latest_ends = list(itertools.accumulate((interval_end for _, interval_end, _ in candidates), max))
+                for position, (start, end) in enumerate(bounds):
+                    # Alguna estancia que empieza antes de la salida termina después de la entrada
+                    before_end = bisect.bisect_left(starts, end)
+                    if before_end and latest_ends[before_end - 1] > start:
+                        result[position].add(room)
+        return result
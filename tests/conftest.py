@@ -0,0 +1,35 @@
+"""Configuración común de las pruebas.
+
+Las pruebas que tocan AWS usan moto (pip install "moto[dynamodb,s3,sns,sqs]<4")
+en lugar de servicios reales; aquí solo se fijan credenciales y región falsas
+para que ningún cliente de boto3 llegue a AWS.
+"""
+import importlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def aws_credentials(monkeypatch):
+    for name in ('AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY', 'AWS_SECURITY_TOKEN', 'AWS_SESSION_TOKEN'):
+        monkeypatch.setenv(name, 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    """Módulo app importado una sola vez; guarda local_storage/ en un directorio temporal"""
+    from moto import mock_dynamodb
+
+    # La aplicación guarda los documentos en local_storage/ relativo al directorio actual
+    previous = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('app'))
+    try:
+        with mock_dynamodb():
+            yield importlib.import_module('app')
+    finally:
+        os.chdir(previous)
@@ -0,0 +1,132 @@
+import boto3
+import pytest
+from moto import mock_dynamodb
+
+from booking import ReservationChanged, SlotBooking, SlotsUnavailable
+
+RESERVATIONS = 'reservas'
+SLOTS = 'noches'
+
+
+@pytest.fixture
+def dynamodb():
+    with mock_dynamodb():
+        resource = boto3.resource('dynamodb', region_name='us-east-1')
+        for name, key in ((RESERVATIONS, 'ReservationID'), (SLOTS, 'SlotID')):
+            resource.create_table(
+                TableName=name,
+                KeySchema=[{'AttributeName': key, 'KeyType': 'HASH'}],
+                AttributeDefinitions=[{'AttributeName': key, 'AttributeType': 'S'}],
+                BillingMode='PAY_PER_REQUEST',
+            )
+        yield resource
+
+
+@pytest.fixture
+def booking(dynamodb):
+    return SlotBooking(dynamodb.meta.client, RESERVATIONS, SLOTS)
+
+
+def new_reservation(reservation_id, room, check_in, check_out):
+    return {'ReservationID': reservation_id, 'GuestName': reservation_id, 'RoomNumber': room,
+            'CheckInDate': check_in, 'CheckOutDate': check_out, 'Status': 'Pendiente', 'Version': 1}
+
+
+def stored(dynamodb, reservation_id):
+    return dynamodb.Table(RESERVATIONS).get_item(Key={'ReservationID': reservation_id}, ConsistentRead=True).get('Item')
+
+
+def slots(dynamodb):
+    return {item['SlotID']: item['ReservationID'] for item in dynamodb.Table(SLOTS).scan()['Items']}
+
+
+def edit(booking, current, **changes):
+    """Edita como lo hace la aplicación: SET de los campos e incremento de Version"""
+    changes = dict({field: current[field] for field in ('ReservationID', 'RoomNumber', 'CheckInDate',
+                                                        'CheckOutDate', 'Status')}, **changes)
+    booking.update(
+        current, changes,
+        'SET RoomNumber = :rn, CheckInDate = :ci, CheckOutDate = :co, #status = :st, '
+        'Version = if_not_exists(Version, :zero) + :one',
+        {':rn': changes['RoomNumber'], ':ci': changes['CheckInDate'], ':co': changes['CheckOutDate'],
+         ':st': changes['Status'], ':zero': 0, ':one': 1},
+        {'#status': 'Status'},
+    )
+
+
+def test_create_claims_nights_and_rejects_overlap(booking, dynamodb):
+    booking.create(new_reservation('a', '101', '2025-01-01', '2025-01-04'))
+    assert slots(dynamodb) == {'101#2025-01-01': 'a', '101#2025-01-02': 'a', '101#2025-01-03': 'a'}
+
+    with pytest.raises(SlotsUnavailable) as error:
+        booking.create(new_reservation('b', '101', '2025-01-03', '2025-01-05'))
+    assert error.value.nights == ['2025-01-03']
+    assert stored(dynamodb, 'b') is None
+    assert set(slots(dynamodb).values()) == {'a'}
+
+    # Misma fecha en otra habitación o justo a la salida: no hay solapamiento
+    booking.create(new_reservation('c', '102', '2025-01-01', '2025-01-04'))
+    booking.create(new_reservation('d', '101', '2025-01-04', '2025-01-05'))
+    assert stored(dynamodb, 'd')['SlotsClaimed'] is True
+
+
+def test_edit_moving_dates_releases_old_nights_and_claims_new(booking, dynamodb):
+    booking.create(new_reservation('a', '101', '2025-01-01', '2025-01-03'))
+    edit(booking, stored(dynamodb, 'a'), CheckInDate='2025-01-02', CheckOutDate='2025-01-05')
+
+    assert slots(dynamodb) == {'101#2025-01-02': 'a', '101#2025-01-03': 'a', '101#2025-01-04': 'a'}
+    assert stored(dynamodb, 'a')['Version'] == 2
+    # La noche liberada queda disponible para otra reserva
+    booking.create(new_reservation('b', '101', '2025-01-01', '2025-01-02'))
+    assert slots(dynamodb)['101#2025-01-01'] == 'b'
+
+
+def test_edit_onto_taken_nights_changes_nothing(booking, dynamodb):
+    booking.create(new_reservation('a', '101', '2025-01-01', '2025-01-03'))
+    booking.create(new_reservation('b', '101', '2025-01-05', '2025-01-07'))
+    with pytest.raises(SlotsUnavailable):
+        edit(booking, stored(dynamodb, 'a'), CheckOutDate='2025-01-06')
+    assert stored(dynamodb, 'a')['CheckOutDate'] == '2025-01-03'
+    assert sorted(slot for slot, owner in slots(dynamodb).items() if owner == 'a') == ['101#2025-01-01',
+                                                                                       '101#2025-01-02']
+
+
+def test_delete_releases_nights(booking, dynamodb):
+    booking.create(new_reservation('a', '101', '2025-01-01', '2025-01-03'))
+    booking.delete(stored(dynamodb, 'a'))
+    assert stored(dynamodb, 'a') is None
+    assert slots(dynamodb) == {}
+
+
+def test_stale_edit_after_cancel_and_rebook_is_rejected(booking, dynamodb):
+    booking.create(new_reservation('a', '101', '2025-01-01', '2025-01-03'))
+    # La edición lee la reserva activa...
+    stale = stored(dynamodb, 'a')
+    # ...mientras otra petición la cancela (libera sus noches) y otra reserva las toma
+    edit(booking, stored(dynamodb, 'a'), Status='Cancelada')
+    booking.create(new_reservation('b', '101', '2025-01-01', '2025-01-03'))
+
+    # Con la lectura vieja la edición no toma noches (ya las "tenía"); debe fallar
+    with pytest.raises(ReservationChanged):
+        edit(booking, stale, Status='Confirmada', GuestName='otra')
+    assert stored(dynamodb, 'a')['Status'] == 'Cancelada'
+    assert set(slots(dynamodb).values()) == {'b'}
+
+
+def test_stale_delete_is_rejected(booking, dynamodb):
+    booking.create(new_reservation('a', '101', '2025-01-01', '2025-01-03'))
+    stale = stored(dynamodb, 'a')
+    edit(booking, stored(dynamodb, 'a'), Status='Confirmada')
+    with pytest.raises(ReservationChanged):
+        booking.delete(stale)
+    assert stored(dynamodb, 'a') is not None
+    assert len(slots(dynamodb)) == 2
+
+
+def test_reservation_without_version_can_be_edited(booking, dynamodb):
+    reservation = new_reservation('a', '101', '2025-01-01', '2025-01-02')
+    del reservation['Version']
+    booking.create(reservation)
+    edit(booking, stored(dynamodb, 'a'), CheckOutDate='2025-01-03')
+    assert stored(dynamodb, 'a')['Version'] == 1
+    assert len(slots(dynamodb)) == 2
@@ -0,0 +1,156 @@
+import csv
+import json
+import threading
+import time
+
+import boto3
+import pytest
+from botocore.exceptions import ClientError
+from moto import mock_dynamodb, mock_s3
+
+import bulk_io
+from booking import SlotBooking
+
+RESERVATIONS = 'reservas'
+SLOTS = 'noches'
+FIELDS = ['ReservationID', 'GuestName', 'ContactEmail', 'RoomNumber', 'CheckInDate', 'CheckOutDate']
+
+
+@pytest.fixture
+def dynamodb():
+    with mock_dynamodb(), mock_s3():
+        resource = boto3.resource('dynamodb', region_name='us-east-1')
+        for name, key in ((RESERVATIONS, 'ReservationID'), (SLOTS, 'SlotID')):
+            resource.create_table(
+                TableName=name,
+                KeySchema=[{'AttributeName': key, 'KeyType': 'HASH'}],
+                AttributeDefinitions=[{'AttributeName': key, 'AttributeType': 'S'}],
+                BillingMode='PAY_PER_REQUEST',
+            )
+        yield resource
+
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as output:
+        writer = csv.writer(output)
+        writer.writerow(FIELDS)
+        writer.writerows(rows)
+    return str(path)
+
+
+def run(capsys, *argv):
+    # moto devuelve la tabla completa en cada segmento: un solo segmento
+    code = bulk_io.main(['--table', RESERVATIONS, '--region', 'us-east-1', *argv, '--segments', '1'])
+    return code, json.loads(capsys.readouterr().out)
+
+
+def slots(dynamodb):
+    return {item['SlotID']: item['ReservationID'] for item in dynamodb.Table(SLOTS).scan()['Items']}
+
+
+def test_import_rejects_invalid_and_overlapping_rows(dynamodb, tmp_path, capsys):
+    dynamodb.Table(RESERVATIONS).put_item(Item={
+        'ReservationID': 'old', 'RoomNumber': '101', 'CheckInDate': '2025-01-10', 'CheckOutDate': '2025-01-15',
+        'Status': 'Confirmada'})
+    source = write_csv(tmp_path / 'in.csv', [
+        ['a', 'Ana', 'a@x.com', '101', '2025-01-12', '2025-01-14'],   # se cruza con la tabla
+        ['b', 'Bea', 'b@x.com', '102', '2025-01-01', '2025-01-03'],
+        ['c', 'Cris', 'c@x.com', '102', '2025-01-02', '2025-01-04'],  # se cruza con b
+        ['d', 'Dani', 'd@x.com', '102', '2025-01-05', '2025-01-04'],  # fechas invertidas
+        ['old', 'Otra', 'o@x.com', '103', '2025-01-01', '2025-01-02'],
+    ])
+    code, summary = run(capsys, 'import', '--input', source, '--rejects', str(tmp_path / 'rechazadas.csv'))
+
+    assert code == 0
+    assert summary['written'] == 1
+    assert summary['rejected_by_reason'] == {'solapamiento': 2, 'la salida no es posterior a la entrada': 1,
+                                             'ReservationID repetido': 1}
+    stored = dynamodb.Table(RESERVATIONS).get_item(Key={'ReservationID': 'b'})['Item']
+    assert (stored['Status'], stored['UpdatedBy'], stored['Version']) == ('Confirmada', 'importacion', 1)
+    with open(tmp_path / 'rechazadas.csv', encoding='utf-8') as report:
+        assert [row['reservation_id'] for row in csv.DictReader(report)] == ['a', 'c', 'd', 'old']
+
+
+def test_import_does_not_overwrite_nights_booked_during_the_import(dynamodb, tmp_path, capsys, monkeypatch):
+    source = write_csv(tmp_path / 'in.csv', [
+        ['a', 'Ana', 'a@x.com', '101', '2025-01-01', '2025-01-03'],
+        ['b', 'Bea', 'b@x.com', '102', '2025-01-01', '2025-01-03'],
+    ])
+    read_spool = bulk_io._read_spool
+
+    def booking_between_passes(spool):
+        # La aplicación toma una noche de 'a' después del scan de la primera pasada
+        SlotBooking(dynamodb.meta.client, RESERVATIONS, SLOTS).create({
+            'ReservationID': 'live', 'RoomNumber': '101', 'CheckInDate': '2025-01-02', 'CheckOutDate': '2025-01-04',
+            'Status': 'Pendiente'})
+        yield from read_spool(spool)
+
+    monkeypatch.setattr(bulk_io, '_read_spool', booking_between_passes)
+    code, summary = run(capsys, 'import', '--input', source, '--slots-table', SLOTS)
+
+    assert summary['written'] == 1
+    assert summary['slots_written'] == 2
+    assert summary['rejected_by_reason'] == {'noches tomadas durante la importación': 1}
+    assert summary['reject_sample'][0]['detail'] == ['2025-01-02']
+    assert slots(dynamodb) == {'101#2025-01-02': 'live', '101#2025-01-03': 'live',
+                               '102#2025-01-01': 'b', '102#2025-01-02': 'b'}
+    assert 'Item' not in dynamodb.Table(RESERVATIONS).get_item(Key={'ReservationID': 'a'})
+
+
+def test_export_round_trip_through_s3(dynamodb, tmp_path, capsys):
+    boto3.client('s3', region_name='us-east-1').create_bucket(Bucket='exportes-test')
+    source = write_csv(tmp_path / 'in.csv', [
+        [f'r{i}', f'Huésped {i}', f'h{i}@x.com', '101', f'2025-02-{i + 1:02d}', f'2025-02-{i + 2:02d}']
+        for i in range(20)
+    ])
+    run(capsys, 'import', '--input', source)
+
+    code, summary = run(capsys, 'export', '--output', 's3://exportes-test/reservas.jsonl')
+    assert summary['rows'] == 20
+    body = boto3.client('s3', region_name='us-east-1').get_object(Bucket='exportes-test', Key='reservas.jsonl')
+    exported = [json.loads(line) for line in body['Body'].read().decode('utf-8').splitlines()]
+    assert sorted(item['ReservationID'] for item in exported) == sorted(f'r{i}' for i in range(20))
+    assert {item['GuestName'] for item in exported} >= {'Huésped 0', 'Huésped 19'}
+
+
+class FakeTable:
+    """Tabla con batch_writer en memoria; con fail=True la primera escritura falla"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.items = []
+
+    def batch_writer(self, overwrite_by_pkeys=None):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def put_item(self, Item):
+        if self.fail:
+            raise ClientError({'Error': {'Code': 'ValidationException', 'Message': 'item inválido'}}, 'BatchWriteItem')
+        time.sleep(0.3)
+        self.items.append(Item)
+
+
+def test_write_fails_instead_of_hanging_when_one_writer_fails():
+    tables = [(FakeTable(fail=True), None)] + [(FakeTable(), None) for _ in range(3)]
+    rows = ((line, {'ReservationID': f'r{line}'}) for line in range(200))
+    outcome = {}
+
+    def write():
+        try:
+            outcome['result'] = bulk_io.write_reservations(tables, rows, chunk_rows=1)
+        except Exception as e:
+            outcome['error'] = e
+
+    writer = threading.Thread(target=write, daemon=True)
+    writer.start()
+    writer.join(10)
+    assert not writer.is_alive(), 'write_reservations quedó bloqueado'
+    assert outcome['error'].response['Error']['Code'] == 'ValidationException'
+    # Los demás hilos dejan de escribir en cuanto se detecta el fallo
+    assert sum(len(table.items) for table, _ in tables) < 20
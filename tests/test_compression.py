@@ -0,0 +1,34 @@
+import gzip
+
+from flask import Flask, send_file
+
+from compression import ResponseCompressor
+
+
+def make_app(tmp_path, use_x_sendfile=False):
+    app = Flask(__name__)
+    app.config['USE_X_SENDFILE'] = use_x_sendfile
+    ResponseCompressor().init_app(app)
+    page = tmp_path / 'pagina.html'
+    page.write_text('<p>reserva</p>' * 200, encoding='utf-8')
+
+    @app.route('/archivo')
+    def archivo():
+        return send_file(str(page), mimetype='text/html')
+
+    return app
+
+
+def test_sent_file_is_compressed(tmp_path):
+    response = make_app(tmp_path).test_client().get('/archivo', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.get_data()) == ('<p>reserva</p>' * 200).encode('utf-8')
+
+
+def test_x_sendfile_response_is_not_compressed(tmp_path):
+    # El proxy reemplaza el cuerpo vacío por los bytes del archivo sin comprimir
+    response = make_app(tmp_path, use_x_sendfile=True).test_client().get(
+        '/archivo', headers={'Accept-Encoding': 'gzip'})
+    assert 'X-Sendfile' in response.headers
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_data() == b''
@@ -0,0 +1,110 @@
+from datetime import date, timedelta
+
+import boto3
+import pytest
+from moto import mock_dynamodb
+
+import lambda_function
+
+TABLE = 'reservas'
+INDEX = 'RoomNumber-CheckInDate-index'
+
+
+class ReadCounter:
+    """Ítems que DynamoDB leería en cada Scan y Query del cliente de la Lambda.
+
+    moto reporta como ScannedCount de un Query el tamaño de toda la tabla: para
+    Query se repite la condición de clave sin filtro con Select=COUNT.
+    """
+
+    def __init__(self, count_client):
+        self.count_client = count_client
+        self.items = 0
+        self._query_params = None
+
+    def before_query(self, params, **kwargs):
+        self._query_params = params
+
+    def after_scan(self, parsed, **kwargs):
+        self.items += parsed.get('ScannedCount', 0)
+
+    def after_query(self, parsed, **kwargs):
+        params = {name: value for name, value in self._query_params.items()
+                  if name in ('TableName', 'IndexName', 'KeyConditionExpression', 'ExclusiveStartKey')}
+        params['Select'] = 'COUNT'
+        params['ExpressionAttributeValues'] = {
+            name: value for name, value in self._query_params['ExpressionAttributeValues'].items()
+            if name in params['KeyConditionExpression']}
+        self.items += self.count_client.query(**params)['Count']
+
+
+@pytest.fixture
+def counter(monkeypatch):
+    with mock_dynamodb():
+        client = boto3.client('dynamodb', region_name='us-east-1')
+        client.create_table(
+            TableName=TABLE,
+            KeySchema=[{'AttributeName': 'ReservationID', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': name, 'AttributeType': 'S'}
+                                  for name in ('ReservationID', 'RoomNumber', 'CheckInDate')],
+            GlobalSecondaryIndexes=[{
+                'IndexName': INDEX,
+                'KeySchema': [{'AttributeName': 'RoomNumber', 'KeyType': 'HASH'},
+                              {'AttributeName': 'CheckInDate', 'KeyType': 'RANGE'}],
+                'Projection': {'ProjectionType': 'ALL'},
+            }],
+            BillingMode='PAY_PER_REQUEST',
+        )
+        monkeypatch.setattr(lambda_function, 'TABLE_NAME', TABLE)
+        monkeypatch.setattr(lambda_function, 'ROOM_INDEX_NAME', INDEX)
+        monkeypatch.setattr(lambda_function, '_clients', {})
+        counter = ReadCounter(boto3.client('dynamodb', region_name='us-east-1'))
+        events = lambda_function.get_client('dynamodb').meta.events
+        events.register('after-call.dynamodb.Scan', counter.after_scan)
+        events.register('provide-client-params.dynamodb.Query', counter.before_query)
+        events.register('after-call.dynamodb.Query', counter.after_query)
+        yield counter
+
+
+def add_history(stays):
+    """Estancias confirmadas de tres noches en la 101, una cada cuatro días hacia atrás desde 2024"""
+    table = boto3.resource('dynamodb', region_name='us-east-1').Table(TABLE)
+    with table.batch_writer() as batch:
+        for number in range(stays):
+            check_in = date(2024, 1, 1) - timedelta(days=4 * (number + 1))
+            batch.put_item(Item={'ReservationID': f'historia-{check_in}', 'RoomNumber': '101',
+                                 'CheckInDate': check_in.isoformat(),
+                                 'CheckOutDate': (check_in + timedelta(days=3)).isoformat(), 'Status': 'Confirmada'})
+
+
+def items_read(counter, *check):
+    counter.items = 0
+    conflicts = lambda_function.check_reservation_conflicts(*check)
+    return counter.items, sorted(conflict['ReservationID'] for conflict in conflicts)
+
+
+def test_items_read_per_check_do_not_grow_with_history(counter):
+    table = boto3.resource('dynamodb', region_name='us-east-1').Table(TABLE)
+    for item in (
+        {'ReservationID': 'larga', 'RoomNumber': '101', 'CheckInDate': '2025-05-20', 'CheckOutDate': '2025-06-05'},
+        {'ReservationID': 'despues', 'RoomNumber': '101', 'CheckInDate': '2025-06-04', 'CheckOutDate': '2025-06-06'},
+        {'ReservationID': 'justo', 'RoomNumber': '101', 'CheckInDate': '2025-06-03', 'CheckOutDate': '2025-06-04'},
+        {'ReservationID': 'otra', 'RoomNumber': '102', 'CheckInDate': '2025-06-01', 'CheckOutDate': '2025-06-05'},
+    ):
+        table.put_item(Item=dict(item, Status='Confirmada'))
+    check = ('101', '2025-06-01', '2025-06-04', 'nueva')
+
+    add_history(100)
+    before = items_read(counter, *check)
+    add_history(1000)
+    after = items_read(counter, *check)
+
+    assert before == after
+    assert after[1] == ['justo', 'larga']
+    assert after[0] <= 3
+
+    # El scan de respaldo lee toda la tabla
+    lambda_function.ROOM_INDEX_NAME = None
+    scanned = items_read(counter, *check)
+    assert scanned[1] == after[1]
+    assert scanned[0] == 1004
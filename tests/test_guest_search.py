@@ -0,0 +1,109 @@
+import random
+
+from guest_search import GuestSearchIndex, name_tokens, normalize
+
+
+def reservation(reservation_id, name, check_in=None, email=None):
+    result = {'ReservationID': reservation_id, 'GuestName': name,
+              'ContactEmail': email or f'{reservation_id}@example.com', 'RoomNumber': '101', 'Status': 'Confirmada'}
+    if check_in:
+        result['CheckInDate'] = check_in
+    return result
+
+
+def brute_force(reservations, name=None, email=None, check_in_from=None, check_in_to=None):
+    query_tokens = name_tokens(name) if name else ()
+    matches = set()
+    for item in reservations:
+        check_in = item.get('CheckInDate')
+        if email and normalize(item['ContactEmail']) != normalize(email):
+            continue
+        if (check_in_from or check_in_to) and check_in is None:
+            continue
+        if check_in_from and check_in < check_in_from:
+            continue
+        if check_in_to and check_in > check_in_to:
+            continue
+        tokens = name_tokens(item['GuestName'])
+        if any(not any(token.startswith(query) for token in tokens) for query in query_tokens):
+            continue
+        matches.add(item['ReservationID'])
+    return matches
+
+
+def test_date_bound_excludes_reservations_without_check_in():
+    # Pocas candidatas por nombre y muchas por fecha: el rango se verifica en cada candidata
+    reservations = [reservation(f'n{i}', 'Ana') for i in range(3)]
+    reservations.append(reservation('dated', 'Ana Zed', '2024-06-01'))
+    reservations.extend(reservation(f'b{i:02d}', 'Bob', f'2024-{i % 12 + 1:02d}-10') for i in range(99))
+    index = GuestSearchIndex()
+    index.rebuild(reservations)
+
+    results, total = index.search(name='ana', check_in_to='2024-12-31')
+    assert total == 1
+    assert [result['ReservationID'] for result in results] == ['dated']
+
+    results, total = index.search(name='ana', check_in_from='2024-01-01')
+    assert total == 1
+
+    # Sin rango de fechas sí aparecen, al final
+    results, total = index.search(name='ana', limit=10)
+    assert total == 4
+    assert [result['ReservationID'] for result in results] == ['dated', 'n0', 'n1', 'n2']
+
+
+def test_search_matches_brute_force():
+    rng = random.Random(3)
+    names = ['Ana García', 'Ángel Pérez', 'Bob Ruiz', 'María José Díaz', 'Ana Zed']
+    reservations = []
+    for i in range(400):
+        check_in = None if rng.random() < 0.2 else f'2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}'
+        reservations.append(reservation(f'r{i:03d}', rng.choice(names), check_in, f'guest{i % 50}@example.com'))
+    index = GuestSearchIndex()
+    index.rebuild(reservations)
+
+    for _ in range(400):
+        query = {}
+        if rng.random() < 0.7:
+            query['name'] = rng.choice(['ana', 'an', 'garc', 'pe', 'bob', 'maria jose', 'zed'])
+        if rng.random() < 0.3:
+            query['email'] = f'GUEST{rng.randrange(50)}@example.com'
+        if rng.random() < 0.5:
+            query['check_in_from'] = f'2024-{rng.randint(1, 12):02d}-01'
+        if rng.random() < 0.5:
+            query['check_in_to'] = f'2024-{rng.randint(1, 12):02d}-28'
+        if not query:
+            query['name'] = 'ana'
+        expected = brute_force(reservations, **query)
+        results, total = index.search(limit=len(reservations), **query)
+        assert total == len(expected), query
+        assert {result['ReservationID'] for result in results} == expected, query
+
+
+def test_upsert_and_remove_update_results():
+    index = GuestSearchIndex()
+    index.rebuild([reservation('a', 'Ana García', '2024-05-01')])
+    index.upsert(reservation('a', 'Ana López', '2024-05-01'))
+    assert index.search(name='garcia')[1] == 0
+    assert index.search(name='lopez')[1] == 1
+    index.remove('a')
+    assert index.search(name='ana')[1] == 0
+
+
+def test_rebuild_keeps_changes_made_during_the_scan():
+    index = GuestSearchIndex()
+
+    def scan():
+        yield reservation('a', 'Ana García', '2024-05-01')
+        # Escrituras de la instancia mientras el scan todavía está en curso
+        index.upsert(reservation('a', 'Ana López', '2024-05-01'))
+        index.upsert(reservation('c', 'Carla Ruiz', '2024-06-01'))
+        index.remove('b')
+        yield reservation('b', 'Bruno Díaz', '2024-05-02')
+
+    index.rebuild(scan())
+    assert index.search(name='garcia')[1] == 0
+    assert index.search(name='lopez')[1] == 1
+    assert index.search(name='carla')[1] == 1
+    assert index.search(name='bruno')[1] == 0
+    assert index.stats()['ready'] and not index.stats()['rebuilding']
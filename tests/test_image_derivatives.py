@@ -0,0 +1,87 @@
+import os
+
+from PIL import Image
+
+from image_derivatives import ImageDerivatives
+
+
+def make_tree(tmp_path):
+    rooms = tmp_path / 'static' / 'rooms'
+    rooms.mkdir(parents=True)
+    (rooms / 'room1.png').write_bytes(b'no es una imagen real')
+    cache = tmp_path / 'cache'
+    cache.mkdir()
+    return str(tmp_path / 'static'), cache
+
+
+def test_build_does_not_delete_other_files(tmp_path, monkeypatch):
+    # Sin Pillow solo se copia el original con hash; basta para probar la caché
+    monkeypatch.setattr('image_derivatives.Image', None)
+    static_dir, cache = make_tree(tmp_path)
+    (cache / 'room9.0123456789ab.png').write_bytes(b'variante de otra version')
+    (cache / '.tmp-abc123').write_bytes(b'escritura en curso de otro proceso')
+
+    derivatives = ImageDerivatives(static_dir, str(cache)).build()
+    original = derivatives.manifest['rooms/room1.png']['original']
+    assert sorted(os.listdir(cache)) == sorted(['.tmp-abc123', 'room9.0123456789ab.png', original])
+
+
+def test_prune_keeps_manifest_and_temporary_files(tmp_path, monkeypatch):
+    monkeypatch.setattr('image_derivatives.Image', None)
+    static_dir, cache = make_tree(tmp_path)
+    (cache / 'room9.0123456789ab.png').write_bytes(b'obsoleta')
+    (cache / '.tmp-abc123').write_bytes(b'en curso')
+
+    derivatives = ImageDerivatives(static_dir, str(cache)).build()
+    assert derivatives.prune() == 1
+    assert sorted(os.listdir(cache)) == sorted(['.tmp-abc123', derivatives.manifest['rooms/room1.png']['original']])
+
+
+def test_prune_ignores_files_removed_by_another_process(tmp_path, monkeypatch):
+    monkeypatch.setattr('image_derivatives.Image', None)
+    static_dir, cache = make_tree(tmp_path)
+    (cache / 'room9.0123456789ab.png').write_bytes(b'obsoleta')
+    derivatives = ImageDerivatives(static_dir, str(cache)).build()
+
+    real_remove = os.remove
+
+    def remove_twice(path):
+        real_remove(path)
+        real_remove(path)  # el otro proceso ganó la carrera
+
+    monkeypatch.setattr('image_derivatives.os.remove', remove_twice)
+    assert derivatives.prune() == 0
+    assert derivatives.stats()['files'] == 1
+
+
+def test_build_generates_resized_jpeg_and_webp_variants(tmp_path):
+    rooms = tmp_path / 'static' / 'rooms'
+    rooms.mkdir(parents=True)
+    Image.new('RGB', (1200, 800), (180, 120, 60)).save(rooms / 'room1.jpg', quality=95)
+    Image.new('RGBA', (500, 250), (0, 90, 200, 128)).save(rooms / 'room2.png')
+    cache = tmp_path / 'cache'
+
+    derivatives = ImageDerivatives(str(tmp_path / 'static'), str(cache)).build()
+
+    large = derivatives.manifest['rooms/room1.jpg']
+    assert [width for width, _ in large['jpeg']] == [320, 640, 960]
+    assert [width for width, _ in large['webp']] == [320, 640, 960]
+    # Una imagen menor que el ancho mayor también se sirve a su propio ancho
+    assert [width for width, _ in derivatives.manifest['rooms/room2.png']['webp']] == [320, 500]
+    for width, name in large['webp']:
+        with Image.open(cache / name) as variant:
+            assert (variant.format, variant.size) == ('WEBP', (width, round(800 * width / 1200)))
+    with Image.open(cache / large['jpeg'][0][1]) as variant:
+        assert variant.format == 'JPEG'
+    assert os.path.getsize(cache / large['jpeg'][0][1]) < os.path.getsize(rooms / 'room1.jpg')
+    # Legibles por el proxy que los sirve con X-Sendfile
+    assert os.stat(cache / large['webp'][0][1]).st_mode & 0o777 == 0o644
+
+    urls = derivatives.image('rooms/room1.jpg', lambda name: f'/img/{name}', lambda path: f'/static/{path}')
+    assert urls['src'] == f"/img/{large['jpeg'][1][1]}"
+    assert urls['srcset'] == ', '.join(f'/img/{name} {width}w' for width, name in large['jpeg'])
+    assert urls['webp_srcset'] == ', '.join(f'/img/{name} {width}w' for width, name in large['webp'])
+    assert derivatives.stats()['pillow'] and derivatives.stats()['files'] == 1 + 6 + 1 + 4
+
+    # Una segunda construcción reutiliza los archivos generados
+    assert ImageDerivatives(str(tmp_path / 'static'), str(cache)).build().generated == 0
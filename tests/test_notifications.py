@@ -0,0 +1,140 @@
+import json
+
+import boto3
+import pytest
+from boto3.dynamodb.types import TypeSerializer
+from moto import mock_dynamodb, mock_sns, mock_sqs
+
+import lambda_function
+
+TABLE = 'reservas'
+
+
+@pytest.fixture
+def aws(monkeypatch):
+    with mock_dynamodb(), mock_sns(), mock_sqs():
+        resource = boto3.resource('dynamodb', region_name='us-east-1')
+        resource.create_table(
+            TableName=TABLE,
+            KeySchema=[{'AttributeName': 'ReservationID', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'ReservationID', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST',
+        )
+        sns = boto3.client('sns', region_name='us-east-1')
+        sqs = boto3.client('sqs', region_name='us-east-1')
+        topic_arn = sns.create_topic(Name='conflictos')['TopicArn']
+        queue_url = sqs.create_queue(QueueName='conflictos')['QueueUrl']
+        queue_arn = sqs.get_queue_attributes(QueueUrl=queue_url, AttributeNames=['QueueArn'])['Attributes']['QueueArn']
+        sns.subscribe(TopicArn=topic_arn, Protocol='sqs', Endpoint=queue_arn)
+
+        monkeypatch.setattr(lambda_function, 'TABLE_NAME', TABLE)
+        monkeypatch.setattr(lambda_function, 'SNS_TOPIC_ARN', topic_arn)
+        for name in ('ROOM_INDEX_NAME', 'OCCUPANCY_TABLE', 'IDEMPOTENCY_TABLE'):
+            monkeypatch.setattr(lambda_function, name, None)
+        # Estado del contenedor: clientes creados fuera de moto y conflictos ya notificados
+        monkeypatch.setattr(lambda_function, '_clients', {})
+        monkeypatch.setattr(lambda_function, '_notified_conflicts', {})
+        yield resource.Table(TABLE), sqs, queue_url
+
+
+def reservation(reservation_id, room, check_in, check_out, status='Pendiente', version=1):
+    return {'ReservationID': reservation_id, 'GuestName': f'Huésped {reservation_id}',
+            'ContactEmail': f'{reservation_id}@example.com', 'RoomNumber': room,
+            'CheckInDate': check_in, 'CheckOutDate': check_out, 'Status': status, 'Version': version}
+
+
+def stream_event(items, event_name='INSERT'):
+    serializer = TypeSerializer()
+    records = []
+    for number, item in enumerate(items):
+        records.append({
+            'eventID': f"{event_name}-{item['ReservationID']}-{item['Version']}",
+            'eventName': event_name,
+            'dynamodb': {
+                'Keys': {'ReservationID': {'S': item['ReservationID']}},
+                'NewImage': {key: serializer.serialize(value) for key, value in item.items()},
+                'SequenceNumber': str(number + 1),
+            },
+        })
+    return {'Records': records}
+
+
+def received(sqs, queue_url):
+    messages = []
+    while True:
+        response = sqs.receive_message(QueueUrl=queue_url, MaxNumberOfMessages=10)
+        if not response.get('Messages'):
+            return messages
+        for message in response['Messages']:
+            messages.append(json.loads(message['Body']))
+            sqs.delete_message(QueueUrl=queue_url, ReceiptHandle=message['ReceiptHandle'])
+
+
+def statuses(table):
+    return {item['ReservationID']: item['Status'] for item in table.scan()['Items']}
+
+
+@pytest.fixture
+def group_booking(aws):
+    """Reserva de grupo: tres habitaciones de la 101 y tres de la 102 sobre noches ya confirmadas"""
+    table = aws[0]
+    table.put_item(Item=reservation('old-101', '101', '2025-03-01', '2025-03-05', status='Confirmada'))
+    table.put_item(Item=reservation('old-102', '102', '2025-03-02', '2025-03-04', status='Confirmada'))
+    group = [reservation(f'g{i}', room, '2025-03-03', '2025-03-06')
+             for i, room in enumerate(['101', '102', '101', '102', '101', '102'])]
+    for item in group:
+        table.put_item(Item=item)
+    return group
+
+
+def test_group_booking_sends_one_message_per_room(aws, group_booking):
+    table, sqs, queue_url = aws
+    response = lambda_function.process_stream_batch(stream_event(group_booking))
+
+    assert response['batchItemFailures'] == []
+    messages = received(sqs, queue_url)
+    assert sorted(message['Subject'] for message in messages) == [
+        lambda_function.NOTIFICATION_SUBJECT.format(room='101'),
+        lambda_function.NOTIFICATION_SUBJECT.format(room='102'),
+    ]
+    for message in messages:
+        room = '101' if '101' in message['Subject'] else '102'
+        listed = {item['ReservationID'] for item in group_booking if item['RoomNumber'] == room}
+        assert all(reservation_id in message['Message'] for reservation_id in listed | {f'old-{room}'})
+    assert {status for reservation_id, status in statuses(table).items() if reservation_id.startswith('g')} == {
+        'Conflicto'}
+
+
+def test_repeated_batch_sends_nothing(aws, group_booking):
+    table, sqs, queue_url = aws
+    event = stream_event(group_booking)
+    lambda_function.process_stream_batch(event)
+    assert len(received(sqs, queue_url)) == 2
+
+    # El stream reentrega el mismo lote
+    lambda_function.process_stream_batch(event)
+    assert received(sqs, queue_url) == []
+
+    # Las mismas reservas vuelven a evaluarse como pendientes: el conjunto de conflictos ya se notificó
+    pending_again = []
+    for item in group_booking:
+        item = dict(item, Version=3)
+        table.put_item(Item=item)
+        pending_again.append(item)
+    response = lambda_function.process_stream_batch(stream_event(pending_again, 'MODIFY'))
+    assert response['batchItemFailures'] == []
+    assert received(sqs, queue_url) == []
+    assert statuses(table)['g0'] == 'Conflicto'
+
+
+def test_new_conflict_in_the_same_room_is_notified(aws, group_booking):
+    table, sqs, queue_url = aws
+    lambda_function.process_stream_batch(stream_event(group_booking))
+    assert len(received(sqs, queue_url)) == 2
+
+    late = reservation('late', '101', '2025-03-04', '2025-03-05')
+    table.put_item(Item=late)
+    lambda_function.process_stream_batch(stream_event([late]))
+    messages = received(sqs, queue_url)
+    assert [message['Subject'] for message in messages] == [lambda_function.NOTIFICATION_SUBJECT.format(room='101')]
+    assert statuses(table)['late'] == 'Conflicto'
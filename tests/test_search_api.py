@@ -0,0 +1,39 @@
+import boto3
+import pytest
+from moto import mock_dynamodb
+
+
+@pytest.fixture
+def app(app_module):
+    with mock_dynamodb():
+        boto3.resource('dynamodb', region_name='us-east-1').create_table(
+            TableName=app_module.DYNAMODB_TABLE,
+            KeySchema=[{'AttributeName': 'ReservationID', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'ReservationID', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST',
+        )
+        yield app_module
+
+
+def reservation(reservation_id, name, check_in):
+    return {'ReservationID': reservation_id, 'GuestName': name, 'ContactEmail': f'{reservation_id}@example.com',
+            'RoomNumber': '101', 'CheckInDate': check_in, 'CheckOutDate': '2025-12-31', 'Status': 'Pendiente'}
+
+
+def test_search_returns_the_stored_status(app):
+    for item in (reservation('a', 'Ana García', '2025-05-01'), reservation('b', 'Ana López', '2025-05-02'),
+                 reservation('c', 'Ana Ruiz', '2025-05-03')):
+        app.table.put_item(Item=item)
+    app.load_guest_search_index()
+    # La Lambda confirma 'a' y otro nodo elimina 'b' sin pasar por este índice
+    app.table.update_item(Key={'ReservationID': 'a'}, UpdateExpression='SET #status = :s',
+                          ExpressionAttributeNames={'#status': 'Status'},
+                          ExpressionAttributeValues={':s': 'Confirmada'})
+    app.table.delete_item(Key={'ReservationID': 'b'})
+
+    response = app.app.test_client().get('/api/reservations/search?name=ana')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [(item['ReservationID'], item['Status']) for item in body['reservations']] == [
+        ('a', 'Confirmada'), ('c', 'Pendiente')]
+    assert (body['count'], body['total']) == (2, 2)
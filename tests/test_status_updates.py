@@ -0,0 +1,131 @@
+import time
+
+import boto3
+import pytest
+from boto3.dynamodb.types import TypeSerializer
+from moto import mock_dynamodb
+
+import lambda_function
+
+TABLE = 'reservas'
+IDEMPOTENCY = 'eventos-procesados'
+
+
+@pytest.fixture
+def table(monkeypatch):
+    with mock_dynamodb():
+        resource = boto3.resource('dynamodb', region_name='us-east-1')
+        for name, key in ((TABLE, 'ReservationID'), (IDEMPOTENCY, 'EventID')):
+            resource.create_table(
+                TableName=name,
+                KeySchema=[{'AttributeName': key, 'KeyType': 'HASH'}],
+                AttributeDefinitions=[{'AttributeName': key, 'AttributeType': 'S'}],
+                BillingMode='PAY_PER_REQUEST',
+            )
+        monkeypatch.setattr(lambda_function, 'TABLE_NAME', TABLE)
+        monkeypatch.setattr(lambda_function, 'IDEMPOTENCY_TABLE', IDEMPOTENCY)
+        for name in ('ROOM_INDEX_NAME', 'OCCUPANCY_TABLE', 'SNS_TOPIC_ARN'):
+            monkeypatch.setattr(lambda_function, name, None)
+        monkeypatch.setattr(lambda_function, '_clients', {})
+        monkeypatch.setattr(lambda_function, '_notified_conflicts', {})
+        yield resource.Table(TABLE)
+
+
+@pytest.fixture
+def dynamodb_calls(table):
+    """Operaciones que la Lambda hace sobre DynamoDB con su cliente"""
+    calls = []
+    lambda_function.get_client('dynamodb').meta.events.register(
+        'before-call.dynamodb', lambda model, **kwargs: calls.append(model.name))
+    return calls
+
+
+@pytest.fixture
+def notifications(monkeypatch):
+    sent = []
+    monkeypatch.setattr(lambda_function, 'send_conflict_notification',
+                        lambda room_number, conflicts_by_reservation, reservations: sent.append(room_number) or True)
+    return sent
+
+
+def reservation(reservation_id, status='Pendiente', version=1, **fields):
+    return dict({'ReservationID': reservation_id, 'GuestName': 'Ana', 'RoomNumber': '101',
+                 'CheckInDate': '2025-03-01', 'CheckOutDate': '2025-03-04', 'Status': status, 'Version': version},
+                **fields)
+
+
+def stream_record(item, event_name='INSERT', event_id=None):
+    serializer = TypeSerializer()
+    return {
+        'eventID': event_id or f"{event_name}-{item['ReservationID']}-{item['Version']}",
+        'eventName': event_name,
+        'dynamodb': {
+            'Keys': {'ReservationID': {'S': item['ReservationID']}},
+            'NewImage': {key: serializer.serialize(value) for key, value in item.items()},
+            'SequenceNumber': f"{item['ReservationID']}-{item['Version']}",
+        },
+    }
+
+
+def stored(table, reservation_id):
+    return table.get_item(Key={'ReservationID': reservation_id}, ConsistentRead=True)['Item']
+
+
+def test_stale_pending_record_does_not_overwrite_a_later_cancellation(table, notifications):
+    table.put_item(Item=reservation('old', status='Confirmada'))
+    # El registro INSERT llega después de que el huésped cancelara (Version 2)
+    pending = reservation('new')
+    table.put_item(Item=reservation('new', status='Cancelada', version=2, UpdatedBy='app'))
+
+    response = lambda_function.process_stream_batch({'Records': [stream_record(pending)]})
+
+    assert response['batchItemFailures'] == []
+    item = stored(table, 'new')
+    assert (item['Status'], item['Version'], item['UpdatedBy']) == ('Cancelada', 2, 'app')
+    # El conflicto de la imagen vieja no se notifica: el registro más reciente decide
+    assert notifications == []
+
+
+def test_current_pending_record_is_written_with_its_version(table, notifications):
+    table.put_item(Item=reservation('old', status='Confirmada'))
+    pending = reservation('new')
+    table.put_item(Item=pending)
+
+    lambda_function.process_stream_batch({'Records': [stream_record(pending)]})
+
+    item = stored(table, 'new')
+    assert (item['Status'], item['Version'], item['UpdatedBy']) == ('Conflicto', 2, lambda_function.STATUS_WRITER)
+    assert notifications == ['101']
+
+
+def test_already_processed_event_is_skipped(table, dynamodb_calls, notifications):
+    table.put_item(Item=reservation('old', status='Confirmada'))
+    repeated, fresh = reservation('repetida'), reservation('nueva', RoomNumber='102')
+    for item in (repeated, fresh):
+        table.put_item(Item=item)
+    boto3.resource('dynamodb', region_name='us-east-1').Table(IDEMPOTENCY).put_item(
+        Item={'EventID': 'evento-1', 'ExpiresAt': int(time.time()) + 3600})
+
+    response = lambda_function.process_stream_batch({'Records': [
+        stream_record(repeated, event_id='evento-1'), stream_record(fresh, event_id='evento-2')]})
+
+    assert response['batchItemFailures'] == []
+    # La repetida no se evalúa ni se escribe aunque se cruce con 'old'
+    assert stored(table, 'repetida')['Status'] == 'Pendiente'
+    assert stored(table, 'nueva')['Status'] == 'Confirmada'
+    assert notifications == []
+    assert dynamodb_calls.count('UpdateItem') == 1
+    recorded = boto3.client('dynamodb', region_name='us-east-1').scan(TableName=IDEMPOTENCY)['Items']
+    assert sorted(item['EventID']['S'] for item in recorded) == ['evento-1', 'evento-2']
+
+
+def test_own_status_writes_are_discarded_without_reading_dynamodb(table, dynamodb_calls, notifications):
+    confirmed = reservation('a', status='Confirmada', version=2, UpdatedBy=lambda_function.STATUS_WRITER)
+    conflict = reservation('b', status='Conflicto', version=2, UpdatedBy=lambda_function.STATUS_WRITER)
+
+    response = lambda_function.process_stream_batch({'Records': [
+        stream_record(confirmed, 'MODIFY'), stream_record(conflict, 'MODIFY')]})
+
+    assert response['batchItemFailures'] == []
+    assert dynamodb_calls == []
+    assert notifications == []
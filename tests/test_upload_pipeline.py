@@ -0,0 +1,123 @@
+import os
+import threading
+
+import boto3
+import pytest
+from moto import mock_dynamodb, mock_s3
+
+from upload_pipeline import UploadPipeline, UPLOAD_DONE, UPLOAD_FAILED, UPLOAD_PENDING
+
+BUCKET = 'documentos-test'
+
+
+@pytest.fixture
+def app(app_module):
+    with mock_dynamodb(), mock_s3():
+        boto3.resource('dynamodb', region_name='us-east-1').create_table(
+            TableName=app_module.DYNAMODB_TABLE,
+            KeySchema=[{'AttributeName': 'ReservationID', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'ReservationID', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST',
+        )
+        boto3.client('s3', region_name='us-east-1').create_bucket(Bucket=BUCKET)
+        yield app_module
+
+
+def pipeline(app, **options):
+    options = dict({'workers': 1, 'backoff_seconds': 0, 'on_state_change': app.record_document_upload_state},
+                   **options)
+    return UploadPipeline(app.s3_uploads, options.pop('bucket', BUCKET), **options)
+
+
+def reservation_with_document(app, reservation_id):
+    """Reserva recién guardada con su documento en disco, pendiente de subir"""
+    document_id = f'{reservation_id}_pasaporte.pdf'
+    with open(os.path.join(app.LOCAL_DOCUMENTS_PATH, document_id), 'wb') as document:
+        document.write(b'%PDF-1.4 documento de prueba')
+    app.table.put_item(Item={'ReservationID': reservation_id, 'GuestName': 'Ana', 'RoomNumber': '101',
+                             'DocumentID': document_id, 'DocumentUploadStatus': UPLOAD_PENDING})
+    return document_id
+
+
+def upload_status(app, reservation_id):
+    item = app.table.get_item(Key={'ReservationID': reservation_id}, ConsistentRead=True).get('Item') or {}
+    return item.get('DocumentUploadStatus')
+
+
+def stored_keys():
+    response = boto3.client('s3', region_name='us-east-1').list_objects_v2(Bucket=BUCKET)
+    return [item['Key'] for item in response.get('Contents', [])]
+
+
+def submit(uploads, app, reservation_id, document_id):
+    return uploads.submit(os.path.join(app.LOCAL_DOCUMENTS_PATH, document_id), f'documents/{document_id}',
+                          reservation_id, document_id)
+
+
+def test_successful_upload_marks_reservation_uploaded(app):
+    document_id = reservation_with_document(app, 'r1')
+    uploads = pipeline(app)
+
+    assert submit(uploads, app, 'r1', document_id)
+    assert uploads.drain(timeout=10)
+    assert upload_status(app, 'r1') == UPLOAD_DONE
+    assert stored_keys() == [f'documents/{document_id}']
+    assert uploads.stats()['completed'] == 1
+
+
+def test_upload_is_retried_then_marked_as_failed(app):
+    document_id = reservation_with_document(app, 'r1')
+    # El bucket no existe: todos los intentos fallan
+    uploads = pipeline(app, bucket='bucket-inexistente', max_attempts=3)
+
+    assert submit(uploads, app, 'r1', document_id)
+    assert uploads.drain(timeout=10)
+    assert upload_status(app, 'r1') == UPLOAD_FAILED
+    assert (uploads.stats()['retries'], uploads.stats()['failed']) == (2, 1)
+
+
+def test_full_queue_uploads_in_the_request(app, monkeypatch):
+    documents = {reservation_id: reservation_with_document(app, reservation_id) for reservation_id in ('a', 'b', 'c')}
+    worker_busy = threading.Event()
+    release = threading.Event()
+
+    def slow_state_change(reservation_id, document_id, state):
+        worker_busy.set()
+        release.wait(10)
+        app.record_document_upload_state(reservation_id, document_id, state)
+
+    uploads = pipeline(app, max_queue=1, on_state_change=slow_state_change)
+    monkeypatch.setattr(app, 'upload_pipeline', uploads)
+    try:
+        # 'a' ocupa al único hilo y 'b' llena la cola
+        assert submit(uploads, app, 'a', documents['a'])
+        assert worker_busy.wait(10)
+        assert submit(uploads, app, 'b', documents['b'])
+
+        app.queue_document_upload('c', documents['c'])
+        assert upload_status(app, 'c') == UPLOAD_DONE
+        assert upload_status(app, 'a') == UPLOAD_PENDING
+    finally:
+        release.set()
+    assert uploads.drain(timeout=10)
+    assert {reservation_id: upload_status(app, reservation_id) for reservation_id in documents} == {
+        'a': UPLOAD_DONE, 'b': UPLOAD_DONE, 'c': UPLOAD_DONE}
+
+
+def test_upload_of_replaced_document_keeps_the_new_status(app):
+    old_document_id = reservation_with_document(app, 'r1')
+    # Antes de que termine la subida, la reserva se edita con otro documento
+    new_document_id = 'r1_cedula.pdf'
+    app.table.update_item(Key={'ReservationID': 'r1'}, UpdateExpression='SET DocumentID = :di',
+                          ExpressionAttributeValues={':di': new_document_id})
+    # Y otra reserva se elimina con su subida todavía en la cola
+    deleted_document_id = reservation_with_document(app, 'r2')
+    app.table.delete_item(Key={'ReservationID': 'r2'})
+    uploads = pipeline(app)
+
+    assert submit(uploads, app, 'r1', old_document_id)
+    assert submit(uploads, app, 'r2', deleted_document_id)
+    assert uploads.drain(timeout=10)
+    item = app.table.get_item(Key={'ReservationID': 'r1'}, ConsistentRead=True)['Item']
+    assert (item['DocumentID'], item['DocumentUploadStatus']) == (new_document_id, UPLOAD_PENDING)
+    assert 'Item' not in app.table.get_item(Key={'ReservationID': 'r2'})
@@ -0,0 +1,138 @@
+"""Carga de documentos a S3 en segundo plano.
+
+Las peticiones guardan el documento en disco y encolan su subida; un grupo
+acotado de hilos lo envía a S3 con carga multiparte concurrente y reintenta
+con espera exponencial. Cada cambio de estado se notifica con un callback
+para que la aplicación lo registre en la reserva.
+"""
+import os
+import queue
+import random
+import threading
+import time
+
+from boto3.s3.transfer import TransferConfig
+
+# Estados de carga registrados en la reserva
+UPLOAD_PENDING = 'Pendiente'
+UPLOAD_DONE = 'Subido'
+UPLOAD_FAILED = 'Error'
+
+MB = 1024 * 1024
+
+
+class UploadPipeline:
+    """Cola acotada de subidas a S3 atendida por hilos de fondo"""
+
+    def __init__(self, s3_client, bucket, workers=2, max_queue=32, max_attempts=5,
+                 backoff_seconds=0.5, part_size=8 * MB, part_concurrency=4, on_state_change=None,
+                 on_upload=None):
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.on_state_change = on_state_change
+        # on_upload(bytes, segundos, exitosa) tras cada intento de subida
+        self.on_upload = on_upload
+        self.transfer_config = TransferConfig(
+            multipart_threshold=part_size,
+            multipart_chunksize=part_size,
+            max_concurrency=part_concurrency
+        )
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self._counter_lock = threading.Lock()
+        self.in_progress = 0
+        self.completed = 0
+        self.failed = 0
+        self.retries = 0
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._threads:
+                return
+            for number in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'upload-worker-{number}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, local_path, key, reservation_id, document_id):
+        """Encola una subida; devuelve False si la cola está llena"""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((local_path, key, reservation_id, document_id))
+            return True
+        except queue.Full:
+            return False
+
+    def upload(self, local_path, key):
+        """Sube un archivo a S3 de inmediato (multiparte si supera part_size)"""
+        started = time.perf_counter()
+        succeeded = False
+        try:
+            self.s3.upload_file(local_path, self.bucket, key, Config=self.transfer_config)
+            succeeded = True
+        finally:
+            if self.on_upload is not None:
+                self.on_upload(os.path.getsize(local_path), time.perf_counter() - started, succeeded)
+
+    def _count(self, name, delta=1):
+        with self._counter_lock:
+            setattr(self, name, getattr(self, name) + delta)
+
+    def _notify(self, reservation_id, document_id, state):
+        if self.on_state_change is None:
+            return
+        try:
+            self.on_state_change(reservation_id, document_id, state)
+        except Exception as e:
+            print(f"No se pudo registrar el estado de carga de {reservation_id}: {str(e)}")
+
+    def _run(self):
+        while True:
+            local_path, key, reservation_id, document_id = self._queue.get()
+            self._count('in_progress')
+            try:
+                state = self._upload_with_retries(local_path, key)
+                self._count('completed' if state == UPLOAD_DONE else 'failed')
+                self._notify(reservation_id, document_id, state)
+            finally:
+                self._count('in_progress', -1)
+                self._queue.task_done()
+
+    def _upload_with_retries(self, local_path, key):
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                self.upload(local_path, key)
+                return UPLOAD_DONE
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    print(f"Error al subir {key} a S3 tras {attempt} intentos: {str(e)}")
+                    return UPLOAD_FAILED
+                self._count('retries')
+                # Espera exponencial con jitter completo
+                time.sleep(random.uniform(0, self.backoff_seconds * 2 ** (attempt - 1)))
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def drain(self, timeout=None):
+        """Espera a que se procesen las subidas encoladas (hasta timeout segundos)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def stats(self):
+        return {
+            'queue_depth': self.queue_depth(),
+            'queue_capacity': self._queue.maxsize,
+            'in_progress': self.in_progress,
+            'completed': self.completed,
+            'failed': self.failed,
+            'retries': self.retries,
+        }